@@ -0,0 +1,143 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script detects the arrival of the ball from the time vs U1 history
+
+The ball center starts at x = -5.0 and arrives when it crosses x = 50*pi,
+i.e., U1 = 50*pi + 5.0 (U1_contact, the ball then touches the end cap of the track).
+A clean contact never passes U1_contact, so the threshold U1_end lies Contact_tol
+(a tenth of the ball radius) before it; the halting filter of Pre_Processing.py uses
+the same U1_end.
+
+1. Crossing : first sample pair that brackets U1_end, crossing time by linear interpolation,
+              plus Contact_tol over the speed of the pair to reach U1_contact
+              Uncertainty from the interpolation error bound dt^2*|a|/(8*v) plus the speed
+              change over the last Contact_tol, at most dt
+              A pair whose upper sample is already at the end cap (U1 >= U1_contact) spans
+              the contact: speed of the previous pair instead, uncertainty dt
+2. Plateau  : the ball is at rest once U1 has stayed within tol for hold seconds
+              (rolling max/min over a window of hold seconds of uniform samples)
+              If U1 never reaches U1_end (the ball stops short of the end cap),
+              the arrival is the start of the plateau, uncertainty dt
+
+ArrivalMonitor applies the same logic incrementally on a live history,
+so a driver can stop the job once finished is True.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+X_ball = -5.0
+Ball_radius = 5.0
+Contact_tol = 0.1*Ball_radius
+U1_contact = np.pi*50. - X_ball
+U1_end = U1_contact - Contact_tol
+
+
+class ArrivalMonitor(object):
+    """
+    Incremental arrival detection; feed samples with update(time, u1)
+    """
+    def __init__(self, u1_end=U1_end, contact_tol=Contact_tol, tol=0.05, hold=0.005,
+                 min_fraction=0.95):
+        self.u1_end = u1_end
+        self.contact_tol = contact_tol
+        self.tol = tol
+        self.hold = hold
+        self.min_fraction = min_fraction
+        self.last = np.empty((0, 2))
+        self.window = 1
+        self.time = None
+        self.error = None
+        self.method = None
+        self.finished = False
+
+    @property
+    def arrived(self):
+        return self.time is not None
+
+    def update(self, t, u1):
+        """
+        Add new samples (scalars or arrays); returns True once the ball has arrived and settled
+        """
+        New = np.column_stack((np.atleast_1d(t), np.atleast_1d(u1))).astype(float)
+        if len(New) == 0 or self.finished:
+            return self.finished
+        Data = np.vstack((self.last, New))
+        if not self.arrived:
+            self._crossing(Data)
+        self._plateau(Data, len(self.last))
+        self.last = Data[-max(3, 2*self.window):]
+        return self.finished
+
+    def _crossing(self, Data):
+        Above = np.nonzero(Data[:, 1] >= self.u1_end)[0]
+        if len(Above) == 0 or Above[0] == 0:
+            return
+        i = Above[0]
+        (t0, u0), (t1, u1) = Data[i-1], Data[i]
+        dt = t1 - t0
+        v = (u1 - u0)/dt
+        self.time = t0 + (self.u1_end - u0)/v + self.contact_tol/v
+        self.error = dt
+        self.method = 'crossing'
+        if u1 >= self.u1_end + self.contact_tol:
+            # The pair spans the contact with the end cap: the ball rests for part of dt and
+            # the mean speed is too low. Free-flight speed of the previous pair if known,
+            # the contact lies within the pair either way
+            if i >= 2:
+                t_, u_ = Data[i-2]
+                v_ = (u0 - u_)/(t0 - t_)
+                if v_ > 0:
+                    self.time = min(max(t0 + (self.u1_end + self.contact_tol - u0)/v_, t0), t1)
+            return
+        if i >= 2:
+            t_, u_ = Data[i-2]
+            a = 2*(v - (u0 - u_)/(t0 - t_))/(t1 - t_)
+            if v > 0:
+                # Interpolation, then contact_tol at the chord speed over tau
+                tau = self.contact_tol/v
+                self.error = min(dt, dt**2*abs(a)/(8*v) + tau*abs(a)*(dt + tau)/(2*v))
+
+    def _plateau(self, Data, Start):
+        if len(Data) < 2:
+            return
+        dt = np.median(np.diff(Data[:, 0]))
+        if not dt > 0:
+            return
+        # Windows of k samples span hold seconds, only those ending at a new sample
+        k = self.window = int(np.ceil(self.hold/dt - 1e-9)) + 1
+        First = max(Start - k + 1, 0)
+        if len(Data) - First < k:
+            return
+        Windows = sliding_window_view(Data[First:, 1], k)
+        High = Windows.max(axis=1)
+        Rest = np.nonzero((High - Windows.min(axis=1) <= self.tol) &
+                          (High >= self.min_fraction*self.u1_end))[0]
+        if len(Rest) == 0:
+            return
+        i = First + Rest[0] + k - 1
+        if not self.arrived:
+            # Start of the plateau: first sample within tol of its level
+            Level = np.maximum.accumulate(Data[:i+1, 1])
+            self.time = Data[np.searchsorted(Level, High[Rest[0]] - self.tol), 0]
+            self.error = Data[i, 0] - Data[i-1, 0]
+            self.method = 'plateau'
+        self.finished = True
+
+
+def arrival_time(Time_vs_U1, **kwargs):
+    """
+    Arrival time, uncertainty bound and method ('crossing', 'plateau' or 'maximum')
+    of a complete history, e.g. Time_vs_U1 read from U1.rpt
+    """
+    Time_vs_U1 = np.asarray(Time_vs_U1, dtype=float)
+    monitor = ArrivalMonitor(**kwargs)
+    monitor.update(Time_vs_U1[:, 0], Time_vs_U1[:, 1])
+    if monitor.arrived:
+        return monitor.time, monitor.error, monitor.method
+    # Same as the former Post_Processing.py: time of the maximum U1
+    i = Time_vs_U1[:, 1].argmax()
+    dt = Time_vs_U1[1, 0] - Time_vs_U1[0, 0] if len(Time_vs_U1) > 1 else 0.
+    return Time_vs_U1[i, 0], dt, 'maximum'
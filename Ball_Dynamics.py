@@ -0,0 +1,338 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script integrates the motion of the ball center for many designs at once
+
+Reduced-order model of the Abaqus/Explicit run of Pre_Processing.py:
+- The ball (radius 5.0) runs in the channel between the track and its offset (10.1),
+  pressed on the offset wall, so the ball center follows the track offset by 5.1
+- Center path: guide (x=-5.1, from y=5.0 down to y=0.0), arc of radius 5.1 around the
+  start of the track (the guide/curve junction taken as a corner), offset of the PCHIP curve,
+  and a straight run-out along the end tangent up to the end cap
+  The path is evaluated analytically from the PCHIP knots of each ball, no tables
+- Frictionless contact, gravity 9800 mm/s^2: the ball slides without spinning.
+  With rolling=True the ball rolls without slip instead (rotational inertia 2/5*m*r^2),
+  which divides the tangential acceleration by 1 + 2/5 on the arc, curve and run-out
+  (free fall along the guide, where the wall carries no load)
+- Contact force on the offset wall per unit mass: N/m = v^2*kappa + g*Tx
+  (full g also when rolling: the normal balance has no inertia term, the slower speed
+  enters through v)
+  The ball leaves the wall when N < 0; in the channel it moves over to the track wall
+  (0.1 mm clearance, path change neglected), the first such event is reported
+  With channel=False a ball that leaves the wall is flagged and stopped (no flight model)
+
+The state of every ball is its path coordinate q and its speed v, integrated from the
+momentum equation (energy is not imposed).
+All balls advance in lockstep as NumPy arrays with adaptive Dormand-Prince 5(4) steps,
+each ball with its own step size; steps end on the segment boundaries of the path, where
+the curvature jumps. Arrival (x_center = 50*pi) and contact loss (normal force checked at
+the stages of every step) are located inside the step on the dense output.
+One design takes ~30 ms (NumPy call overhead), a batch of 2000 ~0.3 s on one core.
+
+Run command:
+python Ball_Dynamics.py 0.2 0.326 0.579 0.8 0.674
+"""
+import numpy as np
+
+from Drop_Time_Model import track_knots, pchip_slopes, Gravity, X_end
+
+Ball_radius = 5.0
+Offset = 10.1
+# Distance from the track to the ball center
+Center_offset = Offset - Ball_radius
+Y_start = 5.0
+
+
+class CenterPath(object):
+    """
+    Ball-center path of every design, evaluated analytically at per-ball coordinates q
+
+    q is the arc length on the guide and the arc, the PCHIP abscissa p (shifted) on the
+    curve and the arc length again on the run-out; ds/dq = J(q).
+    Segments (smooth pieces): 0 arc, 1..n PCHIP intervals, n+1 run-out. The curvature
+    jumps between them, so the integrator steps within one segment, evaluated with its
+    own formula (extrapolated past its end inside a step).
+    """
+    def __init__(self, S, d=Center_offset):
+        self.X_coord, self.Y_coord = track_knots(np.atleast_2d(S))
+        self.D = pchip_slopes(self.X_coord, self.Y_coord)
+        self.d = d
+        self.N = len(self.Y_coord)
+        self.n = len(self.X_coord) - 1
+        self.h = self.X_coord[1] - self.X_coord[0]
+        # Start of the arc, the curve and the run-out
+        self.Beta = np.arctan2(1., -self.D[:, 0])
+        self.q_arc = Y_start
+        self.q_curve = Y_start + d*self.Beta
+        self.q_end = self.q_curve + X_end
+        # Cubic of every PCHIP interval in its local t = p/h - k, (N*n, 4)
+        h, y0, y1 = self.h, self.Y_coord[:, :-1], self.Y_coord[:, 1:]
+        d0, d1 = h*self.D[:, :-1], h*self.D[:, 1:]
+        self.Coef = np.stack((y0, d0, 3*(y1 - y0) - 2*d0 - d1, 2*(y0 - y1) + d0 + d1),
+                             axis=-1).reshape(-1, 4)
+
+    def segment(self, R, q):
+        """
+        Segment of ball rows R at q
+        """
+        k = np.clip(np.floor((q - self.q_curve[R])/self.h), 0, self.n - 1).astype(int)
+        return np.where(q < self.q_curve[R], 0, np.where(q >= self.q_end[R], self.n + 1, k + 1))
+
+    def segment_end(self, R, seg):
+        """
+        q at the end of segment seg of ball rows R
+        """
+        return np.where(seg > self.n, np.inf, self.q_curve[R] + seg*self.h)
+
+    def _pchip(self, R, p, k):
+        """
+        y, y', y'' of the PCHIP curve of ball rows R at p on interval k (knots uniform in x)
+        """
+        h = self.h
+        t = p/h - k
+        a0, a1, a2, a3 = self.Coef[R*self.n + k].T
+        y = ((a3*t + a2)*t + a1)*t + a0
+        dy = ((3*a3*t + 2*a2)*t + a1)/h
+        d2y = (6*a3*t + 2*a2)/h**2
+        return y, dy, d2y
+
+    def __call__(self, R, q, seg=None):
+        """
+        x, y, tx, ty (unit tangent), kappa (signed curvature, positive turning left)
+        and J = ds/dq of ball rows R at q, on segment seg (default: the segment of q)
+        """
+        d = self.d
+        q_curve, q_end = self.q_curve[R], self.q_end[R]
+        if seg is None:
+            seg = self.segment(R, q)
+        # Curve (at its end for the run-out)
+        Run = seg > self.n
+        p = np.where(Run, X_end, q - q_curve)
+        y, dy, d2y = self._pchip(R, p, np.clip(seg - 1, 0, self.n - 1))
+        L = np.sqrt(1 + dy**2)
+        Kappa = d2y/L**3
+        f = np.maximum(1 + d*Kappa, 0.05)
+        x_c, y_c = p + d*dy/L, y - d/L
+        tx, ty, kappa, J = 1/L, dy/L, Kappa/f, f*L
+        # Run-out along the end tangent
+        if Run.any():
+            e = np.where(Run, q - q_end, 0.)
+            x_c, y_c = x_c + tx*e, y_c + ty*e
+            kappa = np.where(Run, 0., kappa)
+            J = np.where(Run, 1., J)
+        # Arc around the start of the track
+        Arc = seg == 0
+        if Arc.any():
+            Phi = np.clip((q - self.q_arc)/d, 0., None)
+            x_c = np.where(Arc, -d*np.cos(Phi), x_c)
+            y_c = np.where(Arc, -d*np.sin(Phi), y_c)
+            tx = np.where(Arc, np.sin(Phi), tx)
+            ty = np.where(Arc, -np.cos(Phi), ty)
+            kappa = np.where(Arc, 1./d, kappa)
+            J = np.where(Arc, 1., J)
+        # Guide
+        Guide = q < self.q_arc
+        if Guide.any():
+            y_c = np.where(Guide, Y_start - q, y_c)
+            kappa = np.where(Guide, 0., kappa)
+        return x_c, y_c, tx, ty, kappa, J
+
+
+# Dormand-Prince 5(4) tableau with the dense output of Shampine (as scipy's RK45)
+_A = [np.array([]), np.array([1/5.]), np.array([3/40., 9/40.]),
+      np.array([44/45., -56/15., 32/9.]),
+      np.array([19372/6561., -25360/2187., 64448/6561., -212/729.]),
+      np.array([9017/3168., -355/33., 46732/5247., 49/176., -5103/18656.])]
+_B = np.array([35/384., 0., 500/1113., 125/192., -2187/6784., 11/84.])
+# Times of the start, the stages 1..5 and the end of the step (normal force checks)
+_C_force = np.array([0., 1/5., 3/10., 4/5., 8/9., 1., 1.])
+_E = np.array([-71/57600., 0., 71/16695., -71/1920., 17253/339200., -22/525., 1/40.])
+_P = np.array([
+    [1., -8048581381/2820520608., 8663915743/2820520608., -12715105075/11282082432.],
+    [0., 0., 0., 0.],
+    [0., 131558114200/32700410799., -68118460800/10900136933., 87487479700/32700410799.],
+    [0., -1754552775/470086768., 14199869525/1410260304., -10690763975/1880347072.],
+    [0., 127303824393/49829197408., -318862633887/49829197408., 701980252875/199316789632.],
+    [0., -282668133/205662961., 2019193451/616988883., -1453857185/822651844.],
+    [0., 40617522/29380423., -110615467/29380423., 69997945/29380423.]])
+
+
+def _dense(Y0, Q, h, tau):
+    """
+    State (2, n) at t0 + tau*h from the dense coefficients Q = einsum(K, _P) of the step
+    """
+    return Y0 + h*(((Q[:, 3]*tau + Q[:, 2])*tau + Q[:, 1])*tau + Q[:, 0])*tau
+
+
+def _dense_time(Y0, Q, h, Target, Lo=0., Hi=1.):
+    """
+    tau in [Lo, Hi] with q(t0 + tau*h) = Target (Newton on the dense output, q rises)
+    """
+    q0, (a, b, c, d) = Y0[0], Q[0]
+    Lo, Hi = Lo + np.zeros_like(h), Hi + np.zeros_like(h)
+    tau = 0.5*(Lo + Hi)
+    for _ in range(30):
+        f = q0 + h*((((d*tau + c)*tau + b)*tau + a)*tau) - Target
+        Lo, Hi = np.where(f < 0., tau, Lo), np.where(f < 0., Hi, tau)
+        New = tau - f/np.maximum(h*(((4*d*tau + 3*c)*tau + 2*b)*tau + a), 1e-300)
+        New = np.where((New >= Lo) & (New <= Hi), New, 0.5*(Lo + Hi))
+        if np.all(np.abs(New - tau) <= 1e-13):
+            return New
+        tau = New
+    return tau
+
+
+def simulate(S, rolling=False, channel=True, rtol=1e-9, atol=1e-7, t_max=0.3, h0=1e-3):
+    """
+    Integrate all designs of the (N, 5) array S in lockstep
+
+    The state is the path coordinate q and the speed v of the ball center:
+    dq/dt = v/J, (1 + I/(m*r^2))*dv/dt = -g*ty (I = 2/5*m*r^2 with rolling=True, else 0)
+    The normal balance N/m = v^2*kappa + g*Tx has no inertia term, so the full g stays
+    there. The fall along the guide is analytic and free (no rolling on the vertical wall).
+
+    Returns dict of (N,) arrays:
+    arrival   : time at which the ball center reaches x = 50*pi (NaN if not within t_max)
+    loss_time : first time the contact force on the offset wall becomes negative (NaN if never)
+    loss_x    : x of the ball center at that time
+    airborne  : True if the ball left the wall with channel=False (integration stopped)
+    """
+    path = CenterPath(S)
+    N = path.N
+    Mass = 1.4 if rolling else 1.
+    # Free fall along the vertical guide: gravity is parallel to the wall, no normal force
+    # and so no friction to spin the ball, also with rolling (speed kept at the arc, the
+    # spin-up there is neglected)
+    t = np.full(N, np.sqrt(2*Y_start/Gravity))
+    Y = np.stack((np.full(N, path.q_arc), Gravity*t))
+    Seg = np.zeros(N, dtype=int)
+    h = np.full(N, h0)
+    Result = dict(arrival=np.full(N, np.nan), loss_time=np.full(N, np.nan),
+                  loss_x=np.full(N, np.nan), airborne=np.zeros(N, dtype=bool))
+    In_contact = np.zeros(N, dtype=bool)
+    Active = np.ones(N, dtype=bool)
+
+    def rhs(R, Y, seg):
+        x, _, tx, ty, kappa, J = path(R, Y[0], seg)
+        return np.stack((Y[1]/J, -Gravity/Mass*ty)), (x, tx, kappa, J)
+
+    def normal(Y, tx, kappa):
+        return Y[1]**2*kappa + Gravity*tx
+
+    K1, (_, tx, kappa, _) = rhs(np.arange(N), Y, Seg)
+    Force0 = normal(Y, tx, kappa)
+    while Active.any():
+        R = np.nonzero(Active)[0]
+        hR = np.minimum(h[R], t_max - t[R])
+        Y0, s = Y[:, R], Seg[R]
+        K = np.empty((7, 2, len(R)))
+        Forces = np.empty((7, len(R)))
+        K[0], Forces[0] = K1[:, R], Force0[R]
+        for i in range(1, 6):
+            Yi = Y0 + hR*np.tensordot(_A[i], K[:i], 1)
+            K[i], (_, txi, ki, _) = rhs(R, Yi, s)
+            Forces[i] = normal(Yi, txi, ki)
+        Y1 = Y0 + hR*np.tensordot(_B, K[:6], 1)
+        K[6], State = rhs(R, Y1, s)
+        Scale = atol + rtol*np.maximum(np.abs(Y0), np.abs(Y1))
+        Err = np.max(np.abs(hR*np.tensordot(_E, K, 1))/Scale, axis=0)
+        Accept = Err <= 1.
+        h[R] = hR*np.clip(0.9*np.maximum(Err, 1e-10)**(-0.2), 0.2, 5.)
+        A = R[Accept]
+        if len(A) == 0:
+            continue
+        # dt: step of the dense output, tau_end: fraction of it taken
+        t0, dt, s, Y0, K = t[A], hR[Accept], s[Accept], Y0[:, Accept], K[:, :, Accept]
+        Y1, Forces, tau_end = Y1[:, Accept], Forces[:, Accept], np.ones(len(A))
+        Q = np.einsum('kcn,kj->cjn', K, _P)
+        x, tx, kappa, _ = [Value[Accept] for Value in State]
+        # Steps that leave the segment end on its boundary (dense output)
+        End = path.segment_end(A, s)
+        Over = np.nonzero(Y1[0] > End)[0]
+        if len(Over):
+            tau_end[Over] = _dense_time(Y0[:, Over], Q[:, :, Over], dt[Over], End[Over])
+            Y1[:, Over] = _dense(Y0[:, Over], Q[:, :, Over], dt[Over], tau_end[Over])
+            Y1[0, Over] = End[Over]
+            x[Over], _, tx[Over], _, kappa[Over], _ = path(A[Over], End[Over], s[Over])
+        # Arrival event inside the step: x(q) = X_end (Newton in q), then q(t) = q* on the
+        # dense output
+        Cross = np.nonzero(x >= X_end)[0]
+        if len(Cross):
+            Rc, sc = A[Cross], s[Cross]
+            Lo, Hi = Y0[0, Cross], Y1[0, Cross]
+            q = Hi.copy()
+            for _ in range(30):
+                xq, _, txq, _, _, Jq = path(Rc, q, sc)
+                Lo, Hi = np.where(xq < X_end, q, Lo), np.where(xq < X_end, Hi, q)
+                New = q - (xq - X_end)/np.maximum(txq*Jq, 1e-12)
+                New = np.where((New >= Lo) & (New <= Hi), New, 0.5*(Lo + Hi))
+                if np.all(np.abs(New - q) <= 1e-12*np.abs(q)):
+                    break
+                q = New
+            tau = _dense_time(Y0[:, Cross], Q[:, :, Cross], dt[Cross], q, 0., tau_end[Cross])
+            Result['arrival'][Rc] = t0[Cross] + tau*dt[Cross]
+            Active[Rc] = False
+        # Contact force on the offset wall at the stages and the end of the step, the first
+        # negative one brackets the loss, located on the dense output
+        Forces[6] = Normal = normal(Y1, tx, kappa)
+        Negative = (Forces < 0.) & (_C_force[:, None] <= tau_end)
+        Lost = np.nonzero(In_contact[A] & Negative.any(axis=0) &
+                          np.isnan(Result['loss_time'][A]))[0]
+        In_contact[A] |= Normal > 1e-6*Gravity
+        if len(Lost):
+            Rl, sl = A[Lost], s[Lost]
+            j = Negative[:, Lost].argmax(axis=0)
+            Lo = _C_force[np.maximum(j - 1, 0)]
+            Hi = np.minimum(_C_force[j], tau_end[Lost])
+
+            def force(Yt):
+                _, _, txl, _, kl, _ = path(Rl, Yt[0], sl)
+                return -normal(Yt, txl, kl)
+            tau = _dense_root(Y0[:, Lost], Q[:, :, Lost], dt[Lost], force, Lo, Hi)
+            Yl = _dense(Y0[:, Lost], Q[:, :, Lost], dt[Lost], tau)
+            Result['loss_time'][Rl] = t0[Lost] + tau*dt[Lost]
+            Result['loss_x'][Rl] = path(Rl, Yl[0], sl)[0]
+            if not channel:
+                Result['airborne'][Rl] = True
+                Active[Rl] = False
+        t[A], Y[:, A], K1[:, A], Force0[A] = t0 + tau_end*dt, Y1, K[6], Normal
+        if len(Over):
+            # Next segment: the right-hand side and the normal force jump, no
+            # first-same-as-last stage
+            Seg[A[Over]] = s[Over] + 1
+            K1[:, A[Over]], (_, tx, kappa, _) = rhs(A[Over], Y1[:, Over], s[Over] + 1)
+            Force0[A[Over]] = normal(Y1[:, Over], tx, kappa)
+        Active[A[t[A] >= t_max]] = False
+    return Result
+
+
+def _dense_root(Y0, Q, h, residual, Lo=0., Hi=1., Iterations=25):
+    """
+    tau in [Lo, Hi] where residual(state at t0 + tau*h) changes from negative to positive
+    (bisection on the dense output of the step)
+    """
+    Lo, Hi = Lo + np.zeros_like(h), Hi + np.zeros_like(h)
+    for _ in range(Iterations):
+        tau = 0.5*(Lo + Hi)
+        Below = residual(_dense(Y0, Q, h, tau)) < 0.
+        Lo = np.where(Below, tau, Lo)
+        Hi = np.where(Below, Hi, tau)
+    return 0.5*(Lo + Hi)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description='Reduced-order ball dynamics for s1..s5')
+    parser.add_argument('s', type=float, nargs=5, help='s1 s2 s3 s4 s5')
+    parser.add_argument('--rolling', action='store_true', help='roll without slip')
+    args = parser.parse_args()
+    Result = simulate([args.s], rolling=args.rolling)
+    print('Arrival time        : %.6f s' % Result['arrival'][0])
+    print('Contact loss        : t = %.6f s, x = %.3f' % (Result['loss_time'][0], Result['loss_x'][0]))
+    S = np.random.default_rng(0).random((5000, 5))
+    Start = time.perf_counter()
+    simulate(S)
+    print('5000 designs        : %.3f s' % (time.perf_counter() - Start))
@@ -0,0 +1,250 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script benchmarks every stage of the design evaluation without Abaqus
+
+Stages (scale N = number of designs, 1 to 10^6, each stage up to its own limit):
+curve_loop    : s -> Y_coord loop -> PchipInterpolator -> Coord, as Pre_Processing.py, per design
+curve         : the same with Drop_Time_Model.track_curve, vectorized over designs
+cycloid       : Coord_curve_2 of the reference cycloid, per design
+reference     : Cycloid_Reference.cycloid_params of N distinct endpoints (memo cleared)
+report_parse  : Report_Reader.read_report of a U1.rpt-format file (6000 increments), per design
+arrival       : Arrival.arrival_time of the U1 history (drop-time extraction), per design
+drop_time     : Drop_Time_Model.drop_time_batch
+drop_time_grad: Drop_Time_Model.drop_time_grad_batch (value and gradient)
+ball_dynamics : Ball_Dynamics.simulate
+sweep         : Sweep.run_sweep on all cores (peak memory of the parent process only)
+acquisition   : Surrogate.propose, batch of 4 out of N candidates (model of 200 runs)
+
+Every (stage, N) is run until min_time has passed (at least min_repeats runs, a single run
+if it takes longer than max_time). Reported per (stage, N):
+wall time percentiles p50/p90/p99 [s], throughput N/p50 [designs/s] and the peak
+memory allocated during one extra run (tracemalloc, includes NumPy arrays).
+
+Results are written to JSON. With --baseline, the best wall time and the peak memory are
+compared against a saved run; any stage slower by more than --tol (or larger by more than
+--mem-tol) is listed as a REGRESSION and the exit status is 1.
+
+Run command:
+python Benchmark.py --output Benchmark_Baseline.json
+python Benchmark.py --baseline Benchmark_Baseline.json --max-scale 10000
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from Drop_Time_Model import (track_curve, cycloid_curve, drop_time_batch, drop_time_grad_batch,
+                             Num_chunk)
+
+Scales = [1, 10, 100, 1000, 10000, 100000, 1000000]
+Increment = 5e-05
+Step_time = 0.3
+
+
+def _designs(N):
+    return np.random.default_rng(N).random((N, 5))
+
+
+def _curve_loop(S):
+    # Pre_Processing.py, one design at a time
+    from scipy import interpolate
+    for s in S:
+        X_coord = np.linspace(0, np.pi*50., endpoint=True, num=7)
+        Y_coord = np.linspace(0, -1, endpoint=True, num=7)
+        Y_coord[1] = 0.1
+        for i in range(len(Y_coord)-2):
+            Y_coord[i+2] = Y_coord[i+1] + (Y_coord[i+1] - Y_coord[i])*s[i]
+        Y_coord = Y_coord/max(Y_coord)*-100.
+        X_interp = np.linspace(0.0, np.pi*50., num=50, endpoint=True)
+        Y_interp = interpolate.PchipInterpolator(X_coord, Y_coord)(X_interp)
+        np.stack((X_interp, Y_interp), axis=1)
+
+
+def _curve(S):
+    for i in range(0, len(S), Num_chunk):
+        track_curve(S[i:i+Num_chunk])
+
+
+def _history():
+    """
+    U1 history of a ball arriving at 0.23 s and resting against the end cap
+    """
+    from Arrival import U1_end
+    t = np.arange(0., Step_time + Increment/2, Increment)
+    return np.column_stack((t, U1_end*np.minimum(t/0.23, 1.)**2))
+
+
+def _report(path):
+    Time_vs_U1 = _history()
+    with open(path, 'w') as file:
+        file.write('\n            X                 U1_History\n\n')
+        file.write(''.join('%14.5E %19.5E\n' % (t, u) for t, u in Time_vs_U1))
+    return path
+
+
+def _repeat(N, path):
+    from Report_Reader import read_report
+    for _ in range(N):
+        read_report(path)
+
+
+def _arrival(N, Time_vs_U1):
+    from Arrival import arrival_time
+    for _ in range(N):
+        arrival_time(Time_vs_U1)
+
+
+def _ball_dynamics(S):
+    from Ball_Dynamics import simulate
+    simulate(S)
+
+
+def _sweep(S):
+    from Sweep import run_sweep
+    run_sweep(S)
+
+
+def _endpoints(N):
+    Rng = np.random.default_rng(N)
+    return (np.column_stack((Rng.uniform(1., 400., N), -Rng.uniform(1., 200., N))),)
+
+
+def _reference(End):
+    from Cycloid_Reference import cycloid_params, clear_memo
+    clear_memo()
+    cycloid_params((0., 0.), End)
+
+
+def _surrogate(N):
+    from Surrogate import Surrogate
+    S = np.random.default_rng(0).random((200, 5))
+    model = Surrogate().fit(S, drop_time_batch(S))
+    return model, _designs(N)
+
+
+def _acquisition(model, Candidates):
+    model.propose(4, candidates=Candidates)
+
+
+def stages(workdir):
+    """
+    name -> (largest N, setup(N) -> arguments, run(*arguments))
+    """
+    Report = os.path.join(workdir, 'U1.rpt')
+    return {
+        'curve_loop': (10**4, lambda N: (_designs(N),), _curve_loop),
+        'curve': (10**6, lambda N: (_designs(N),), _curve),
+        'cycloid': (10**5, lambda N: (N,), lambda N: [cycloid_curve() for _ in range(N)]),
+        'reference': (10**6, _endpoints, _reference),
+        'report_parse': (10**3, lambda N: (N, Report if os.path.exists(Report) else _report(Report)),
+                         _repeat),
+        'arrival': (10**3, lambda N: (N, _history()), _arrival),
+        'drop_time': (10**6, lambda N: (_designs(N),), drop_time_batch),
+        'drop_time_grad': (10**5, lambda N: (_designs(N),), drop_time_grad_batch),
+        'ball_dynamics': (10**4, lambda N: (_designs(N),), _ball_dynamics),
+        'sweep': (10**6, lambda N: (_designs(N),), _sweep),
+        'acquisition': (10**5, _surrogate, _acquisition),
+    }
+
+
+def measure(run, Args, min_time=0.5, min_repeats=3, max_repeats=1000, max_time=10.):
+    """
+    Wall times of repeated runs and the peak memory of one extra run
+    """
+    Times = []
+    Start = time.perf_counter()
+    while len(Times) < max_repeats:
+        t0 = time.perf_counter()
+        run(*Args)
+        Times.append(time.perf_counter() - t0)
+        Elapsed = time.perf_counter() - Start
+        if Elapsed >= max_time or (len(Times) >= min_repeats and Elapsed >= min_time):
+            break
+    tracemalloc.start()
+    run(*Args)
+    Peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.array(Times), Peak
+
+
+def run_benchmark(names=None, scales=Scales, max_scale=None, **kwargs):
+    Results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for Name, (Largest, setup, run) in stages(workdir).items():
+            if names and Name not in names:
+                continue
+            # Warm-up (imports, caches) outside of the timings
+            run(*setup(1))
+            for N in scales:
+                if N > Largest or (max_scale and N > max_scale):
+                    continue
+                Times, Peak = measure(run, setup(N), **kwargs)
+                p50, p90, p99 = np.percentile(Times, [50, 90, 99])
+                Results.append(dict(stage=Name, n=N, repeats=len(Times), wall_p50=p50,
+                                    wall_p90=p90, wall_p99=p99, wall_min=Times.min(),
+                                    throughput=N/p50, peak_bytes=Peak))
+                print('%-15s %8d %6d %12.4g %12.4g %12.4g %14.4g %10.1f' % (
+                    Name, N, len(Times), p50, p90, p99, N/p50, Peak/2.**20))
+                sys.stdout.flush()
+    Meta = dict(time=time.strftime('%Y-%m-%d %H:%M:%S'), python=platform.python_version(),
+                numpy=np.__version__, machine=platform.machine(), processor=platform.processor(),
+                cpus=os.cpu_count())
+    return dict(meta=Meta, results=Results)
+
+
+def compare(Current, Baseline, tol=0.25, mem_tol=0.25):
+    """
+    Regressions of Current against Baseline, list of (stage, n, what, ratio)
+    """
+    Base = dict(((r['stage'], r['n']), r) for r in Baseline['results'])
+    Regressions = []
+    for r in Current['results']:
+        b = Base.get((r['stage'], r['n']))
+        if b is None:
+            continue
+        # Best of the runs, less sensitive to other load on the machine than p50
+        Ratio = r['wall_min']/b['wall_min']
+        if Ratio > 1 + tol:
+            Regressions.append((r['stage'], r['n'], 'time', Ratio))
+        # Small allocations are ignored (< 1 MB)
+        if r['peak_bytes'] > (1 + mem_tol)*b['peak_bytes'] + 2**20:
+            Regressions.append((r['stage'], r['n'], 'memory', r['peak_bytes']/max(b['peak_bytes'], 1)))
+    return Regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the design-evaluation pipeline')
+    parser.add_argument('--stages', nargs='*', default=None, help='subset of stages')
+    parser.add_argument('--max-scale', type=int, default=None, help='largest number of designs')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds per (stage, N)')
+    parser.add_argument('--output', default='Benchmark.json')
+    parser.add_argument('--baseline', default=None, help='JSON of a previous run')
+    parser.add_argument('--tol', type=float, default=0.25, help='allowed slowdown of the best run')
+    parser.add_argument('--mem-tol', type=float, default=0.25, help='allowed growth of peak memory')
+    args = parser.parse_args()
+    print('%-15s %8s %6s %12s %12s %12s %14s %10s' % (
+        'Stage', 'N', 'Runs', 'p50 [s]', 'p90 [s]', 'p99 [s]', 'Designs/s', 'Peak [MB]'))
+    # Read first, the baseline may be the output file
+    Baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            Baseline = json.load(file)
+    Current = run_benchmark(args.stages, max_scale=args.max_scale, min_time=args.min_time)
+    with open(args.output, 'w') as file:
+        json.dump(Current, file, indent=1)
+    if Baseline:
+        Regressions = compare(Current, Baseline, args.tol, args.mem_tol)
+        for Stage, N, What, Ratio in Regressions:
+            print('REGRESSION: %s N=%d %s x%.2f' % (Stage, N, What, Ratio))
+        if Regressions:
+            sys.exit(1)
+        print('No regression against %s' % args.baseline)
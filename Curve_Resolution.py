@@ -0,0 +1,143 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script chooses the points passed to s.Spline in Pre_Processing.py
+
+Instead of a fixed 50-point X_interp grid (track) and a 20-point theta grid (cycloid),
+points are added where the spline through them deviates most from the exact curve:
+
+1. Start from the PCHIP knots (track) or theta = 0, pi/2, pi (cycloid)
+2. Fit a cubic spline through the current points (the sketch spline)
+3. Insert the point of maximum deviation of every interval above tol, repeat
+
+The deviation is the distance between the fitted spline and the exact curve
+(PchipInterpolator for the track, analytic cycloid), so tol is in mm.
+The drop-time error from the discretization is reported by comparing the time
+along the fitted spline with the exact drop time of Drop_Time_Model.py.
+
+Run command:
+python Curve_Resolution.py 0.2 0.326 0.579 0.8 0.674 --tol 0.01
+"""
+import numpy as np
+from scipy import interpolate
+
+from Drop_Time_Model import (track_knots, pchip_slopes, pchip_eval, drop_time, cycloid_drop_time,
+                             Gravity, X_end, Radius_Cycl, Gauss_pts, Gauss_wts)
+
+Num_check = 16
+Max_points = 2000
+
+
+def _refine(Start, exact, fit, tol):
+    """
+    Greedy insertion of parameter values until the fit is within tol of exact
+    """
+    t = np.unique(np.asarray(Start, dtype=float))
+    while len(t) < Max_points:
+        Spline = fit(t)
+        # Check points inside every interval
+        u = np.linspace(0., 1., Num_check + 2)[1:-1]
+        Check = t[:-1, None] + np.diff(t)[:, None]*u
+        Diff = Spline(Check.ravel()) - exact(Check.ravel())
+        Error = np.linalg.norm(Diff.reshape(Check.size, -1), axis=1).reshape(Check.shape)
+        Worst = Error.argmax(axis=1)
+        Bad = Error[np.arange(len(Check)), Worst] > tol
+        if not Bad.any():
+            break
+        t = np.unique(np.concatenate((t, Check[Bad, Worst[Bad]])))
+    return t
+
+
+def adaptive_x(X_coord, Y_coord, tol=0.01):
+    """
+    X_interp for the track: spline through (X_interp, Spline(X_interp)) within tol of the PCHIP
+    """
+    d = pchip_slopes(X_coord, Y_coord)
+    exact = lambda x: pchip_eval(X_coord, Y_coord, d, x)[0]
+    fit = lambda x: interpolate.CubicSpline(x, exact(x))
+    return _refine(X_coord, exact, fit, tol)
+
+
+def cycloid_point(theta, radius=Radius_Cycl):
+    theta = np.asarray(theta, dtype=float)
+    return np.stack((radius*(theta - np.sin(theta)), -radius*(1 - np.cos(theta))), axis=-1)
+
+
+def _cycloid_spline(theta, radius=Radius_Cycl):
+    # End slopes of the exact cycloid: (0, 0) at theta=0, R*(1 - cos, sin) at the end
+    End = theta[-1]
+    return interpolate.CubicSpline(theta, cycloid_point(theta, radius), bc_type=(
+        (1, [0., 0.]), (1, [radius*(1 - np.cos(End)), -radius*np.sin(End)])))
+
+
+def adaptive_theta(tol=0.01, radius=Radius_Cycl, theta_end=np.pi):
+    """
+    theta values for the cycloid: spline through the points within tol of the cycloid
+    theta_end and radius of other endpoints from Cycloid_Reference.cycloid_params
+    """
+    return _refine([0., theta_end/2, theta_end], lambda t: cycloid_point(t, radius),
+                   lambda t: _cycloid_spline(t, radius), tol)
+
+
+def spline_drop_time(Spline, t):
+    """
+    Descent time along a spline curve (x(t), y(t)) with breakpoints t, starting at y=0
+    The first interval uses t = t0 + h*u^2 to remove the start singularity.
+    """
+    h = np.diff(t)
+    Time = 0.
+    for i in range(len(h)):
+        if i == 0:
+            u = Gauss_pts
+            tq = t[0] + h[0]*u**2
+            Jac = 2*h[0]*u
+        else:
+            tq = t[i] + h[i]*Gauss_pts
+            Jac = h[i]
+        P, dP = Spline(tq), Spline(tq, 1)
+        if P.ndim == 1:
+            # y(x) spline, x is the parameter
+            P = np.column_stack((tq, P))
+            dP = np.column_stack((np.ones_like(tq), dP))
+        Speed = np.sqrt(np.maximum(-2*Gravity*P[:, 1], 1e-300))
+        Time += np.sum(Gauss_wts*Jac*np.linalg.norm(dP, axis=1)/Speed)
+    return Time
+
+
+def track_resolution(s, tol=0.01):
+    """
+    Adaptive X_interp of design s and the drop-time error of the spline through it
+    Returns X_interp, Y_interp, drop time along the spline - exact drop time
+    """
+    X_coord, Y_coord = track_knots(s)
+    X_interp = adaptive_x(X_coord, Y_coord, tol)
+    Y_interp = pchip_eval(X_coord, Y_coord, pchip_slopes(X_coord, Y_coord), X_interp)[0]
+    Error = spline_drop_time(interpolate.CubicSpline(X_interp, Y_interp), X_interp) - drop_time(s)
+    return X_interp, Y_interp, Error
+
+
+def cycloid_resolution(tol=0.01):
+    """
+    Adaptive theta of the cycloid and the drop-time error of the spline through it
+    """
+    theta = adaptive_theta(tol)
+    return theta, spline_drop_time(_cycloid_spline(theta), theta) - cycloid_drop_time()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Adaptive spline points of the track and cycloid')
+    parser.add_argument('s', type=float, nargs=5, help='s1 s2 s3 s4 s5')
+    parser.add_argument('--tol', type=float, default=0.01, help='max deviation [mm]')
+    args = parser.parse_args()
+    X_interp, Y_interp, Error = track_resolution(args.s, args.tol)
+    print('Track   : %d points, drop-time error %.2e s' % (len(X_interp), Error))
+    X_fixed = np.linspace(0., X_end, num=50)
+    X_coord, Y_coord = track_knots(args.s)
+    Y_fixed = pchip_eval(X_coord, Y_coord, pchip_slopes(X_coord, Y_coord), X_fixed)[0]
+    print('          (50 points: drop-time error %.2e s)' % (spline_drop_time(
+        interpolate.CubicSpline(X_fixed, Y_fixed), X_fixed) - drop_time(args.s)))
+    theta, Error = cycloid_resolution(args.tol)
+    print('Cycloid : %d points, drop-time error %.2e s' % (len(theta), Error))
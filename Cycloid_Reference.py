@@ -0,0 +1,182 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script computes the reference brachistochrone (cycloid) between any two points
+
+Pre_Processing.py draws the cycloid of radius 50 for theta in [0, pi], which ends exactly
+at (50*pi, -100.0) only. For a start (x0, y0) and an end with dx = x1 - x0, dy = y0 - y1:
+    x = x0 + R*(theta - sin(theta)),  y = y0 - R*(1 - cos(theta)),  theta in [0, theta_end]
+theta_end solves (theta - sin(theta))/(1 - cos(theta)) = |dx|/dy, the left side rises
+monotonically from 0 to infinity on (0, 2*pi). R = dy/(1 - cos(theta_end)) and the
+analytic descent time from rest is T = theta_end*sqrt(R/g).
+- dy = 0: theta_end = 2*pi (full arch), dx = 0: free fall, T = sqrt(2*dy/g)
+- dx < 0: mirrored cycloid, dy < 0: unreachable from rest, NaN
+
+Root finding: Newton on all endpoints at once, every iterate kept inside a bisection
+bracket, converged endpoints dropped from the iteration. theta - sin(theta) uses its
+series near 0 and 1 - cos(theta) = 2*sin(theta/2)^2, so neither cancels.
+Results are memoized by (dx, dy) in a sorted key array: a batch is reduced to its
+distinct endpoints, looked up by binary search, and only the ones never seen before are
+solved, so sweeps over track geometries cost a lookup.
+
+Run command:
+python Cycloid_Reference.py 157.0796 -100
+python Cycloid_Reference.py --bench 1000000
+"""
+import numpy as np
+
+from Drop_Time_Model import Gravity, X_end, Y_end
+
+Tol = 4e-15
+Max_iterations = 60
+Series_theta = 1e-2
+Max_memo = 10**6
+
+# Sorted keys dx + 1j*dy and their (radius, theta_end)
+_Memo = dict(keys=np.empty(0, dtype=complex), values=np.empty((0, 2)))
+
+
+def clear_memo():
+    _Memo.update(keys=np.empty(0, dtype=complex), values=np.empty((0, 2)))
+
+
+def _cycloid_terms(theta):
+    """
+    theta - sin(theta) (series below Series_theta) and 1 - cos(theta)
+    """
+    t2 = theta**2
+    A = np.where(theta < Series_theta, theta*t2/6*(1 - t2/20*(1 - t2/42)), theta - np.sin(theta))
+    return A, 2*np.sin(0.5*theta)**2
+
+
+def solve_theta(q):
+    """
+    theta_end in (0, 2*pi) of (theta - sin(theta))/(1 - cos(theta)) = q for an array q > 0
+    """
+    q = np.asarray(q, dtype=float)
+    Shape = q.shape
+    Lo, Hi = np.zeros_like(q), np.full_like(q, 2*np.pi)
+    # Small q: theta/3 ~ q, large q: 4*pi/(2*pi - theta)^2 ~ q
+    with np.errstate(divide='ignore'):
+        theta = np.where(q < 1, 3*q, 2*np.pi - np.sqrt(4*np.pi/q))
+    theta = np.clip(theta, 1e-300, 2*np.pi*(1 - 1e-16))
+    Active = np.arange(q.size)
+    theta, Lo, Hi, q = theta.ravel(), Lo.ravel(), Hi.ravel(), q.ravel()
+    for _ in range(Max_iterations):
+        t, l, u = theta[Active], Lo[Active], Hi[Active]
+        A, B = _cycloid_terms(t)
+        h = A/B - q[Active]
+        l, u = np.where(h < 0, t, l), np.where(h < 0, u, t)
+        # d/dtheta of A/B, 1/3 + theta^2/60 near 0
+        dh = np.where(t < Series_theta, 1./3 + t**2/60, (B**2 - A*np.sin(t))/B**2)
+        New = t - h/dh
+        New = np.where((New >= l) & (New <= u), New, 0.5*(l + u))
+        theta[Active], Lo[Active], Hi[Active] = New, l, u
+        Active = Active[np.abs(New - t) > Tol*New]
+        if len(Active) == 0:
+            break
+    return theta.reshape(Shape)
+
+
+def _solve(dx, dy):
+    """
+    (radius, theta_end) of the endpoints (|dx|, dy), special cases included
+    """
+    R, theta = np.full(dx.shape, np.nan), np.full(dx.shape, np.nan)
+    Arc = (dx > 0) & (dy > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        theta[Arc] = solve_theta(dx[Arc]/dy[Arc])
+        R[Arc] = dy[Arc]/_cycloid_terms(theta[Arc])[1]
+    Flat = (dx > 0) & (dy == 0)
+    theta[Flat], R[Flat] = 2*np.pi, dx[Flat]/(2*np.pi)
+    # dx/dy so small that 1 - cos(theta_end) underflows: free fall as well
+    Fall = ((dx == 0) & (dy >= 0)) | (Arc & ~np.isfinite(R))
+    theta[Fall], R[Fall] = 0., 0.
+    return R, theta
+
+
+def cycloid_params(start, end, gravity=Gravity):
+    """
+    radius, theta_end and descent time [s] of the brachistochrone from start to end
+    start, end: (2,) or (N, 2); memoized by (dx, dy)
+    """
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    Shape = np.broadcast(start, end).shape[:-1]
+    D = np.broadcast_to(np.stack((np.abs(end[..., 0] - start[..., 0]),
+                                  start[..., 1] - end[..., 1]), axis=-1), Shape + (2,))
+    Keys, Inverse = np.unique(D[..., 0] + 1j*D[..., 1], return_inverse=True)
+    if len(_Memo['keys']):
+        Index = np.minimum(np.searchsorted(_Memo['keys'], Keys), len(_Memo['keys']) - 1)
+        New = _Memo['keys'][Index] != Keys
+    else:
+        New = np.ones(len(Keys), dtype=bool)
+    if New.any():
+        if len(_Memo['keys']) + New.sum() > Max_memo:
+            # Start over with the whole batch, its memoized keys are dropped too
+            clear_memo()
+            New = np.ones(len(Keys), dtype=bool)
+        R, theta = _solve(Keys[New].real, Keys[New].imag)
+        All = np.concatenate((_Memo['keys'], Keys[New]))
+        Order = np.argsort(All, kind='mergesort')
+        _Memo.update(keys=All[Order], values=np.concatenate(
+            (_Memo['values'], np.column_stack((R, theta))))[Order])
+    Values = _Memo['values'][np.searchsorted(_Memo['keys'], Keys)][Inverse.ravel()]
+    R, theta = Values[:, 0].reshape(Shape), Values[:, 1].reshape(Shape)
+    Time = np.where(R > 0, theta*np.sqrt(R/gravity), np.sqrt(2*np.maximum(D[..., 1], 0.)/gravity))
+    return R, theta, np.where(np.isnan(R), np.nan, Time)
+
+
+def reference_curve(start, end, num=20, gravity=Gravity):
+    """
+    (..., num, 2) points of the brachistochrone from start to end, uniform in theta,
+    and its descent time
+    """
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    R, theta_end, Time = cycloid_params(start, end, gravity)
+    theta = theta_end[..., None]*np.linspace(0., 1., num)
+    A, B = _cycloid_terms(theta)
+    Sign = np.where(end[..., 0] < start[..., 0], -1., 1.)[..., None]
+    x = start[..., 0, None] + Sign*R[..., None]*A
+    y = start[..., 1, None] - R[..., None]*B
+    # Free fall: straight down
+    Fall = (R == 0)[..., None]
+    y = np.where(Fall, start[..., 1, None] + (end[..., 1, None] - start[..., 1, None])*
+                 np.linspace(0., 1., num), y)
+    return np.stack((x, y), axis=-1), Time
+
+
+def optimality_gap(drop_time, start=(0., 0.), end=(X_end, Y_end), gravity=Gravity):
+    """
+    Drop time minus the brachistochrone time of the same endpoints [s]
+    """
+    return np.asarray(drop_time, dtype=float) - cycloid_params(start, end, gravity)[2]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description='Brachistochrone between two points')
+    parser.add_argument('end', type=float, nargs='*', default=[X_end, Y_end], help='x1 y1')
+    parser.add_argument('--start', type=float, nargs=2, default=[0., 0.], help='x0 y0')
+    parser.add_argument('--bench', type=int, default=0, help='number of random endpoints to time')
+    args = parser.parse_args()
+    if args.bench:
+        Rng = np.random.default_rng(0)
+        End = np.column_stack((Rng.uniform(1., 400., args.bench), -Rng.uniform(1., 200., args.bench)))
+        for Label in ('solve', 'memo'):
+            if Label == 'solve':
+                clear_memo()
+            Start = time.perf_counter()
+            R, theta, T = cycloid_params((0., 0.), End)
+            Elapsed = time.perf_counter() - Start
+            print('%-5s %8d endpoints  %.3f s  %.3g endpoints/s' % (
+                Label, args.bench, Elapsed, args.bench/Elapsed))
+        A, B = _cycloid_terms(theta)
+        print('max endpoint error  %.2e mm' % np.max(np.abs(np.column_stack((R*A, -R*B)) - End)))
+    else:
+        R, theta, T = cycloid_params(args.start, args.end)
+        print('Radius      : %.6f mm' % R)
+        print('theta_end   : %.9f rad (%.6f pi)' % (theta, theta/np.pi))
+        print('Descent time: %.9f s' % T)
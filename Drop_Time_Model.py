@@ -0,0 +1,323 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script computes the drop time of a design without Abaqus
+The track is rebuilt exactly as in Pre_Processing.py
+
+1. s = [s1, s2, s3, s4, s5] -> Y_coord recurrence, scaled so that the end point is (50*pi, -100.0)
+2. PchipInterpolator through (X_coord, Y_coord)
+3. Frictionless descent time by energy conservation
+
+   t = integral of ds/sqrt(2*g*(-y)) from x=0 to x=50*pi
+
+The integrand is singular at the start (y=0), so the first segment is integrated
+after substitution x = h*u^2 which removes the 1/sqrt(x) singularity.
+Remaining segments are integrated with Gauss-Legendre quadrature.
+
+Units follow the Abaqus model (mm, s), i.e., g = 9800 mm/s^2
+
+drop_time_grad gives the exact gradient dt/ds by forward differentiation of every step
+(knot recurrence and scaling, PCHIP slopes, integrand) on the same quadrature.
+The scaling assumes s >= 0 (the last knot is the lowest); at flat or sign-changing
+segments (e.g. s2 = 0) PCHIP is not differentiable and the one-sided branch is returned.
+"""
+import numpy as np
+
+# Model constants (same as Pre_Processing.py)
+Gravity = 9800.
+X_end = np.pi*50.
+Y_end = -100.
+Radius_Cycl = 50.
+Num_interp = 50
+# Sketch points per segment of finer tracks (at least Num_interp points in total)
+Points_per_segment = 4
+Num_gauss = 16
+# Designs per vectorized pass of drop_time_batch
+Num_chunk = 8192
+
+# Gauss-Legendre points on [0, 1]
+Gauss_pts, Gauss_wts = np.polynomial.legendre.leggauss(Num_gauss)
+Gauss_pts = 0.5*(Gauss_pts + 1.)
+Gauss_wts = 0.5*Gauss_wts
+
+
+def track_knots(s):
+    """
+    Return X_coord, Y_coord of the track knots for s = [s1, ..., s5]
+
+    Same as the for-loop in Pre_Processing.py, written as a cumulative product:
+    y_i - y_i-1 = (y_i-1 - y_i-2)*si, starting from Y_coord[1] = 0.1
+    s may be an (N, 5) array, then Y_coord is (N, 7) and X_coord is shared
+    Any number of ratios n gives n+1 segments (see Track_Parameterization.py)
+    """
+    s = np.asarray(s, dtype=float)
+    X_coord = np.linspace(0, X_end, endpoint=True, num=s.shape[-1]+2)
+    One = np.ones(s.shape[:-1] + (1,))
+    dY = 0.1*np.cumprod(np.concatenate((One, s), axis=-1), axis=-1)
+    Y_coord = np.concatenate((0.*One, np.cumsum(dY, axis=-1)), axis=-1)
+    # Scale Y values
+    Y_coord = Y_coord/Y_coord.max(axis=-1, keepdims=True)*Y_end
+    return X_coord, Y_coord
+
+
+def pchip_slopes(X_coord, Y_coord):
+    """
+    Knot derivatives of the monotone cubic (same as scipy.interpolate.PchipInterpolator)
+    Y_coord may hold one design per row
+    """
+    h = np.diff(X_coord)
+    m = np.diff(Y_coord, axis=-1)/h
+    d = np.zeros_like(Y_coord)
+    # Interior points: weighted harmonic mean, zero at local extremum or flat segment
+    w1 = 2*h[1:] + h[:-1]
+    w2 = h[1:] + 2*h[:-1]
+    m0, m1 = m[..., :-1], m[..., 1:]
+    flat = (m1 == 0) | (m0 == 0) | (np.sign(m1) != np.sign(m0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        whmean = (w1/m0 + w2/m1)/(w1 + w2)
+        d[..., 1:-1] = np.where(flat, 0., 1./whmean)
+    # End points: one-sided three-point estimate
+    d[..., 0] = _pchip_edge(h[0], h[1], m[..., 0], m[..., 1])
+    d[..., -1] = _pchip_edge(h[-1], h[-2], m[..., -1], m[..., -2])
+    return d
+
+
+def _pchip_edge(h0, h1, m0, m1):
+    d = ((2*h0 + h1)*m0 - h0*m1)/(h0 + h1)
+    d = np.where(np.sign(d) != np.sign(m0), 0., d)
+    return np.where((np.sign(m0) != np.sign(m1)) & (abs(d) > abs(3*m0)), 3*m0, d)
+
+
+def pchip_eval(X_coord, Y_coord, d, x, k=None):
+    """
+    Evaluate the cubic Hermite spline and its slope at x
+    For (N, n) knot values, x is a grid shared by all designs and the result is (N, len(x))
+    k: interval of every x if already known (skips the search)
+    """
+    x = np.asarray(x, dtype=float)
+    if k is None:
+        k = np.clip(np.searchsorted(X_coord, x, side='right') - 1, 0, len(X_coord)-2)
+    h = X_coord[k+1] - X_coord[k]
+    t = (x - X_coord[k])/h
+    y0, y1, d0, d1 = Y_coord[..., k], Y_coord[..., k+1], d[..., k], d[..., k+1]
+    y = ((2*t**3 - 3*t**2 + 1)*y0 + (t**3 - 2*t**2 + t)*h*d0
+         + (-2*t**3 + 3*t**2)*y1 + (t**3 - t**2)*h*d1)
+    dydx = ((6*t**2 - 6*t)*(y0 - y1)/h + (3*t**2 - 4*t + 1)*d0
+            + (3*t**2 - 2*t)*d1)
+    return y, dydx
+
+
+def sketch_num(X_coord):
+    """
+    Number of sketch points for knots X_coord: Num_interp, more for finer tracks
+    """
+    return max(Num_interp, Points_per_segment*(len(X_coord) - 1) + 1)
+
+
+def track_curve(s, num=None):
+    """
+    Coord_curve of Pre_Processing.py, (num, 2) array of X_interp, Y_interp
+    For (N, 5) s, returns X_interp (num,) and Y_interp (N, num) instead
+    num defaults to sketch_num (50 points for s1..s5)
+    """
+    X_coord, Y_coord = track_knots(s)
+    num = num or sketch_num(X_coord)
+    X_interp = np.linspace(0.0, X_end, num=num, endpoint=True)
+    Y_interp, _ = pchip_eval(X_coord, Y_coord, pchip_slopes(X_coord, Y_coord), X_interp)
+    if Y_interp.ndim > 1:
+        return X_interp, Y_interp
+    return np.stack((X_interp, Y_interp), axis=1)
+
+
+def cycloid_curve(num=20):
+    """
+    Coord_curve_2 of Pre_Processing.py, (num, 2) array of the reference cycloid
+    """
+    theta = np.linspace(0., np.pi, endpoint=True, num=num)
+    X_coord_Cycl = Radius_Cycl*(theta - np.sin(theta))
+    Y_coord_Cycl = -Radius_Cycl*(1 - np.cos(theta))
+    return np.stack((X_coord_Cycl, Y_coord_Cycl), axis=1)
+
+
+def cycloid_drop_time():
+    """
+    Analytic descent time of the cycloid from (0, 0) to (50*pi, -100.0)
+    """
+    return np.pi*np.sqrt(Radius_Cycl/Gravity)
+
+
+def drop_time(s):
+    """
+    Frictionless descent time [s] along the PCHIP track defined by s = [s1, ..., s5]
+    For (N, 5) s, all designs are evaluated at once and an (N,) array is returned
+    """
+    return knot_drop_time(*track_knots(s))
+
+
+def knot_drop_time(X_coord, Y_coord):
+    """
+    Descent time along the PCHIP through any knots starting at (0, 0), Y_coord (n,) or (N, n)
+    O(n) per design: 16 Gauss points per segment, intervals known in advance
+    """
+    d = pchip_slopes(X_coord, Y_coord)
+    h = np.diff(X_coord)
+    # First segment: x = h*u^2, dx = 2*h*u*du
+    u = Gauss_pts
+    y, dydx = pchip_eval(X_coord, Y_coord, d, h[0]*u**2, np.zeros(Num_gauss, dtype=int))
+    Time = np.sum(Gauss_wts*2*h[0]*u*np.sqrt((1 + dydx**2)/(-2*Gravity*y)), axis=-1)
+    # Remaining segments
+    x = (X_coord[1:-1, None] + h[1:, None]*Gauss_pts).ravel()
+    y, dydx = pchip_eval(X_coord, Y_coord, d, x, np.repeat(np.arange(1, len(h)), Num_gauss))
+    f = np.sqrt((1 + dydx**2)/(-2*Gravity*y))
+    f = f.reshape(f.shape[:-1] + (len(h)-1, Num_gauss))
+    Time = Time + np.sum(h[1:]*np.sum(Gauss_wts*f, axis=-1), axis=-1)
+    return Time
+
+
+def drop_time_batch(S, chunk=Num_chunk, out=None):
+    """
+    Drop times of an (N, 5) array of designs, evaluated in chunks of rows
+
+    Memory use is bounded by the chunk size, so S may be a np.memmap of a
+    large sweep. Results are written to out (N,) if given.
+    """
+    N = len(S)
+    if out is None:
+        out = np.empty(N)
+    for i in range(0, N, chunk):
+        out[i:i+chunk] = drop_time(S[i:i+chunk])
+    return out
+
+
+def track_knots_grad(s):
+    """
+    X_coord, Y_coord and dY_coord/ds, shape (..., n_knots, n_s)
+    """
+    s = np.asarray(s, dtype=float)
+    X_coord, Y_coord = track_knots(s)
+    n = s.shape[-1]
+    One = np.ones(s.shape[:-1] + (1,))
+    # d(cumprod)/ds_i: cumulative product with s_i replaced by 1, zero up to and including i
+    dP = np.zeros(s.shape[:-1] + (n + 1, n))
+    for i in range(n):
+        s_i = s.copy()
+        s_i[..., i] = 1.
+        dP[..., i+1:, i] = np.cumprod(np.concatenate((One, s_i), axis=-1), axis=-1)[..., i+1:]
+    dY = np.concatenate((np.zeros(s.shape[:-1] + (1, n)), np.cumsum(0.1*dP, axis=-2)), axis=-2)
+    # Unscaled Y_coord, its last value is the maximum
+    Y = np.concatenate((0.*One, np.cumsum(0.1*np.cumprod(
+        np.concatenate((One, s), axis=-1), axis=-1), axis=-1)), axis=-1)
+    Y_last, dY_last = Y[..., -1:, None], dY[..., -1:, :]
+    dY_coord = Y_end*(dY*Y_last - Y[..., None]*dY_last)/Y_last**2
+    return X_coord, Y_coord, dY_coord
+
+
+def pchip_slopes_grad(X_coord, Y_coord, dY_coord):
+    """
+    Knot derivatives d of pchip_slopes and dd/ds, shape (..., n_knots, n_s)
+    """
+    h = np.diff(X_coord)
+    m = np.diff(Y_coord, axis=-1)/h
+    dm = np.diff(dY_coord, axis=-2)/h[:, None]
+    d = pchip_slopes(X_coord, Y_coord)
+    dd = np.zeros_like(dY_coord)
+    w1 = 2*h[1:] + h[:-1]
+    w2 = h[1:] + 2*h[:-1]
+    m0, m1 = m[..., :-1], m[..., 1:]
+    flat = (m1 == 0) | (m0 == 0) | (np.sign(m1) != np.sign(m0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Den = (w1/m0 + w2/m1)**2
+        c0 = np.where(flat, 0., (w1 + w2)*w1/m0**2/Den)
+        c1 = np.where(flat, 0., (w1 + w2)*w2/m1**2/Den)
+    dd[..., 1:-1, :] = c0[..., None]*dm[..., :-1, :] + c1[..., None]*dm[..., 1:, :]
+    dd[..., 0, :] = _pchip_edge_grad(h[0], h[1], m[..., 0], m[..., 1], dm[..., 0, :], dm[..., 1, :])
+    dd[..., -1, :] = _pchip_edge_grad(h[-1], h[-2], m[..., -1], m[..., -2],
+                                      dm[..., -1, :], dm[..., -2, :])
+    return d, dd
+
+
+def _pchip_edge_grad(h0, h1, m0, m1, dm0, dm1):
+    d = ((2*h0 + h1)*m0 - h0*m1)/(h0 + h1)
+    dd = ((2*h0 + h1)*dm0 - h0*dm1)/(h0 + h1)
+    Zero = (np.sign(d) != np.sign(m0))[..., None]
+    Clip = ((np.sign(m0) != np.sign(m1)) & (abs(d) > abs(3*m0)))[..., None]
+    return np.where(Zero, 0., np.where(Clip, 3*dm0, dd))
+
+
+def pchip_basis(X_coord, x):
+    """
+    Matrices of pchip_eval as a linear map of the knot values and slopes:
+    y = Y_coord @ A + d @ B, dydx = Y_coord @ dA + d @ dB, each (n_knots, len(x))
+    """
+    x = np.asarray(x, dtype=float)
+    k = np.clip(np.searchsorted(X_coord, x, side='right') - 1, 0, len(X_coord)-2)
+    h = X_coord[k+1] - X_coord[k]
+    t = (x - X_coord[k])/h
+    A, B, dA, dB = np.zeros((4, len(X_coord), len(x)))
+    j = np.arange(len(x))
+    A[k, j], A[k+1, j] = 2*t**3 - 3*t**2 + 1, -2*t**3 + 3*t**2
+    B[k, j], B[k+1, j] = (t**3 - 2*t**2 + t)*h, (t**3 - t**2)*h
+    dA[k, j], dA[k+1, j] = (6*t**2 - 6*t)/h, -(6*t**2 - 6*t)/h
+    dB[k, j], dB[k+1, j] = 3*t**2 - 4*t + 1, 3*t**2 - 2*t
+    return A, B, dA, dB
+
+
+def drop_time_grad(s):
+    """
+    Drop time and its exact gradient with respect to s = [s1, ..., s5] (forward mode)
+    For (N, 5) s, returns (N,) drop times and (N, 5) gradients
+    """
+    X_coord, Y_coord, dY_coord = track_knots_grad(s)
+    d, dd = pchip_slopes_grad(X_coord, Y_coord, dY_coord)
+    h = np.diff(X_coord)
+    # Parameter axis in front of the knots, pchip_eval is linear in (Y_coord, d)
+    dY_k, dd_k = np.swapaxes(dY_coord, -1, -2), np.swapaxes(dd, -1, -2)
+    # First segment x = h*u^2 (dx = 2*h*u*du), then Gauss points of the remaining segments
+    u = Gauss_pts
+    x = np.concatenate((h[0]*u**2, (X_coord[1:-1, None] + h[1:, None]*Gauss_pts).ravel()))
+    W = np.concatenate((Gauss_wts*2*h[0]*u, (h[1:, None]*Gauss_wts).ravel()))
+    A, B, dA, dB = pchip_basis(X_coord, x)
+    y, dydx = Y_coord @ A + d @ B, Y_coord @ dA + d @ dB
+    dy, ddydx = dY_k @ A + dd_k @ B, dY_k @ dA + dd_k @ dB
+    F = W*np.sqrt((1 + dydx**2)/(-2*Gravity*y))
+    # dF = F*(y'*dy'/(1 + y'^2) - dy/(2*y))
+    dlnF = (dydx/(1 + dydx**2))[..., None, :]*ddydx - (0.5/y)[..., None, :]*dy
+    return np.sum(F, axis=-1), np.sum(F[..., None, :]*dlnF, axis=-1)
+
+
+def drop_time_grad_batch(S, chunk=Num_chunk//2, out=None):
+    """
+    Drop times (N,) and gradients (N, n) of an (N, n) array of designs, in chunks of rows
+    """
+    N = len(S)
+    if out is None:
+        out = np.empty(N), np.empty(S.shape)
+    for i in range(0, N, chunk):
+        out[0][i:i+chunk], out[1][i:i+chunk] = drop_time_grad(S[i:i+chunk])
+    return out
+
+
+def iter_drop_time(Blocks):
+    """
+    Stream drop times for an iterable of (n, 5) blocks of designs
+    """
+    for S in Blocks:
+        yield drop_time(S)
+
+
+if __name__ == '__main__':
+    import time
+    s = [0.2, 0.326, 0.579, 0.8, 0.674]
+    print('Drop time (track)   : %.6f s' % drop_time(s))
+    print('Drop time (cycloid) : %.6f s' % cycloid_drop_time())
+    S = np.random.default_rng(0).random((10**6, 5))
+    Start = time.perf_counter()
+    drop_time_batch(S)
+    print('Throughput          : %.3g designs/s' % (len(S)/(time.perf_counter() - Start)))
+    # Gradient against central finite differences
+    _, Grad = drop_time_grad(s)
+    FD = [(drop_time(s + 1e-6*e) - drop_time(s - 1e-6*e))/2e-6 for e in np.eye(5)]
+    print('Gradient            : %s' % np.round(Grad, 6))
+    print('Max |grad - FD|     : %.2e' % np.max(np.abs(Grad - FD)))
@@ -0,0 +1,240 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script writes Ball_Drop.inp for a new s = [s1, ..., s5] without Abaqus/CAE
+
+Only the Track part changes between designs. A base deck (written once by Pre_Processing.py)
+provides the ball mesh, the cycloid track and all other keywords; the nodes and R3D4
+elements of the Track part are regenerated from the new curve:
+
+1. Spline through the guide points and Coord_curve (chord-length cubic spline)
+2. Offset of the spline by 10.1 to the right, end cap of 5.0 x 10.1 at x=50*pi
+3. Profile edges seeded by size 5.0 (same as seedEdgeBySize), extruded by 20.0 in z
+
+Assumptions on the base deck (as written by CAE):
+- The Track part block is '*Part, name=Track' ... '*End Part'
+- Its first *Node block holds the mesh nodes, followed by '*Element, type=R3D4'
+- Further *Node blocks in the part (reference point) are renumbered after the new mesh,
+  also in *Nset blocks of the part and of its instances in the assembly
+- 'generate' ranges that spanned the old mesh are updated to the new one,
+  element sets listing individual elements of the track are not supported
+With --plan, the step time, increment ('*Dynamic, Explicit' data line) and the field
+output intervals ('*Output, field, number interval=') are set by Step_Planner.py
+Settings.json is written next to the deck, as by Pre_Processing.py (Result_Cache.py);
+the base deck is assumed to have the default settings otherwise (step, cycloid, no halt)
+
+Run command:
+python Inp_Writer.py 0.2 0.326 0.579 0.8 0.674 --base Ball_Drop_Base.inp --output Ball_Drop.inp --plan
+"""
+import re
+
+import numpy as np
+from scipy import interpolate
+
+from Drop_Time_Model import track_curve
+
+Guide = np.array([[0, 20], [0, 15], [0, 10], [0, 5], [0, 2.5]])
+Offset = 10.1
+Cap_width = 5.0
+Depth = 20.0
+Seed = 5.0
+
+
+def _resample(Points, seed):
+    """
+    Points at equal arc length along a polyline, ceil(length/seed) segments
+    """
+    L = np.concatenate(([0.], np.cumsum(np.linalg.norm(np.diff(Points, axis=0), axis=1))))
+    n = max(int(np.ceil(L[-1]/seed - 1e-9)), 1)
+    Li = np.linspace(0., L[-1], n + 1)
+    return np.column_stack((np.interp(Li, L, Points[:, 0]), np.interp(Li, L, Points[:, 1])))
+
+
+def track_profile(Coord, offset=Offset, seed=Seed, refine=20):
+    """
+    Seeded profile of the track as open chains of (x, y) points:
+    [offset curve, end cap -> spline (reversed)]
+    The offset curve is not joined to the end cap unless the track ends horizontally,
+    same as the sketch of Pre_Processing.py
+    """
+    Coord = np.asarray(Coord, dtype=float)
+    Chord = np.concatenate(([0.], np.cumsum(np.linalg.norm(np.diff(Coord, axis=0), axis=1))))
+    Spline = interpolate.CubicSpline(Chord, Coord)
+    t = np.linspace(0., Chord[-1], refine*(len(Coord) - 1) + 1)
+    Curve = Spline(t)
+    Tangent = Spline(t, 1)
+    Tangent = Tangent/np.linalg.norm(Tangent, axis=1)[:, None]
+    # Right side of the direction of travel
+    Curve_offset = Curve + offset*np.column_stack((Tangent[:, 1], -Tangent[:, 0]))
+    x_end, y_end = Coord[-1]
+    Cap = np.array([[x_end, y_end - offset], [x_end + Cap_width, y_end - offset],
+                    [x_end + Cap_width, y_end], [x_end, y_end]])
+    Edges = [_resample(Cap[i:i+2], seed) for i in range(len(Cap) - 1)]
+    Edges.append(_resample(Curve[::-1], seed))
+    Chain = np.concatenate([Edges[0]] + [Edge[1:] for Edge in Edges[1:]])
+    return [_resample(Curve_offset, seed), Chain]
+
+
+def track_mesh(Coord, offset=Offset, depth=Depth, seed=Seed):
+    """
+    Nodes (n, 3) and R3D4 connectivity (m, 4, 1-based) of the extruded track
+    """
+    Z = np.linspace(0., depth, max(int(np.ceil(depth/seed - 1e-9)), 1) + 1)
+    Nodes, Elements = [], []
+    n_start = 0
+    for Profile in track_profile(Coord, offset, seed):
+        n_p, n_z = len(Profile), len(Z)
+        Nodes.append(np.column_stack((np.tile(Profile, (n_z, 1)), np.repeat(Z, n_p))))
+        i, k = np.meshgrid(np.arange(n_p - 1), np.arange(n_z - 1), indexing='ij')
+        i, k = i.ravel(), k.ravel()
+        Elements.append(np.column_stack((k*n_p + i, k*n_p + i + 1, (k + 1)*n_p + i + 1,
+                                         (k + 1)*n_p + i)) + n_start + 1)
+        n_start += n_p*n_z
+    return np.concatenate(Nodes), np.concatenate(Elements)
+
+
+def design_coord(s, num=None):
+    """
+    Coord of Pre_Processing.py: guide points followed by the PCHIP curve
+    """
+    return np.concatenate((Guide, track_curve(s, num)), axis=0)
+
+
+def _format_nodes(Nodes, Start=1):
+    return ''.join('%7d, %13.7g, %13.7g, %13.7g\n' % (Start + i, x, y, z)
+                   for i, (x, y, z) in enumerate(Nodes))
+
+
+def _format_elements(Elements):
+    return ''.join('%d, %d, %d, %d, %d\n' % ((i + 1,) + tuple(e)) for i, e in enumerate(Elements))
+
+
+def _keyword_blocks(Text):
+    """
+    Split deck text into blocks that start at a keyword line
+    """
+    Blocks = []
+    for Line in Text.splitlines(True):
+        if (Line.startswith('*') and not Line.startswith('**')) or not Blocks:
+            Blocks.append([Line])
+        else:
+            Blocks[-1].append(Line)
+    return Blocks
+
+
+def _remap_ids(Lines, Mapping):
+    Out = []
+    for Line in Lines:
+        Fields = Line.split(',')
+        Out.append(','.join(
+            Field.replace(Field.strip(), str(Mapping[int(Field)]))
+            if Field.strip().isdigit() and int(Field) in Mapping else Field
+            for Field in Fields))
+    return Out
+
+
+def replace_part_mesh(Deck, Nodes, Elements, part='Track'):
+    """
+    Return Deck (text) with the mesh of the given part replaced
+    """
+    Match = re.search(r'^\*Part, name=%s\s*$(.*?)^\*End Part' % re.escape(part), Deck,
+                      re.M | re.S | re.I)
+    if Match is None:
+        raise ValueError('Part %s not found in the base deck' % part)
+    n_old = e_old = None
+    Mapping = {}
+    Out = []
+    for Block in _keyword_blocks(Match.group(1)):
+        Key = Block[0].strip().lower()
+        Data = [L for L in Block[1:] if L.strip()]
+        if Key == '*node' and n_old is None:
+            n_old = len(Data)
+            Out.append(Block[0] + _format_nodes(Nodes))
+        elif Key == '*node':
+            # Reference point nodes follow the new mesh
+            Lines = []
+            for L in Data:
+                Old, Rest = L.split(',', 1)
+                Mapping[int(Old)] = len(Nodes) + len(Mapping) + 1
+                Lines.append('%7d,%s' % (Mapping[int(Old)], Rest))
+            Out.append(Block[0] + ''.join(Lines))
+        elif Key.startswith('*element') and e_old is None:
+            e_old = len(Data)
+            Out.append(Block[0] + _format_elements(Elements))
+        elif Key.startswith('*nset') and 'generate' not in Key:
+            Out.append(Block[0] + ''.join(_remap_ids(Block[1:], Mapping)))
+        elif 'generate' in Key and len(Data) == 1:
+            # Ranges over the whole old mesh
+            First, Last, Step = [int(F) for F in Data[0].split(',')[:3]]
+            Old, New = (n_old, len(Nodes)) if Key.startswith('*nset') else (e_old, len(Elements))
+            if First == 1 and Last == Old and Step == 1:
+                Data = [' 1, %d, 1\n' % New]
+            Out.append(Block[0] + ''.join(Data))
+        else:
+            Out.append(''.join(Block))
+    Deck = Deck[:Match.start(1)] + ''.join(Out) + Deck[Match.end(1):]
+    if not Mapping:
+        return Deck
+    # Assembly sets on instances of the part refer to the renumbered nodes
+    Instances = re.findall(r'^\*Instance, name=([^,\s]+), part=%s\s*$' % re.escape(part), Deck,
+                           re.M | re.I)
+    Out = []
+    for Block in _keyword_blocks(Deck):
+        Key = Block[0].strip().lower()
+        if Key.startswith('*nset') and 'generate' not in Key and any(
+                'instance=%s' % Name.lower() in Key.replace(' ', '') for Name in Instances):
+            Block = [Block[0]] + _remap_ids(Block[1:], Mapping)
+        Out.append(''.join(Block))
+    return ''.join(Out)
+
+
+def set_step(Deck, step_time, increment, intervals):
+    """
+    Return Deck (text) with the time period and fixed increment of the Explicit step
+    and the number of field output intervals replaced
+    """
+    Deck, n = re.subn(r'^(\*Dynamic, Explicit[^\n]*\n)[ \t]*[^,\n]+,[ \t]*[^,\n]+',
+                      lambda Match: '%s%r, %r' % (Match.group(1), increment, step_time),
+                      Deck, flags=re.M | re.I)
+    if n != 1:
+        raise ValueError('%d *Dynamic, Explicit steps in the base deck, expected 1' % n)
+    return re.sub(r'^(\*Output, field, number interval=)\d+', lambda Match: '%s%d' % (
+        Match.group(1), intervals), Deck, flags=re.M | re.I)
+
+
+def write_deck(s, base='Ball_Drop_Base.inp', output='Ball_Drop.inp', num=None, plan=False):
+    """
+    Write the input deck of design s from the base deck
+    plan: step time and increment from Step_Planner.plan_step
+    """
+    import json
+    import os
+    from Result_Cache import run_settings, Fixed_plan, Settings_file
+    Coord = design_coord(s, num)
+    Nodes, Elements = track_mesh(Coord)
+    with open(base, 'r') as file:
+        Deck = file.read()
+    Deck = replace_part_mesh(Deck, Nodes, Elements)
+    Plan = Fixed_plan
+    if plan:
+        from Step_Planner import plan_step
+        Plan = plan_step(s)
+        Deck = set_step(Deck, Plan['step_time'], Plan['increment'], Plan['intervals'])
+    with open(output, 'w') as file:
+        file.write(Deck)
+    with open(os.path.join(os.path.dirname(output), Settings_file), 'w') as file:
+        json.dump(run_settings(Plan, len(Coord) - len(Guide)), file, sort_keys=True)
+    return output
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Write Ball_Drop.inp for s1..s5 from a base deck')
+    parser.add_argument('s', type=float, nargs='+', help='s1 s2 s3 s4 s5 (any number of ratios)')
+    parser.add_argument('--base', default='Ball_Drop_Base.inp')
+    parser.add_argument('--output', default='Ball_Drop.inp')
+    parser.add_argument('--plan', action='store_true', help='step time from the predicted arrival')
+    args = parser.parse_args()
+    write_deck(args.s, args.base, args.output, plan=args.plan)
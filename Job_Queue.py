@@ -0,0 +1,227 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script runs many Ball_Drop designs with bounded concurrency
+
+Every design gets its own working directory (Jobs\\Run_i) and job name (Ball_Drop_i),
+so several Abaqus jobs can run at once. Job states (queued/running/done/failed) are
+kept in a small SQLite database; failed jobs are retried up to --retries times.
+
+Per job:
+1. Ball_Drop_i.inp is written from a base deck with Inp_Writer.py (--base), with the
+   step time planned from the predicted arrival if --plan (see Step_Planner.py)
+2. The solver command is run in the job directory, e.g.
+   abaqus job={job} input={inp} cpus={cpus} interactive ask_delete=no
+   followed by the post-processing command, which must leave Drop_Time.txt
+Commands are templates with {job}, {inp}, {cpus}, {workdir}, {root}, {s1}..{sN}
+(N = len(s)), so a local stub script can stand in for Abaqus. Commands that use {inp}
+need --base. A job whose launch fails (e.g. the deck cannot be written) is marked failed
+and the error goes to its Job.log.
+Stage timings of every job go to Jobs\\Run_i\\Trace.jsonl (see Run_Trace.py); to trace the
+solver as well, wrap it: --solver "python {root}/Run_Trace.py run --stage solver -- abaqus ..."
+
+Run command:
+python Job_Queue.py submit 0.2 0.326 0.579 0.8 0.674
+python Job_Queue.py run --max-jobs 16 --cpus 64 --cpus-per-job 4 --base Ball_Drop_Base.inp
+python Job_Queue.py collect --output Drop_Times.csv
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import time
+import traceback
+
+Queue_file = 'Job_Queue.db'
+Jobs_dir = 'Jobs'
+# Directory of the scripts, on PYTHONPATH of every job
+Root = os.path.dirname(os.path.abspath(__file__))
+Solver_command = 'abaqus job={job} input={inp} cpus={cpus} interactive ask_delete=no'
+Post_command = 'abaqus viewer noGUI={root}/Post_Processing.py'
+
+
+class JobQueue(object):
+    """
+    On-disk queue of designs and their job states
+    """
+    def __init__(self, path=Queue_file, jobs_dir=Jobs_dir):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.db = sqlite3.connect(path, timeout=30.)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            's TEXT, state TEXT, attempts INTEGER, returncode INTEGER, '
+            'drop_time REAL, submitted REAL, started REAL, finished REAL)')
+        self.db.commit()
+
+    def submit(self, s):
+        with self.db:
+            Cursor = self.db.execute(
+                'INSERT INTO jobs (s, state, attempts, submitted) VALUES (?, ?, 0, ?)',
+                (json.dumps([float(si) for si in s]), 'queued', time.time()))
+        return Cursor.lastrowid
+
+    def workdir(self, job_id):
+        return os.path.join(self.jobs_dir, 'Run_%d' % job_id)
+
+    def _set(self, job_id, **Values):
+        Columns = ', '.join('%s=?' % Key for Key in Values)
+        with self.db:
+            self.db.execute('UPDATE jobs SET %s WHERE id=?' % Columns,
+                            tuple(Values.values()) + (job_id,))
+
+    def next_queued(self):
+        Row = self.db.execute("SELECT id, s, attempts FROM jobs WHERE state='queued' "
+                              'ORDER BY id LIMIT 1').fetchone()
+        return None if Row is None else (Row[0], json.loads(Row[1]), Row[2])
+
+    def counts(self):
+        return dict(self.db.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+
+    def results(self):
+        return [(job_id, json.loads(s), drop_time) for job_id, s, drop_time in self.db.execute(
+            "SELECT id, s, drop_time FROM jobs WHERE state='done' ORDER BY id")]
+
+    def pending(self):
+        """
+        s of the queued and running jobs
+        """
+        return [json.loads(s) for (s,) in self.db.execute(
+            "SELECT s FROM jobs WHERE state IN ('queued', 'running') ORDER BY id")]
+
+    def _launch(self, job_id, s, attempts, commands, cpus, base, plan=False):
+        Dir = self.workdir(job_id)
+        if not os.path.isdir(Dir):
+            os.makedirs(Dir)
+        Job = 'Ball_Drop_%d' % job_id
+        Inp = Job + '.inp'
+        if base:
+            from Inp_Writer import write_deck
+            write_deck(s, base, os.path.join(Dir, Inp), plan=plan)
+        Fields = dict(job=Job, inp=Inp, cpus=cpus, workdir=Dir, root=Root)
+        Fields.update(('s%d' % (i + 1), si) for i, si in enumerate(s))
+        Command = ' && '.join(Template.format(**Fields) for Template in commands)
+        Env = dict(os.environ, BALL_DROP_JOB=Job,
+                   PYTHONPATH=os.pathsep.join(filter(None, (Root, os.environ.get('PYTHONPATH')))))
+        Log = open(os.path.join(Dir, 'Job.log'), 'ab')
+        Process = subprocess.Popen(Command, shell=True, cwd=Dir, env=Env,
+                                   stdout=Log, stderr=subprocess.STDOUT)
+        Log.close()
+        self._set(job_id, state='running', attempts=attempts + 1, started=time.time())
+        return Process
+
+    def _finish(self, job_id, attempts, returncode, retries):
+        Drop_Time = None
+        Path = os.path.join(self.workdir(job_id), 'Drop_Time.txt')
+        if returncode == 0 and os.path.exists(Path):
+            try:
+                with open(Path, 'r') as file:
+                    Drop_Time = float(file.read())
+            except ValueError:
+                pass
+        if Drop_Time is not None:
+            State = 'done'
+        elif attempts < retries + 1:
+            State = 'queued'
+        else:
+            State = 'failed'
+        self._set(job_id, state=State, returncode=returncode, drop_time=Drop_Time,
+                  finished=time.time())
+        return State
+
+    def run(self, max_jobs=1, cpus=None, cpus_per_job=1, retries=1, base=None,
+            commands=(Solver_command, Post_command), poll=1.0, plan=False):
+        """
+        Run queued jobs until the queue is empty, at most max_jobs at a time
+        and at most cpus cpus in total
+        """
+        if base is None and any('{inp}' in Template for Template in commands):
+            raise ValueError('Commands use {inp} but no base deck is given to write it')
+        cpus = cpus or os.cpu_count()
+        max_jobs = max(1, min(max_jobs, cpus//cpus_per_job))
+        # Jobs left running by a killed scheduler are started again
+        with self.db:
+            self.db.execute("UPDATE jobs SET state='queued' WHERE state='running'")
+        Running = {}
+        while True:
+            while len(Running) < max_jobs:
+                Next = self.next_queued()
+                if Next is None:
+                    break
+                job_id, s, attempts = Next
+                try:
+                    Process = self._launch(job_id, s, attempts, commands, cpus_per_job, base, plan)
+                except Exception:
+                    if os.path.isdir(self.workdir(job_id)):
+                        with open(os.path.join(self.workdir(job_id), 'Job.log'), 'a') as Log:
+                            Log.write(traceback.format_exc())
+                    self._set(job_id, state='failed', attempts=attempts + 1, finished=time.time())
+                    continue
+                Running[job_id] = (Process, attempts + 1)
+            if not Running:
+                break
+            time.sleep(poll)
+            for job_id, (Process, attempts) in list(Running.items()):
+                if Process.poll() is not None:
+                    self._finish(job_id, attempts, Process.returncode, retries)
+                    del Running[job_id]
+        return self.counts()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local job queue for Ball_Drop designs')
+    Sub = parser.add_subparsers(dest='command')
+    Submit = Sub.add_parser('submit', help='queue designs')
+    Submit.add_argument('s', type=float, nargs='*', help='s1 s2 ... sN')
+    Submit.add_argument('--file', default=None, help='text/npy file with one s-vector per row')
+    Run = Sub.add_parser('run', help='run queued jobs')
+    Run.add_argument('--max-jobs', type=int, default=1)
+    Run.add_argument('--cpus', type=int, default=None, help='total cpu budget')
+    Run.add_argument('--cpus-per-job', type=int, default=1)
+    Run.add_argument('--retries', type=int, default=1)
+    Run.add_argument('--base', default=None, help='base deck for Inp_Writer.py')
+    Run.add_argument('--plan', action='store_true', help='plan the step time of every deck')
+    Run.add_argument('--solver', default=Solver_command)
+    Run.add_argument('--post', default=Post_command)
+    Run.add_argument('--poll', type=float, default=1.0, help='seconds between state checks')
+    Sub.add_parser('status', help='number of jobs per state')
+    Collect = Sub.add_parser('collect', help='drop times of finished jobs')
+    Collect.add_argument('--output', default=None, help='csv file')
+    for Each in (Submit, Run, Collect):
+        Each.add_argument('--db', default=Queue_file)
+        Each.add_argument('--jobs-dir', default=Jobs_dir)
+    args = parser.parse_args()
+
+    queue = JobQueue(getattr(args, 'db', Queue_file), getattr(args, 'jobs_dir', Jobs_dir))
+    if args.command == 'submit':
+        Designs = [args.s] if args.s else []
+        if args.file:
+            import numpy as np
+            Designs += (np.load(args.file) if args.file.endswith('.npy')
+                        else np.loadtxt(args.file, ndmin=2)).tolist()
+        for s in Designs:
+            queue.submit(s)
+        print('%d jobs queued' % len(Designs))
+    elif args.command == 'run':
+        Commands = [Command for Command in (args.solver, args.post) if Command]
+        print(queue.run(args.max_jobs, args.cpus, args.cpus_per_job, args.retries, args.base,
+                        Commands, args.poll, args.plan))
+    elif args.command == 'collect':
+        Results = queue.results()
+        n = max([len(s) for _, s, _ in Results] or [5])
+        Lines = ['%d,%s,%.8f' % (job_id, ','.join(['%g' % si for si in s] + ['']*(n - len(s))),
+                                 drop_time) for job_id, s, drop_time in Results]
+        if args.output:
+            Header = ','.join(['id'] + ['s%d' % (i + 1) for i in range(n)] + ['drop_time'])
+            with open(args.output, 'w') as file:
+                file.write(Header + '\n' + '\n'.join(Lines) + '\n')
+        else:
+            print('\n'.join(Lines))
+    else:
+        print(queue.counts())
+
+
+if __name__ == '__main__':
+    main()
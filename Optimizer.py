@@ -0,0 +1,386 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script optimizes s = [s1, ..., s5] without editing Pre_Processing.py by hand
+
+Strategies (ask/tell interface, all bounded to 0.0~1.0):
+nelder-mead : Nelder-Mead simplex, starts from the s values of Pre_Processing.py
+cmaes       : (mu/mu_w, lambda)-CMA-ES
+bayes       : Bayesian optimization, Gaussian-process surrogate + expected improvement
+surrogate   : Surrogate.py, Gaussian process updated incrementally with every result,
+              proposals conditioned on the evaluations in flight
+
+Each strategy hands out points with ask() -> (key, s) and receives drop times with
+tell(key, drop_time). ask() returns None when the strategy must wait for pending
+results, so several evaluations can be in flight at once.
+The optimizer state is pickled to a checkpoint file; a killed run resumes from it.
+
+Run command:
+python Optimizer.py --method cmaes --budget 300 --in-flight 4 --checkpoint Opt.pkl
+"""
+import argparse
+import os
+import pickle
+from concurrent import futures
+
+import numpy as np
+from scipy.stats import norm
+
+from Drop_Time_Model import drop_time, cycloid_drop_time
+from Surrogate import Surrogate, Num_cand
+
+# s values of Pre_Processing.py
+S_init = np.array([0.2, 0.326, 0.579, 0.8, 0.674])
+Lower = 0.0
+Upper = 1.0
+
+
+class Strategy(object):
+    """
+    Base class of ask/tell strategies
+    """
+    def __init__(self, dim=5, seed=0):
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+        self.pending = {}
+        self.next_key = 0
+
+    def _issue(self, x, role=None):
+        key = self.next_key
+        self.next_key += 1
+        self.pending[key] = (np.clip(x, Lower, Upper), role)
+        return key, self.pending[key][0]
+
+    def ask(self):
+        raise NotImplementedError
+
+    def tell(self, key, f):
+        raise NotImplementedError
+
+
+class NelderMead(Strategy):
+    """
+    Nelder-Mead simplex with the standard coefficients
+    The initial simplex and shrink steps are evaluated in parallel
+    """
+    def __init__(self, x0=S_init, step=0.1, seed=0):
+        Strategy.__init__(self, len(x0), seed)
+        x0 = np.clip(np.asarray(x0, dtype=float), Lower, Upper)
+        Simplex = [x0]
+        for i in range(self.dim):
+            x = x0.copy()
+            x[i] = x[i] + step if x[i] + step <= Upper else x[i] - step
+            Simplex.append(x)
+        self.X = np.array(Simplex)
+        self.F = np.full(self.dim + 1, np.inf)
+        self.queue = [(x, ('vertex', i)) for i, x in enumerate(self.X)]
+        self.waiting = len(self.queue)
+        self.trial = {}
+
+    def ask(self):
+        if self.queue:
+            x, role = self.queue.pop(0)
+            return self._issue(x, role)
+        return None
+
+    def tell(self, key, f):
+        x, role = self.pending.pop(key)
+        if role[0] == 'vertex':
+            self.X[role[1]], self.F[role[1]] = x, f
+            self.waiting -= 1
+            if self.waiting == 0:
+                self._reflect()
+            return
+        self.trial[role[0]] = (x, f)
+        getattr(self, '_after_' + role[0])()
+
+    def _reflect(self):
+        Order = np.argsort(self.F)
+        self.X, self.F = self.X[Order], self.F[Order]
+        self.centroid = self.X[:-1].mean(axis=0)
+        self.trial = {}
+        self.queue.append((self.centroid + (self.centroid - self.X[-1]), ('reflect',)))
+
+    def _accept(self, x, f):
+        self.X[-1], self.F[-1] = x, f
+        self._reflect()
+
+    def _after_reflect(self):
+        xr, fr = self.trial['reflect']
+        if fr < self.F[0]:
+            self.queue.append((self.centroid + 2.0*(xr - self.centroid), ('expand',)))
+        elif fr < self.F[-2]:
+            self._accept(xr, fr)
+        elif fr < self.F[-1]:
+            self.queue.append((self.centroid + 0.5*(xr - self.centroid), ('outside',)))
+        else:
+            self.queue.append((self.centroid + 0.5*(self.X[-1] - self.centroid), ('inside',)))
+
+    def _after_expand(self):
+        xe, fe = self.trial['expand']
+        xr, fr = self.trial['reflect']
+        self._accept(*((xe, fe) if fe < fr else (xr, fr)))
+
+    def _after_outside(self):
+        xc, fc = self.trial['outside']
+        if fc <= self.trial['reflect'][1]:
+            self._accept(xc, fc)
+        else:
+            self._shrink()
+
+    def _after_inside(self):
+        xc, fc = self.trial['inside']
+        if fc < self.F[-1]:
+            self._accept(xc, fc)
+        else:
+            self._shrink()
+
+    def _shrink(self):
+        for i in range(1, self.dim + 1):
+            self.queue.append((self.X[0] + 0.5*(self.X[i] - self.X[0]), ('vertex', i)))
+        self.waiting = self.dim
+
+
+class CMAES(Strategy):
+    """
+    (mu/mu_w, lambda)-CMA-ES, one generation of lambda samples in flight at a time
+    Samples outside the bounds are evaluated at the clipped point plus a quadratic penalty
+    """
+    def __init__(self, x0=S_init, sigma=0.2, popsize=None, seed=0):
+        Strategy.__init__(self, len(x0), seed)
+        n = self.dim
+        self.lam = popsize or 4 + int(3*np.log(n))
+        self.mu = self.lam // 2
+        w = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.w = w/w.sum()
+        self.mueff = 1./np.sum(self.w**2)
+        self.cc = (4 + self.mueff/n)/(n + 4 + 2*self.mueff/n)
+        self.cs = (self.mueff + 2)/(n + self.mueff + 5)
+        self.c1 = 2/((n + 1.3)**2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2*(self.mueff - 2 + 1/self.mueff)/((n + 2)**2 + self.mueff))
+        self.damps = 1 + 2*max(0, np.sqrt((self.mueff - 1)/(n + 1)) - 1) + self.cs
+        self.chiN = np.sqrt(n)*(1 - 1./(4*n) + 1./(21*n**2))
+        self.mean = np.asarray(x0, dtype=float).copy()
+        self.sigma = sigma
+        self.C = np.eye(n)
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.gen = 0
+        self._sample()
+
+    def _sample(self):
+        self.Y = self.rng.multivariate_normal(np.zeros(self.dim), self.C, size=self.lam)
+        self.Fgen = np.full(self.lam, np.nan)
+        self.queue = list(range(self.lam))
+
+    def ask(self):
+        if self.queue:
+            i = self.queue.pop(0)
+            key, x = self._issue(self.mean + self.sigma*self.Y[i], i)
+            return key, x
+        return None
+
+    def tell(self, key, f):
+        x, i = self.pending.pop(key)
+        Raw = self.mean + self.sigma*self.Y[i]
+        self.Fgen[i] = f + np.sum((Raw - x)**2)
+        if not np.isnan(self.Fgen).any():
+            self._update()
+
+    def _update(self):
+        n = self.dim
+        Order = np.argsort(self.Fgen)[:self.mu]
+        Yw = self.w @ self.Y[Order]
+        self.mean = self.mean + self.sigma*Yw
+        Eig, B = np.linalg.eigh(self.C)
+        C_invsqrt = B @ np.diag(1/np.sqrt(np.maximum(Eig, 1e-20))) @ B.T
+        self.ps = (1 - self.cs)*self.ps + np.sqrt(self.cs*(2 - self.cs)*self.mueff)*(C_invsqrt @ Yw)
+        self.gen += 1
+        hsig = (np.linalg.norm(self.ps)/np.sqrt(1 - (1 - self.cs)**(2*self.gen))/self.chiN
+                < 1.4 + 2/(n + 1))
+        self.pc = (1 - self.cc)*self.pc + hsig*np.sqrt(self.cc*(2 - self.cc)*self.mueff)*Yw
+        Rank_mu = (self.Y[Order].T*self.w) @ self.Y[Order]
+        self.C = ((1 - self.c1 - self.cmu)*self.C + self.c1*(np.outer(self.pc, self.pc)
+                  + (1 - hsig)*self.cc*(2 - self.cc)*self.C) + self.cmu*Rank_mu)
+        self.sigma *= np.exp((self.cs/self.damps)*(np.linalg.norm(self.ps)/self.chiN - 1))
+        self._sample()
+
+
+class BayesOpt(Strategy):
+    """
+    Gaussian-process surrogate (squared-exponential kernel) with expected improvement
+    Pending points enter the surrogate at their predicted mean (kriging believer),
+    so several proposals can be in flight without duplicating each other.
+    """
+    def __init__(self, dim=5, n_init=10, n_cand=4096, seed=0):
+        Strategy.__init__(self, dim, seed)
+        self.n_init = n_init
+        self.n_cand = n_cand
+        self.X = np.empty((0, dim))
+        self.F = np.empty(0)
+
+    def ask(self):
+        if len(self.X) + len(self.pending) < self.n_init:
+            return self._issue(self.rng.random(self.dim))
+        if len(self.X) < 2:
+            return None
+        return self._issue(self._propose())
+
+    def tell(self, key, f):
+        x, _ = self.pending.pop(key)
+        self.X = np.vstack((self.X, x))
+        self.F = np.append(self.F, f)
+
+    def _fit(self, X, F):
+        Mean, Std = F.mean(), F.std() + 1e-12
+        Z = (F - Mean)/Std
+        D2 = np.sum((X[:, None, :] - X[None, :, :])**2, axis=-1)
+        Best = None
+        for l in (0.05, 0.1, 0.2, 0.4, 0.8):
+            K = np.exp(-0.5*D2/l**2) + 1e-6*np.eye(len(X))
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, Z))
+            Loglik = -0.5*Z @ alpha - np.sum(np.log(np.diag(L)))
+            if Best is None or Loglik > Best[0]:
+                Best = (Loglik, l, L, alpha)
+        _, l, L, alpha = Best
+        return dict(X=X, l=l, L=L, alpha=alpha, Mean=Mean, Std=Std)
+
+    def _predict(self, GP, Xc):
+        Ks = np.exp(-0.5*np.sum((Xc[:, None, :] - GP['X'][None, :, :])**2, axis=-1)/GP['l']**2)
+        Mu = Ks @ GP['alpha']
+        V = np.linalg.solve(GP['L'], Ks.T)
+        Var = np.maximum(1 - np.sum(V**2, axis=0), 1e-12)
+        return GP['Mean'] + GP['Std']*Mu, GP['Std']*np.sqrt(Var)
+
+    def _propose(self):
+        X, F = self.X, self.F
+        if self.pending:
+            Xp = np.array([x for x, _ in self.pending.values()])
+            Fp, _ = self._predict(self._fit(X, F), Xp)
+            X, F = np.vstack((X, Xp)), np.append(F, Fp)
+        GP = self._fit(X, F)
+        # Candidates: uniform samples plus local perturbations of the incumbent
+        x_best = self.X[self.F.argmin()]
+        Local = x_best + 0.05*self.rng.standard_normal((self.n_cand//2, self.dim))
+        Xc = np.clip(np.vstack((self.rng.random((self.n_cand//2, self.dim)), Local)), Lower, Upper)
+        Mu, Sigma = self._predict(GP, Xc)
+        Z = (self.F.min() - Mu)/Sigma
+        EI = (self.F.min() - Mu)*norm.cdf(Z) + Sigma*norm.pdf(Z)
+        return Xc[EI.argmax()]
+
+
+class ActiveLearning(Strategy):
+    """
+    Surrogate.py Gaussian process, no refit per result
+    Evaluations in flight are conditioned on, so proposals do not duplicate them.
+    """
+    def __init__(self, dim=5, n_init=10, n_cand=Num_cand, trend=None, seed=0):
+        Strategy.__init__(self, dim, seed)
+        self.n_init = n_init
+        self.n_cand = n_cand
+        self.model = Surrogate(dim, trend=trend, lower=Lower, upper=Upper, seed=seed)
+
+    def ask(self):
+        if len(self.model) + len(self.pending) < self.n_init:
+            return self._issue(self.rng.random(self.dim))
+        if len(self.model) < 2:
+            return None
+        Pending = [x for x, _ in self.pending.values()]
+        return self._issue(self.model.propose(1, pending=Pending, n_cand=self.n_cand)[0])
+
+    def tell(self, key, f):
+        x, _ = self.pending.pop(key)
+        self.model.update(x, f)
+
+
+Strategies = {'nelder-mead': NelderMead, 'cmaes': CMAES, 'bayes': BayesOpt,
+              'surrogate': ActiveLearning}
+
+
+def save_checkpoint(path, state):
+    """
+    Pickle the optimizer state, written atomically so a kill never leaves a broken file
+    """
+    Temp = path + '.tmp'
+    with open(Temp, 'wb') as file:
+        pickle.dump(state, file)
+    os.replace(Temp, path)
+
+
+def optimize(strategy, objective=drop_time, budget=200, in_flight=4,
+             checkpoint=None, checkpoint_every=10, executor=None):
+    """
+    Drive a strategy with up to in_flight asynchronous evaluations of objective(s)
+
+    If checkpoint exists, the run resumes from it; evaluations that were in flight
+    when the previous run stopped are submitted again. The checkpoint must hold a
+    strategy of the same class as strategy.
+    Returns the state dict: strategy, history of (s, drop time), best s and drop time.
+    """
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint, 'rb') as file:
+            state = pickle.load(file)
+        if type(state['strategy']) is not type(strategy):
+            raise ValueError('Checkpoint %s holds a %s strategy, got %s' % (
+                checkpoint, type(state['strategy']).__name__, type(strategy).__name__))
+    else:
+        state = dict(strategy=strategy, history=[], best_s=None, best_f=np.inf)
+    strategy = state['strategy']
+    own_executor = executor is None
+    if own_executor:
+        executor = futures.ThreadPoolExecutor(max_workers=in_flight)
+    Running = {executor.submit(objective, x): key for key, (x, _) in strategy.pending.items()}
+    try:
+        while len(state['history']) < budget:
+            while len(Running) < in_flight and len(state['history']) + len(Running) < budget:
+                Request = strategy.ask()
+                if Request is None:
+                    break
+                key, x = Request
+                Running[executor.submit(objective, x)] = key
+            if not Running:
+                break
+            Done, _ = futures.wait(Running, return_when=futures.FIRST_COMPLETED)
+            for job in Done:
+                key = Running.pop(job)
+                x = strategy.pending[key][0]
+                f = float(job.result())
+                strategy.tell(key, f)
+                state['history'].append((x, f))
+                if f < state['best_f']:
+                    state['best_s'], state['best_f'] = x, f
+                if checkpoint and len(state['history']) % checkpoint_every == 0:
+                    save_checkpoint(checkpoint, state)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+    if checkpoint:
+        save_checkpoint(checkpoint, state)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimize s1..s5 with the fast drop-time model')
+    parser.add_argument('--method', choices=sorted(Strategies), default='nelder-mead')
+    parser.add_argument('--budget', type=int, default=300, help='number of evaluations')
+    parser.add_argument('--in-flight', type=int, default=4, help='concurrent evaluations')
+    parser.add_argument('--checkpoint', default=None, help='pickle file to save/resume from')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    state = optimize(Strategies[args.method](seed=args.seed), budget=args.budget,
+                     in_flight=args.in_flight, checkpoint=args.checkpoint)
+    print('Evaluations         : %d' % len(state['history']))
+    print('Best s              : %s' % np.round(state['best_s'], 4))
+    print('Drop time (track)   : %.6f s' % state['best_f'])
+    print('Drop time (cycloid) : %.6f s' % cycloid_drop_time())
+
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,17 @@ Linkedin: https://www.linkedin.com/in/lyb0684/
 This python script is used for post processing 
 
 1. Open odb file and save report file for time vs x-displacement (U1.rpt)
-2. Save animation in the path name Video_name = Video\Run_i (if i=1, avi is file saved in Video\Run_1)
+2. If Animation is set, export ball-center trajectories (Trajectory.npz) and save the
+   animation in the path name Video_name = Video\Run_i (if i=1, file is saved in Video\Run_1)
+   rendered offline by Trajectory_Renderer.py, or by the viewer with Animation = 'viewer'
 3. Read U1.rpt to measure drop time, and save as Drop_Time.txt file
+Stage timings are appended to Trace.jsonl (see Run_Trace.py)
 """
 
+import os
+from Run_Trace import Tracer
+trace = Tracer('Post_Processing')
+trace.begin('session')
 from abaqus import *
 from abaqusConstants import *
 session.Viewport(name='Viewport: 1', origin=(0.0, 0.0), width=74.3541641235352, 
@@ -19,15 +26,23 @@ session.viewports['Viewport: 1'].maximize()
 from viewerModules import *
 from driverUtils import executeOnCaeStartup
 executeOnCaeStartup()
-o1 = session.openOdb(name='Ball_Drop.odb', readOnly=False)
+# Job name is set by Job_Queue.py when several designs run at once
+Job_name = os.environ.get('BALL_DROP_JOB', 'Ball_Drop')
+trace.begin('open_odb')
+o1 = session.openOdb(name=Job_name+'.odb', readOnly=False)
 session.viewports['Viewport: 1'].setValues(displayedObject=o1)
 # Define file parameter
 Run_num = 103
 Video_name = 'Video\Run_'+str(int(Run_num))
+# Animation: None (no video, e.g. sweeps), 'png' (image strip, tens of kB), 'mp4' (ffmpeg),
+# 'avi' (uncompressed, ~0.9 MB per frame: ~47 MB for 51 frames) rendered without the viewer,
+# or 'viewer' for writeImageAnimation; set by BALL_DROP_ANIMATION
+Animation = os.environ.get('BALL_DROP_ANIMATION') or None
 
 # Write report file for U1
+trace.begin('xy_report')
 
-odb = session.odbs['Ball_Drop.odb']
+odb = session.odbs[Job_name+'.odb']
 xy_result = session.XYDataFromHistory(name='U1_History', odb=odb, 
     outputVariableName='Spatial displacement: U1 PI: BALL-1 Node 5930 in NSET BALL_CENTER_RP_1', 
     steps=('Drop', ), __linkedVpName__='Viewport: 1')
@@ -42,94 +57,101 @@ x0 = session.xyDataObjects['U1_History']
 session.xyReportOptions.setValues(numDigits=9)
 session.writeXYReport(fileName='U1.rpt', appendMode=OFF, xyData=(x0, ))
 
-# Decoration-Off
-session.viewports['Viewport: 1'].viewportAnnotationOptions.setValues(triad=OFF, 
-    legend=OFF, title=OFF, state=OFF, annotations=OFF, compass=OFF)
-# For animation
-odb = session.odbs['Ball_Drop.odb']
-session.viewports['Viewport: 1'].setValues(displayedObject=odb)
-session.viewports['Viewport: 1'].odbDisplay.display.setValues(plotState=(
-    DEFORMED, ))
-session.viewports['Viewport: 1'].enableMultipleColors()
-session.viewports['Viewport: 1'].setColor(initialColor='#BDBDBD')
-cmap = session.viewports['Viewport: 1'].colorMappings['Part instance']
-session.viewports['Viewport: 1'].setColor(colorMapping=cmap)
-session.viewports['Viewport: 1'].disableMultipleColors()
-session.viewports['Viewport: 1'].odbDisplay.basicOptions.setValues(pointElements=OFF)
-# Set views
-session.viewports['Viewport: 1'].odbDisplay.setFrame(step=0, frame=0 )
-session.viewports['Viewport: 1'].view.setValues(nearPlane=324.19, 
-    farPlane=525.401, width=279.091, height=136.314, cameraPosition=(-80.2638, 
-    78.0113, 384.862), cameraUpVector=(0.0523979, 0.791681, -0.608684), 
-    cameraTarget=(86.6386, -42.446, 6.84688))
-session.viewports['Viewport: 1'].view.setValues(nearPlane=329.061, 
-    farPlane=521.372, width=283.284, height=138.362, cameraPosition=(-3.17078, 
-    158.31, 376.615), cameraUpVector=(0.125009, 0.675358, -0.726818), 
-    cameraTarget=(85.6178, -43.5093, 6.95609))
-session.viewports['Viewport: 1'].view.setValues(nearPlane=328.975, 
-    farPlane=521.458, width=266.218, height=130.026, viewOffsetX=4.67171, 
-    viewOffsetY=-1.27782)
-session.viewports['Viewport: 1'].view.setValues(nearPlane=345.329, 
-    farPlane=508.088, width=279.452, height=136.49, cameraPosition=(54.0564, 
-    141.51, 395.254), cameraUpVector=(0.0925354, 0.70865, -0.699466), 
-    cameraTarget=(84.8288, -42.7765, 7.49921), viewOffsetX=4.90394, 
-    viewOffsetY=-1.34134)
-session.viewports['Viewport: 1'].view.setValues(nearPlane=338.555, 
-    farPlane=514.862, width=291.458, height=142.354, viewOffsetX=9.8551, 
-    viewOffsetY=-5.08274)
-session.viewports['Viewport: 1'].view.setValues(nearPlane=346.669, 
-    farPlane=508.431, width=298.443, height=145.766, cameraPosition=(69.2001, 
-    129.162, 402.502), cameraUpVector=(0.0522136, 0.730952, -0.680428), 
-    cameraTarget=(84.457, -42.7102, 8.1799), viewOffsetX=10.0913, 
-    viewOffsetY=-5.20455)
-session.viewports['Viewport: 1'].view.setProjection(projection=PARALLEL)
-session.viewports['Viewport: 1'].view.setProjection(projection=PERSPECTIVE)
-session.viewports['Viewport: 1'].view.setValues(nearPlane=343.696, 
-    farPlane=511.406, width=297.871, height=145.487, viewOffsetX=7.545, 
-    viewOffsetY=-2.1763)
-session.viewports['Viewport: 1'].view.setValues(nearPlane=345.905, 
-    farPlane=511.542, width=299.786, height=146.422, cameraPosition=(108.256, 
-    135.667, 400.542), cameraUpVector=(-0.015335, 0.708218, -0.705827), 
-    cameraTarget=(96.3625, -47.974, 14.6227), viewOffsetX=7.59349, 
-    viewOffsetY=-2.19029)
-# Set views
-session.viewports['Viewport: 1'].odbDisplay.setFrame(step=0, frame=0 )
-session.viewports['Viewport: 1'].view.setValues(nearPlane=348.708, 
-    farPlane=558.49, width=267.038, height=130.427, viewOffsetX=-13.4346, 
-    viewOffsetY=9.86168)
-session.graphicsOptions.setValues(backgroundStyle=SOLID, 
-    backgroundColor='#FFFFFF')
-# Save animation
-session.viewports['Viewport: 1'].animationController.setValues(
-    animationType=TIME_HISTORY)
-session.viewports['Viewport: 1'].animationController.play(duration=UNLIMITED)
-session.imageAnimationOptions.setValues(vpDecorations=ON, vpBackground=OFF, 
-    compass=OFF)
-#: AVI Codec set to:None - 24 bits/pixel
-session.aviOptions.setValues(compressionMethod=CODEC, 
-    codecOptions='[12]:aaaaaaaabiaaaaaaaaaaaaaa')
-session.imageAnimationOptions.setValues(vpDecorations=ON, vpBackground=OFF, 
-    compass=OFF)
-session.writeImageAnimation(fileName=Video_name, format=AVI, canvasObjects=(
-    session.viewports['Viewport: 1'], ))
-session.viewports['Viewport: 1'].animationController.stop()
+# Ball-center trajectories and track edges for the offline renderer, only with an animation
+if Animation is not None:
+    trace.begin('trajectory')
+    from Trajectory_Renderer import export_trajectories, render_file
+    export_trajectories(odb, 'Trajectory.npz')
+    trace.begin('animation')
+if Animation == 'viewer':
+    # Decoration-Off
+    session.viewports['Viewport: 1'].viewportAnnotationOptions.setValues(triad=OFF, 
+        legend=OFF, title=OFF, state=OFF, annotations=OFF, compass=OFF)
+    # For animation
+    odb = session.odbs[Job_name+'.odb']
+    session.viewports['Viewport: 1'].setValues(displayedObject=odb)
+    session.viewports['Viewport: 1'].odbDisplay.display.setValues(plotState=(
+        DEFORMED, ))
+    session.viewports['Viewport: 1'].enableMultipleColors()
+    session.viewports['Viewport: 1'].setColor(initialColor='#BDBDBD')
+    cmap = session.viewports['Viewport: 1'].colorMappings['Part instance']
+    session.viewports['Viewport: 1'].setColor(colorMapping=cmap)
+    session.viewports['Viewport: 1'].disableMultipleColors()
+    session.viewports['Viewport: 1'].odbDisplay.basicOptions.setValues(pointElements=OFF)
+    # Set views
+    session.viewports['Viewport: 1'].odbDisplay.setFrame(step=0, frame=0 )
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=324.19, 
+        farPlane=525.401, width=279.091, height=136.314, cameraPosition=(-80.2638, 
+        78.0113, 384.862), cameraUpVector=(0.0523979, 0.791681, -0.608684), 
+        cameraTarget=(86.6386, -42.446, 6.84688))
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=329.061, 
+        farPlane=521.372, width=283.284, height=138.362, cameraPosition=(-3.17078, 
+        158.31, 376.615), cameraUpVector=(0.125009, 0.675358, -0.726818), 
+        cameraTarget=(85.6178, -43.5093, 6.95609))
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=328.975, 
+        farPlane=521.458, width=266.218, height=130.026, viewOffsetX=4.67171, 
+        viewOffsetY=-1.27782)
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=345.329, 
+        farPlane=508.088, width=279.452, height=136.49, cameraPosition=(54.0564, 
+        141.51, 395.254), cameraUpVector=(0.0925354, 0.70865, -0.699466), 
+        cameraTarget=(84.8288, -42.7765, 7.49921), viewOffsetX=4.90394, 
+        viewOffsetY=-1.34134)
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=338.555, 
+        farPlane=514.862, width=291.458, height=142.354, viewOffsetX=9.8551, 
+        viewOffsetY=-5.08274)
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=346.669, 
+        farPlane=508.431, width=298.443, height=145.766, cameraPosition=(69.2001, 
+        129.162, 402.502), cameraUpVector=(0.0522136, 0.730952, -0.680428), 
+        cameraTarget=(84.457, -42.7102, 8.1799), viewOffsetX=10.0913, 
+        viewOffsetY=-5.20455)
+    session.viewports['Viewport: 1'].view.setProjection(projection=PARALLEL)
+    session.viewports['Viewport: 1'].view.setProjection(projection=PERSPECTIVE)
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=343.696, 
+        farPlane=511.406, width=297.871, height=145.487, viewOffsetX=7.545, 
+        viewOffsetY=-2.1763)
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=345.905, 
+        farPlane=511.542, width=299.786, height=146.422, cameraPosition=(108.256, 
+        135.667, 400.542), cameraUpVector=(-0.015335, 0.708218, -0.705827), 
+        cameraTarget=(96.3625, -47.974, 14.6227), viewOffsetX=7.59349, 
+        viewOffsetY=-2.19029)
+    # Set views
+    session.viewports['Viewport: 1'].odbDisplay.setFrame(step=0, frame=0 )
+    session.viewports['Viewport: 1'].view.setValues(nearPlane=348.708, 
+        farPlane=558.49, width=267.038, height=130.427, viewOffsetX=-13.4346, 
+        viewOffsetY=9.86168)
+    session.graphicsOptions.setValues(backgroundStyle=SOLID, 
+        backgroundColor='#FFFFFF')
+    # Save animation
+    session.viewports['Viewport: 1'].animationController.setValues(
+        animationType=TIME_HISTORY)
+    session.viewports['Viewport: 1'].animationController.play(duration=UNLIMITED)
+    session.imageAnimationOptions.setValues(vpDecorations=ON, vpBackground=OFF, 
+        compass=OFF)
+    #: AVI Codec set to:None - 24 bits/pixel
+    session.aviOptions.setValues(compressionMethod=CODEC, 
+        codecOptions='[12]:aaaaaaaabiaaaaaaaaaaaaaa')
+    session.imageAnimationOptions.setValues(vpDecorations=ON, vpBackground=OFF, 
+        compass=OFF)
+    session.writeImageAnimation(fileName=Video_name, format=AVI, canvasObjects=(
+        session.viewports['Viewport: 1'], ))
+    session.viewports['Viewport: 1'].animationController.stop()
+elif Animation is not None:
+    # Worker processes re-run this script where they are spawned (Windows)
+    render_file('Trajectory.npz', Video_name.replace('\\', os.sep) + '.' + Animation,
+                workers=1 if os.name == 'nt' else None)
 
+trace.begin('drop_time')
 import numpy as np
-from decimal import *
+from Report_Reader import read_report
+from Arrival import arrival_time
 
 # Get decending time
-file=open("U1.rpt","r").readlines()
-List_Len = len(file) -3
+Names, Time_vs_U1 = read_report("U1.rpt")
 
-Time_vs_U1 = np.zeros((List_Len,2))
-for i in range(len(file)-3):
-    Lines = file[i+3].split()
-    if Lines != []:
-        Time_vs_U1[i,:] = [float(Lines[0]), float(Lines[1])]
-    elif  Lines == []:
-        break
-
-Drop_Time = Time_vs_U1[Time_vs_U1[:,1].argmax(),0]
+# Crossing of x=50*pi interpolated between samples (see Arrival.py)
+Drop_Time, Drop_Time_Error, Method = arrival_time(Time_vs_U1)
+print('Drop time: %.8f +/- %.1e s (%s)' % (Drop_Time, Drop_Time_Error, Method))
 file=open("Drop_Time.txt","w")
-file.write(str(Decimal(Drop_Time))[0:10])
+file.write('%.8f' % Drop_Time)
 file.close()
+trace.end()
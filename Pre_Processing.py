@@ -6,6 +6,7 @@ Linkedin: https://www.linkedin.com/in/lyb0684/
 This python script generate Abaqus input file for ball drop simulation
 The curve is devided into 6-segment with uniform x-distance
 5 Y-coordinate values are to be optimized 
+(s may hold any number of values for finer tracks, see Track_Parameterization.py)
 
 Start   : (0.0,0.0)
 point_1 : (50*pi/6, y_1)
@@ -27,7 +28,11 @@ if si = 1.0, y_coordinate of i_th point is equal to the linear extrapolation of
 i.e., y_i = y_i-1 + (y_i-1 - y_i-2)*si
 
 Conversion from y to s enables generation of monotonically decreasing curve
+Stage timings are appended to Trace.jsonl (see Run_Trace.py)
 """
+from Run_Trace import Tracer
+trace = Tracer('Pre_Processing')
+trace.begin('session')
 from abaqus import *
 from abaqusConstants import *
 session.Viewport(name='Viewport: 1', origin=(0.0, 0.0), width=74.3541641235352, 
@@ -38,6 +43,7 @@ from caeModules import *
 from driverUtils import executeOnCaeStartup
 import numpy as np
 from scipy import interpolate
+from Drop_Time_Model import track_knots, sketch_num
 executeOnCaeStartup()
 session.viewports['Viewport: 1'].partDisplay.geometryOptions.setValues(
     referenceRepresentation=ON)
@@ -46,24 +52,33 @@ session.viewports['Viewport: 1'].setValues(displayedObject=None)
 ##############################
 #### Parameter definition ####
 ##############################
+trace.begin('parameters')
 s1 = 0.2
 s2 = 0.326
 s3 = 0.579
 s4 = 0.8
 s5 = 0.674
-# X coordinates
-X_coord = np.linspace(0, np.pi*50., endpoint=True, num=7)
-# Y coordinates
+# ON: halt the analysis once ball 1 reaches the end of the track (Arrival.U1_end)
+# Note: the cycloid ball is stopped as well, its history ends there
+Stop_at_arrival = OFF
+# ON: step time from the predicted arrival of ball 1 plus a margin, field intervals scaled
+# to match (the cycloid ball is not planned for, Ball_Dynamics runs inside CAE)
+# OFF: fixed 0.3 s, increment 5e-05 s and 50 intervals (see Step_Planner.py)
+Plan_step = OFF
+# Max deviation [mm] of the sketch spline from the exact curves (see Curve_Resolution.py)
+# None: fixed 50 points on the track and 20 points on the cycloid
+Spline_tol = None
+# Ratios of successive drops, any number of values gives len(s)+1 segments
+# e.g. s = ratios_from_drops(cycloid_drops(100)) (see Track_Parameterization.py)
 s = [s1, s2, s3, s4, s5]
-Y_coord = np.linspace(0, -1, endpoint=True, num=7)
-Y_coord[1] = 0.1
-for i in range(len(Y_coord)-2):
-    Y_coord[i+2] = Y_coord[i+1] + (Y_coord[i+1] - Y_coord[i])*s[i]
-
-# Scale Y values
-Y_coord = Y_coord/max(Y_coord)*-100.
+# X, Y coordinates of the knots, scaled to end at (50*pi, -100.0)
+X_coord, Y_coord = track_knots(s)
 # PchipInterolator
-X_interp = np.linspace(0.0, np.pi*50., num=50, endpoint=True);
+if Spline_tol is None:
+    X_interp = np.linspace(0.0, np.pi*50., num=sketch_num(X_coord), endpoint=True);
+else:
+    from Curve_Resolution import adaptive_x
+    X_interp = adaptive_x(X_coord, Y_coord, Spline_tol)
 Spline = interpolate.PchipInterpolator(X_coord, Y_coord);
 Y_interp = Spline(X_interp)
 # Combine X&Y coordinate
@@ -71,10 +86,16 @@ Coord_curve = np.stack((X_interp,Y_interp), axis=1)
 # Add guide part of the track
 Guide = np.array([[0, 20], [0, 15], [0, 10], [0, 5], [0, 2.5]]) 
 Coord = np.concatenate((Guide, Coord_curve), axis=0)
+if Plan_step == ON:
+    from Step_Planner import plan_step
+    Plan = plan_step(s)
+else:
+    Plan = dict(step_time=0.3, increment=5e-05, intervals=50)
 
 ##############################
 ####      Draw curve 1    ####
 ##############################
+trace.begin('sketch')
 # Draw Curve to be optimized
 s = mdb.models['Model-1'].ConstrainedSketch(name='__profile__', 
     sheetSize=200.0)
@@ -97,10 +118,17 @@ del mdb.models['Model-1'].sketches['__profile__']
 ##############################
 ####      Draw curve 2    ####
 ##############################
-# Draw Cycloid curve
-theta = np.linspace(0., np.pi, endpoint=True, num=20)
-X_coord_Cycl = 50*(theta - np.sin(theta))
-Y_coord_Cycl = -50*(1 - np.cos(theta))
+# Draw Cycloid curve, the brachistochrone to the end of the track (see Cycloid_Reference.py)
+# (50*pi, -100.0): radius 50, theta in [0, pi]
+from Cycloid_Reference import cycloid_params
+Radius_Cycl, Theta_end, Time_Cycl = cycloid_params((0., 0.), (X_coord[-1], Y_coord[-1]))
+if Spline_tol is None:
+    theta = np.linspace(0., Theta_end, endpoint=True, num=20)
+else:
+    from Curve_Resolution import adaptive_theta
+    theta = adaptive_theta(Spline_tol, Radius_Cycl, Theta_end)
+X_coord_Cycl = Radius_Cycl*(theta - np.sin(theta))
+Y_coord_Cycl = -Radius_Cycl*(1 - np.cos(theta))
 Coord_curve_2 = np.stack((X_coord_Cycl,Y_coord_Cycl), axis=1)
 # Add guide part of the track
 Guide = np.array([[0, 20], [0, 15], [0, 10], [0, 5], [0, 2.5]]) 
@@ -126,6 +154,7 @@ del mdb.models['Model-1'].sketches['__profile__']
 ##############################
 ####     Define ball      ####
 ##############################
+trace.begin('ball')
 
 s = mdb.models['Model-1'].ConstrainedSketch(name='__profile__', 
     sheetSize=200.0)
@@ -176,6 +205,7 @@ p.SectionAssignment(region=region, sectionName='Ball', offset=0.0,
 ##############################
 ####   Create assembly    ####
 ##############################
+trace.begin('assembly')
 
 a = mdb.models['Model-1'].rootAssembly
 session.viewports['Viewport: 1'].setValues(displayedObject=a)
@@ -206,6 +236,7 @@ a = mdb.models['Model-1'].rootAssembly
 a.translate(instanceList=('Ball-2', ), vector=(-5.0, 5.0, -40.0))
 
 # Generate mesh on ball
+trace.begin('mesh')
 session.viewports['Viewport: 1'].assemblyDisplay.setValues(mesh=ON)
 session.viewports['Viewport: 1'].assemblyDisplay.meshOptions.setValues(
     meshTechnique=ON)
@@ -254,6 +285,7 @@ p = mdb.models['Model-1'].parts['Track_Cycloid']
 p.generateMesh()
 
 # Define contact
+trace.begin('model')
 a = mdb.models['Model-1'].rootAssembly
 session.viewports['Viewport: 1'].setValues(displayedObject=a)
 a = mdb.models['Model-1'].rootAssembly
@@ -346,8 +378,8 @@ mdb.models['Model-1'].EncastreBC(name='Track_Cycloid_Fix', createStepName='Initi
 
 # Create step
 mdb.models['Model-1'].ExplicitDynamicsStep(name='Drop', previous='Initial', 
-    timePeriod=0.3, timeIncrementationMethod=FIXED_USER_DEFINED_INC, 
-    userDefinedInc=5e-05, improvedDtMethod=ON)
+    timePeriod=Plan['step_time'], timeIncrementationMethod=FIXED_USER_DEFINED_INC, 
+    userDefinedInc=Plan['increment'], improvedDtMethod=ON)
 session.viewports['Viewport: 1'].assemblyDisplay.setValues(step='Drop')
 
 #Define gravity load
@@ -387,13 +419,21 @@ session.viewports['Viewport: 1'].assemblyDisplay.setValues(interactions=OFF,
     constraints=OFF, connectors=OFF, engineeringFeatures=OFF, 
     adaptiveMeshConstraints=ON)
 mdb.models['Model-1'].fieldOutputRequests['F-Output-1'].setValues(variables=(
-    'U', 'UT'), numIntervals=50, timeMarks=OFF)
+    'U', 'UT'), numIntervals=Plan['intervals'], timeMarks=OFF)
 regionDef=mdb.models['Model-1'].rootAssembly.sets['Ball_Center_RP_1']
 mdb.models['Model-1'].HistoryOutputRequest(name='H-Output-2', 
     createStepName='Drop', variables=('U1', ), frequency=1, region=regionDef, 
     sectionPoints=DEFAULT, rebar=EXCLUDE)
+if Stop_at_arrival == ON:
+    # Ball center starts at x=-5.0 and arrives at x=50*pi, halt just before the contact
+    from Arrival import U1_end
+    mdb.models['Model-1'].OperatorFilter(name='Arrival', operation=MAX, 
+        limit=U1_end, halt=ON)
+    mdb.models['Model-1'].historyOutputRequests['H-Output-2'].setValues(
+        filter='Arrival')
 
 #Write input file
+trace.begin('write_input')
 session.viewports['Viewport: 1'].assemblyDisplay.setValues(
     adaptiveMeshConstraints=OFF)
 mdb.Job(name='Ball_Drop', model='Model-1', description='', type=ANALYSIS, 
@@ -405,3 +445,11 @@ mdb.Job(name='Ball_Drop', model='Model-1', description='', type=ANALYSIS,
     multiprocessingMode=DEFAULT, numCpus=1, numGPUs=0)
 mdb.jobs['Ball_Drop'].writeInput(consistencyChecking=OFF)
 #: The job input file has been written to "Ball_Drop.inp".
+# Settings of this run, the key of the result in Result_Cache.py
+import json
+from Result_Cache import run_settings, Settings_file
+file = open(Settings_file, 'w')
+json.dump(run_settings(Plan, len(X_interp), len(theta), Stop_at_arrival == ON, Spline_tol),
+          file, sort_keys=True)
+file.close()
+trace.end()
@@ -0,0 +1,131 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script reads Abaqus XY report files (e.g., U1.rpt written by Post_Processing.py)
+
+Report layout written by session.writeXYReport:
+
+            X                 U1_History
+                                               <- blank line(s)
+            0.                 0.
+       50.E-06             1.2E-06
+       ...
+
+The file is memory-mapped, the blocks are located on the map and every numeric block
+is converted in one np.fromstring call (no Python object per number). The header length is detected,
+several xy columns per block and several blocks per file are supported.
+A directory of reports can be parsed in parallel into one columnar .npz file.
+
+Run command:
+python Report_Reader.py Video --output Reports.npz --workers 8
+"""
+import glob
+import mmap
+import os
+import re
+
+import numpy as np
+
+# A header line starts with a letter other than the exponent mark of a number
+# (matched from the newline before it, a literal prefix the regex engine scans for fast)
+_Header = re.compile(br'\n[ \t]*[A-DF-Za-df-z_]')
+_Number = re.compile(br'^[ \t]*[-+.0-9]', re.M)
+
+
+def _column_names(Line, ncols):
+    Names = Line.split()
+    if len(Names) != ncols:
+        Names = [Name.strip() for Name in re.split(r'\s{2,}', Line.strip())]
+    if len(Names) != ncols:
+        Names = ['X'] + ['Y%d' % i for i in range(1, ncols)]
+    return Names
+
+
+def _read_blocks(Text):
+    Blocks = []
+    Pos = 0
+    while True:
+        Start = _Number.search(Text, Pos)
+        if Start is None:
+            break
+        Header = Text[Pos:Start.start()].decode('utf-8', 'replace')
+        Header = [Line for Line in Header.splitlines() if Line.strip()]
+        End = _Header.search(Text, Start.start())
+        Stop = len(Text) if End is None else End.start() + 1
+        Line = Text.find(b'\n', Start.start(), Stop)
+        ncols = len(Text[Start.start():Stop if Line < 0 else Line].split())
+        Data = np.fromstring(Text[Start.start():Stop], dtype=np.float64, sep=' ')
+        if len(Data) % ncols:
+            raise ValueError('Block of %d columns with %d values' % (ncols, len(Data)))
+        Data = Data.reshape(-1, ncols)
+        Names = _column_names(Header[-1] if Header else '', ncols)
+        Blocks.append((Names, Data))
+        if End is None:
+            break
+        Pos = End.start() + 1
+    return Blocks
+
+
+def read_report_blocks(path):
+    """
+    Return a list of (column names, data array) for every block of a report file
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        Text = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _read_blocks(Text)
+        finally:
+            Text.close()
+
+
+def read_report(path):
+    """
+    Return (column names, data) of the first block, e.g. Time_vs_U1 of U1.rpt
+    """
+    Blocks = read_report_blocks(path)
+    if not Blocks:
+        raise ValueError('No numeric data in ' + str(path))
+    return Blocks[0]
+
+
+def read_report_dir(directory, pattern='**/*.rpt', workers=None):
+    """
+    Parse all reports under directory in parallel into one columnar dict
+
+    files   : report paths (relative to directory)
+    offsets : rows of file i are offsets[i]:offsets[i+1]
+    time    : X column of all files
+    Y1, ... : remaining columns (missing columns are NaN)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    Files = sorted(glob.glob(os.path.join(directory, pattern), recursive=True))
+    with ProcessPoolExecutor(max_workers=workers) as Pool:
+        Results = list(Pool.map(read_report, Files, chunksize=8))
+    ncols = max([Data.shape[1] for _, Data in Results] or [1])
+    Offsets = np.zeros(len(Files) + 1, dtype=np.int64)
+    Offsets[1:] = np.cumsum([len(Data) for _, Data in Results])
+    Columns = np.full((Offsets[-1], ncols), np.nan)
+    for i, (_, Data) in enumerate(Results):
+        Columns[Offsets[i]:Offsets[i+1], :Data.shape[1]] = Data
+    Store = {'files': np.array([os.path.relpath(f, directory) for f in Files]),
+             'offsets': Offsets, 'time': Columns[:, 0]}
+    for j in range(1, ncols):
+        Store['Y%d' % j] = Columns[:, j]
+    return Store
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Parse a directory of Abaqus XY reports')
+    parser.add_argument('directory')
+    parser.add_argument('--pattern', default='**/*.rpt')
+    parser.add_argument('--output', default='Reports.npz')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    Store = read_report_dir(args.directory, args.pattern, args.workers)
+    np.savez(args.output, **Store)
+    print('%d reports, %d rows -> %s' % (len(Store['files']), len(Store['time']), args.output))
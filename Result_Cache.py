@@ -0,0 +1,283 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script keeps a persistent cache of evaluated designs (SQLite)
+
+Key   : sha256 of s = [s1, ..., s5] and the settings of the run (run_settings): step time,
+        increment and field intervals (fixed or planned), sketch points of the track and
+        the cycloid, spline tolerance, halting filter, mesh seeds and material constants
+Value : drop time and the time vs U1 history
+
+Pre_Processing.py writes the settings it used to Settings.json; store keys the result
+with that file. lookup runs before Pre_Processing.py, so it derives the same settings
+from the switches of Pre_Processing.py (predict_settings, --plan, --spline-tol,
+--stop-at-arrival), which must match the ones set in the script.
+
+The database runs in WAL mode, so parallel sweeps can read while one process writes.
+Least recently used entries are evicted once max_entries or max_bytes is exceeded.
+Hits only record their access time in memory, written with the next put/evict/close,
+so readers do not take the write lock.
+
+Run command (skip Abaqus on a hit):
+python Result_Cache.py lookup 0.2 0.326 0.579 0.8 0.674 || (
+call abaqus cae noGUI=Pre_Processing.py
+call abaqus J=Ball_Drop int cpus=(number of cpus) ask_delete=no
+call abaqus viewer noGUI=Post_Processing.py
+python Result_Cache.py store 0.2 0.326 0.579 0.8 0.674 --settings Settings.json --max-bytes 1e9 )
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from Report_Reader import read_report
+
+# Settings of Pre_Processing.py that change the result and do not depend on the design
+Model_settings = {
+    'ball_seed': 1.1,
+    'track_seed': 5.0,
+    'density': 7.85e-09,
+    'youngs_modulus': 200000.0,
+    'poisson_ratio': 0.3,
+    'gravity': -9800.0,
+}
+# Fixed step of Pre_Processing.py (Plan_step = OFF) and sketch points (Spline_tol = None)
+Fixed_plan = dict(step_time=0.3, increment=5e-05, intervals=50)
+Num_interp = 50
+Num_cycloid = 20
+Cache_file = 'Result_Cache.db'
+Settings_file = 'Settings.json'
+
+
+def run_settings(plan=Fixed_plan, num_interp=Num_interp, num_cycloid=Num_cycloid,
+                 stop_at_arrival=False, spline_tol=None):
+    """
+    Settings of one Pre_Processing.py run: step (Step_Planner.plan_step dict or Fixed_plan),
+    number of sketch points of the track and the cycloid, Spline_tol and Stop_at_arrival
+    """
+    Content = dict(Model_settings)
+    Content.update(time_period=round(float(plan['step_time']), 12),
+                   user_defined_inc=float(plan['increment']),
+                   num_intervals=int(plan['intervals']),
+                   num_interp=int(num_interp), num_cycloid=int(num_cycloid),
+                   spline_tol=None if spline_tol is None else float(spline_tol),
+                   stop_at_arrival=bool(stop_at_arrival))
+    if stop_at_arrival:
+        from Arrival import U1_end
+        Content['halt_limit'] = float(U1_end)
+    return Content
+
+
+# Pre_Processing.py as distributed
+Settings = run_settings()
+
+
+def predict_settings(s, plan_step=False, spline_tol=None, stop_at_arrival=False):
+    """
+    Settings Pre_Processing.py uses for s with the switches Plan_step, Spline_tol and
+    Stop_at_arrival, derived the same way before the script runs
+    """
+    from Drop_Time_Model import track_knots, sketch_num
+    X_coord, Y_coord = track_knots(s)
+    if plan_step:
+        from Step_Planner import plan_step as plan
+        Plan = plan(s)
+    else:
+        Plan = Fixed_plan
+    if spline_tol is None:
+        num_interp, num_cycloid = sketch_num(X_coord), Num_cycloid
+    else:
+        from Curve_Resolution import adaptive_x, adaptive_theta
+        from Cycloid_Reference import cycloid_params
+        Radius, Theta_end, _ = cycloid_params((0., 0.), (X_coord[-1], Y_coord[-1]))
+        num_interp = len(adaptive_x(X_coord, Y_coord, spline_tol))
+        num_cycloid = len(adaptive_theta(spline_tol, Radius, Theta_end))
+    return run_settings(Plan, num_interp, num_cycloid, stop_at_arrival, spline_tol)
+
+
+def load_settings(path=Settings_file):
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def design_key(s, settings=None):
+    """
+    Content hash of the design parameters and the solver settings
+    """
+    Content = dict(Settings if settings is None else settings)
+    Content['s'] = [float(si) for si in s]
+    Text = json.dumps(Content, sort_keys=True)
+    return hashlib.sha256(Text.encode('utf-8')).hexdigest()
+
+
+def design_keys(S, settings=None):
+    """
+    design_key of every row of S (n, P) with the same settings
+    The settings part of the text is built once and the rows are written by one json call
+    """
+    S = np.asarray(S, dtype=float)
+    if not np.isfinite(S).all() or S.size == 0:
+        return [design_key(s, settings) for s in S]
+    Content = dict(Settings if settings is None else settings)
+    Content['s'] = None
+    Head, Tail = json.dumps(Content, sort_keys=True).split('"s": null')
+    Head, Tail = Head + '"s": [', ']' + Tail
+    Rows = json.dumps(S.tolist())[2:-2].split('], [')
+    return [hashlib.sha256((Head + Row + Tail).encode('utf-8')).hexdigest() for Row in Rows]
+
+
+class ResultCache(object):
+    """
+    SQLite-backed cache of (drop time, U1 history) keyed by design_key
+    """
+    def __init__(self, path=Cache_file, max_entries=None, max_bytes=None, timeout=30.):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # key -> access time of hits not yet written
+        self.touched = {}
+        self.db = sqlite3.connect(path, timeout=timeout)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, s TEXT, '
+            'drop_time REAL, history BLOB, nbytes INTEGER, created REAL, accessed REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        self.db.commit()
+
+    def get(self, s, settings=None):
+        """
+        Return (drop time, Time_vs_U1) on a hit, None on a miss
+        """
+        key = design_key(s, settings)
+        Row = self.db.execute('SELECT drop_time, history FROM results WHERE key=?',
+                              (key,)).fetchone()
+        if Row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[key] = time.time()
+        Drop_Time, Blob = Row
+        Time_vs_U1 = None if Blob is None else np.frombuffer(Blob, dtype=np.float64).reshape(-1, 2)
+        return Drop_Time, Time_vs_U1
+
+    def put(self, s, drop_time, time_vs_u1=None, settings=None):
+        key = design_key(s, settings)
+        Blob = None
+        if time_vs_u1 is not None:
+            Blob = np.ascontiguousarray(time_vs_u1, dtype=np.float64).tobytes()
+        Now = time.time()
+        self.touched.pop(key, None)
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, json.dumps([float(si) for si in s]), float(drop_time), Blob,
+                 len(Blob or b''), Now, Now))
+        self.evict()
+        return key
+
+    def get_or_evaluate(self, s, evaluate, settings=None):
+        """
+        Cached drop time of s; on a miss evaluate(s) -> drop time or (drop time, Time_vs_U1)
+        """
+        Cached = self.get(s, settings)
+        if Cached is not None:
+            return Cached[0]
+        Result = evaluate(s)
+        Drop_Time, Time_vs_U1 = Result if isinstance(Result, tuple) else (Result, None)
+        self.put(s, Drop_Time, Time_vs_U1, settings)
+        return Drop_Time
+
+    def flush(self):
+        """
+        Write the access times of the hits since the last flush
+        """
+        if self.touched:
+            with self.db:
+                self.db.executemany('UPDATE results SET accessed=? WHERE key=?',
+                                    [(t, key) for key, t in self.touched.items()])
+            self.touched = {}
+
+    def evict(self):
+        """
+        Drop least recently used entries above max_entries / max_bytes
+        """
+        self.flush()
+        with self.db:
+            if self.max_entries is not None:
+                self.db.execute(
+                    'DELETE FROM results WHERE key IN (SELECT key FROM results '
+                    'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            if self.max_bytes is not None:
+                Rows = self.db.execute('SELECT key, nbytes FROM results ORDER BY accessed DESC')
+                Total, Old = 0, []
+                for key, nbytes in Rows:
+                    Total += nbytes
+                    if Total > self.max_bytes:
+                        Old.append((key,))
+                self.db.executemany('DELETE FROM results WHERE key=?', Old)
+
+    def stats(self):
+        Count, Size = self.db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM results').fetchone()
+        return dict(hits=self.hits, misses=self.misses, entries=Count, nbytes=Size)
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache of evaluated designs')
+    parser.add_argument('command', choices=('lookup', 'store', 'stats'),
+                        help='stats also evicts above --max-entries/--max-bytes')
+    parser.add_argument('s', type=float, nargs='*', help='s1 s2 s3 s4 s5')
+    parser.add_argument('--db', default=Cache_file)
+    parser.add_argument('--settings', default=None,
+                        help='settings file written by Pre_Processing.py (Settings.json)')
+    parser.add_argument('--plan', action='store_true', help='Plan_step = ON')
+    parser.add_argument('--spline-tol', type=float, default=None, help='Spline_tol')
+    parser.add_argument('--stop-at-arrival', action='store_true', help='Stop_at_arrival = ON')
+    parser.add_argument('--max-entries', type=int, default=None)
+    parser.add_argument('--max-bytes', type=float, default=None)
+    args = parser.parse_args()
+    if args.command in ('lookup', 'store') and not args.s:
+        parser.error('%s needs the design s1 s2 s3 s4 s5' % args.command)
+
+    cache = ResultCache(args.db, args.max_entries,
+                        None if args.max_bytes is None else int(args.max_bytes))
+    settings = None
+    if args.settings:
+        settings = load_settings(args.settings)
+    elif args.s:
+        settings = predict_settings(args.s, args.plan, args.spline_tol, args.stop_at_arrival)
+    if args.command == 'lookup':
+        Cached = cache.get(args.s, settings)
+        if Cached is None:
+            cache.close()
+            sys.exit(1)
+        Drop_Time, Time_vs_U1 = Cached
+        file = open('Drop_Time.txt', 'w')
+        file.write(str(Drop_Time))
+        file.close()
+        print('Cache hit: drop time = %s' % Drop_Time)
+    elif args.command == 'store':
+        Drop_Time = float(open('Drop_Time.txt', 'r').read())
+        Names, Time_vs_U1 = read_report('U1.rpt')
+        cache.put(args.s, Drop_Time, Time_vs_U1, settings)
+    else:
+        cache.evict()
+        print(cache.stats())
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script keeps all runs in one columnar store instead of loose U1.rpt/Drop_Time.txt
+
+Layout of the store directory (one fixed-width binary file per column, row i = run i):
+meta.json             : rows, number of parameters, history channels, settings table
+run_id.i8             : run number (e.g. Run_num of Post_Processing.py, job id of Job_Queue.py)
+s1.f8 ... sP.f8       : design parameters (one column each, box queries read only those needed)
+drop_time.f8          : drop time [s]
+settings.i4           : index into the settings table of meta.json (Result_Cache.run_settings)
+key.u8                : first 8 bytes of Result_Cache.design_key (parameter + settings hash)
+created.f8            : time of the append
+hist_start.i8, hist_count.i8 : rows of the run in the history columns
+hist_time.f8, hist_U1.f8     : concatenated histories; channels added later (e.g. U2) are NaN
+                               for the runs appended before
+index_run_id.i8, index_key.i8: rows sorted by run id / key, written by build_index
+
+Readers memory-map the columns (np.memmap, zero copy) and never load the whole store.
+Rows become visible when meta.json is replaced at the end of an append, so a crash in
+the middle of an append leaves the store as before. One writer at a time.
+Rows appended after the last build_index are searched linearly.
+
+Run command:
+python Result_Store.py add --store Results 0.2 0.326 0.579 0.8 0.674 --run 103 --report U1.rpt
+python Result_Store.py import-queue --store Results --db Job_Queue.db
+python Result_Store.py top --store Results -k 10
+python Result_Store.py box --store Results --lo 0 0 0 0 0 --hi 0.5 1 1 1 1
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from Result_Cache import design_key, design_keys, Settings
+
+Meta_file = 'meta.json'
+Channels = ('time', 'U1')
+
+
+def _key64(s, settings=None):
+    return np.uint64(int(design_key(s, settings)[:16], 16))
+
+
+def _keys64(S, settings=None):
+    return np.array([int(Key[:16], 16) for Key in design_keys(S, settings)], dtype=np.uint64)
+
+
+class ResultStore(object):
+    """
+    Columnar store of runs in directory path
+    """
+    def __init__(self, path, n_params=5, mode='r'):
+        self.path = path
+        self.mode = mode
+        Meta_path = os.path.join(path, Meta_file)
+        if os.path.exists(Meta_path):
+            with open(Meta_path, 'r') as file:
+                self.meta = json.load(file)
+        elif mode == 'r':
+            raise IOError('No result store in ' + path)
+        else:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self.meta = dict(rows=0, hist_rows=0, n_params=n_params, channels=list(Channels),
+                             settings=[], indexed=0)
+            self._write_meta()
+        self.columns = dict([('run_id', 'i8')] + [('s%d' % (i + 1), 'f8')
+                            for i in range(self.meta['n_params'])]
+                            + [('drop_time', 'f8'), ('settings', 'i4'), ('key', 'u8'),
+                               ('created', 'f8'), ('hist_start', 'i8'), ('hist_count', 'i8')])
+        self._maps = {}
+        if mode != 'r':
+            self._truncate()
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def _file(self, name, dtype):
+        return os.path.join(self.path, '%s.%s' % (name, dtype))
+
+    def _write_meta(self):
+        Temp = os.path.join(self.path, Meta_file + '.tmp')
+        with open(Temp, 'w') as file:
+            json.dump(self.meta, file)
+        os.replace(Temp, os.path.join(self.path, Meta_file))
+
+    def _truncate(self):
+        # Drop the tail of an interrupted append
+        for Name, dtype in self.columns.items():
+            Path = self._file(Name, dtype)
+            if os.path.exists(Path):
+                os.truncate(Path, min(os.path.getsize(Path), self.meta['rows']*np.dtype(dtype).itemsize))
+        for Name in os.listdir(self.path):
+            if Name.startswith('hist_') and Name.endswith('.f8'):
+                Path = os.path.join(self.path, Name)
+                if Name[5:-3] in self.meta['channels']:
+                    os.truncate(Path, min(os.path.getsize(Path), 8*self.meta['hist_rows']))
+                else:
+                    # Channel of an interrupted append
+                    os.remove(Path)
+
+    def column(self, name):
+        """
+        Memory-mapped column (read-only view of the committed rows)
+        """
+        if name in self.columns:
+            dtype, n = self.columns[name], self.meta['rows']
+        else:
+            dtype, n = 'f8', self.meta['hist_rows']
+            name = 'hist_' + name
+        Key = (name, n)
+        if Key not in self._maps:
+            Path = self._file(name, dtype)
+            if n == 0 or not os.path.exists(Path):
+                Map = np.full(n, np.nan) if dtype == 'f8' else np.zeros(n, dtype)
+            else:
+                Map = np.memmap(Path, dtype=dtype, mode='r', shape=(n,))
+            self._maps = dict((k, v) for k, v in self._maps.items() if k[0] != name)
+            self._maps[Key] = Map
+        return self._maps[Key]
+
+    def params(self, rows=None):
+        """
+        (n, P) array of the parameters of rows (all rows if None)
+        """
+        Columns = [self.column('s%d' % (i + 1)) for i in range(self.meta['n_params'])]
+        if rows is None:
+            return np.column_stack(Columns)
+        return np.column_stack([Column[rows] for Column in Columns])
+
+    def _settings_id(self, settings):
+        settings = dict(Settings if settings is None else settings)
+        if settings not in self.meta['settings']:
+            self.meta['settings'].append(settings)
+        return self.meta['settings'].index(settings)
+
+    def append(self, run_id, s, drop_time, history=None, settings=None):
+        """
+        Append one run; history is a dict channel -> (m,) array or an (m, 2) time vs U1 array
+        """
+        self.extend([run_id], [s], [drop_time], [history], settings)
+
+    def extend(self, run_ids, S, drop_times, histories=None, settings=None):
+        """
+        Append many runs at once (one write per column)
+        settings: one dict for all runs, or a list with a dict (None: defaults) per run
+        """
+        if self.mode == 'r':
+            raise IOError('Result store opened read-only')
+        if not isinstance(S, np.ndarray) and len(S) and np.ndim(S[0]) > 0:
+            Lengths = sorted(set(len(s) for s in S))
+            if len(Lengths) > 1:
+                raise ValueError('Designs of different lengths %s' % Lengths)
+        S = np.atleast_2d(np.asarray(S, dtype=np.float64))
+        n = len(S)
+        if S.ndim != 2 or S.shape[1] != self.meta['n_params']:
+            raise ValueError('Store has %d parameters, got %d' % (self.meta['n_params'], S.shape[1]))
+        Hist = []
+        for History in histories if histories is not None else []:
+            if History is None:
+                History = {}
+            elif not isinstance(History, dict):
+                History = np.asarray(History, dtype=np.float64)
+                History = dict(zip(('time', 'U1'), History.T))
+            Hist.append(History)
+        for History in Hist:
+            for Channel in History:
+                if Channel not in self.meta['channels']:
+                    self.meta['channels'].append(Channel)
+        Count = np.zeros(n, dtype=np.int64)
+        if Hist:
+            Count[:] = [max([len(v) for v in History.values()] or [0]) for History in Hist]
+        Start = self.meta['hist_rows'] + np.concatenate(([0], np.cumsum(Count)[:-1]))
+        if isinstance(settings, (list, tuple)):
+            if len(settings) != n:
+                raise ValueError('%d settings for %d runs' % (len(settings), n))
+            Ids = np.array([self._settings_id(Each) for Each in settings], dtype=np.int32)
+        else:
+            Ids = np.full(n, self._settings_id(settings), dtype=np.int32)
+        # Keys hashed per settings group
+        Keys = np.empty(n, dtype=np.uint64)
+        for Id in np.unique(Ids):
+            Keys[Ids == Id] = _keys64(S[Ids == Id], self.meta['settings'][Id])
+        Values = dict(run_id=np.asarray(run_ids), drop_time=np.asarray(drop_times),
+                      settings=Ids, key=Keys,
+                      created=np.full(n, time.time()),
+                      hist_start=Start, hist_count=Count)
+        for i in range(self.meta['n_params']):
+            Values['s%d' % (i + 1)] = S[:, i]
+        for Name, dtype in self.columns.items():
+            with open(self._file(Name, dtype), 'ab') as file:
+                file.write(np.ascontiguousarray(Values[Name], dtype=dtype).tobytes())
+        for Channel in self.meta['channels']:
+            Path = self._file('hist_' + Channel, 'f8')
+            with open(Path, 'ab') as file:
+                # Earlier runs without this channel
+                Have = os.path.getsize(Path)//8 if os.path.exists(Path) else 0
+                if Have == 0 and self.meta['hist_rows'] > 0:
+                    file.write(np.full(self.meta['hist_rows'], np.nan).tobytes())
+                Value = np.full(int(Count.sum()), np.nan)
+                for History, a in zip(Hist, Start - self.meta['hist_rows']):
+                    if Channel in History:
+                        Value[a:a + len(History[Channel])] = History[Channel]
+                file.write(Value.tobytes())
+        self.meta['rows'] += n
+        self.meta['hist_rows'] += int(Count.sum())
+        self._write_meta()
+
+    def build_index(self):
+        """
+        Sorted row order by run id and by key, for binary search
+        """
+        for Name in ('run_id', 'key'):
+            Order = np.argsort(self.column(Name), kind='stable').astype(np.int64)
+            Temp = self._file('index_' + Name, 'i8') + '.tmp'
+            Order.tofile(Temp)
+            os.replace(Temp, self._file('index_' + Name, 'i8'))
+        self.meta['indexed'] = self.meta['rows']
+        self._write_meta()
+
+    def _lookup(self, name, value):
+        Values = self.column(name)
+        n = self.meta['indexed']
+        Rows = np.zeros(0, dtype=np.int64)
+        if n:
+            Order = np.memmap(self._file('index_' + name, 'i8'), dtype='i8', mode='r', shape=(n,))
+            Sorted = Values[:n]
+            Lo, Hi = 0, n
+            # Binary search through the index (Sorted[Order] is never built)
+            while Lo < Hi:
+                Mid = (Lo + Hi)//2
+                if Sorted[Order[Mid]] < value:
+                    Lo = Mid + 1
+                else:
+                    Hi = Mid
+            End = Lo
+            while End < n and Sorted[Order[End]] == value:
+                End += 1
+            Rows = np.sort(np.asarray(Order[Lo:End]))
+        Tail = np.nonzero(Values[n:] == value)[0] + n
+        return np.concatenate((Rows, Tail))
+
+    def rows_by_run(self, run_id):
+        return self._lookup('run_id', np.int64(run_id))
+
+    def rows_by_design(self, s, settings=None):
+        """
+        Rows of the runs of design s with the given settings (hash lookup, then exact check)
+        """
+        Rows = self._lookup('key', _key64(s, settings))
+        if len(Rows):
+            Rows = Rows[np.all(self.params(Rows) == np.asarray(s, dtype=float), axis=1)]
+        return Rows
+
+    def history(self, row, channels=('time', 'U1')):
+        """
+        Zero-copy (m, ) views of the history channels of one row
+        """
+        Start, Count = int(self.column('hist_start')[row]), int(self.column('hist_count')[row])
+        return [self.column(Channel)[Start:Start + Count] for Channel in channels]
+
+    def top_k(self, k=10, largest=False):
+        """
+        Rows of the k fastest runs (slowest with largest=True), sorted
+        """
+        T = np.asarray(self.column('drop_time'))
+        Valid = np.nonzero(~np.isnan(T))[0]
+        Value = -T[Valid] if largest else T[Valid]
+        k = min(k, len(Valid))
+        if k == 0:
+            return Valid
+        Part = np.argpartition(Value, k - 1)[:k]
+        return Valid[Part[np.argsort(Value[Part], kind='stable')]]
+
+    def box(self, lo, hi):
+        """
+        Rows with lo <= s <= hi (NaN bounds are open), narrowing one column at a time
+        """
+        Rows = None
+        for i, (a, b) in enumerate(zip(lo, hi)):
+            if np.isnan(a) and np.isnan(b):
+                continue
+            Column = self.column('s%d' % (i + 1))
+            Value = Column if Rows is None else Column[Rows]
+            Mask = np.ones(len(Value), dtype=bool)
+            if not np.isnan(a):
+                Mask &= Value >= a
+            if not np.isnan(b):
+                Mask &= Value <= b
+            Rows = np.nonzero(Mask)[0] if Rows is None else Rows[Mask]
+        return np.arange(len(self)) if Rows is None else Rows
+
+    def records(self, rows):
+        """
+        List of dicts of rows (run id, s, drop time) for printing
+        """
+        S = self.params(rows)
+        return [dict(run_id=int(self.column('run_id')[r]), s=S[i].tolist(),
+                     drop_time=float(self.column('drop_time')[r])) for i, r in enumerate(rows)]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Columnar store of Ball_Drop runs')
+    Sub = parser.add_subparsers(dest='command')
+    Add = Sub.add_parser('add', help='append the run in the current directory')
+    Add.add_argument('s', type=float, nargs='+')
+    Add.add_argument('--run', type=int, required=True)
+    Add.add_argument('--report', default='U1.rpt')
+    Add.add_argument('--drop-time', default='Drop_Time.txt')
+    Add.add_argument('--settings', default='Settings.json',
+                     help='settings of the run written by Pre_Processing.py, if present')
+    Queue = Sub.add_parser('import-queue', help='append finished jobs of Job_Queue.py')
+    Queue.add_argument('--db', default='Job_Queue.db')
+    Queue.add_argument('--jobs-dir', default='Jobs')
+    Top = Sub.add_parser('top', help='fastest runs')
+    Top.add_argument('-k', type=int, default=10)
+    Box = Sub.add_parser('box', help='runs within a parameter box')
+    Box.add_argument('--lo', type=float, nargs='+', required=True)
+    Box.add_argument('--hi', type=float, nargs='+', required=True)
+    for Each in (Add, Queue, Top, Box):
+        Each.add_argument('--store', default='Results')
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        from Report_Reader import read_report
+        store = ResultStore(args.store, len(args.s), mode='a')
+        with open(args.drop_time, 'r') as file:
+            Drop_Time = float(file.read())
+        from Result_Cache import load_settings
+        Settings_run = load_settings(args.settings) if os.path.exists(args.settings) else None
+        store.append(args.run, args.s, Drop_Time, read_report(args.report)[1][:, :2],
+                     Settings_run)
+        store.build_index()
+    elif args.command == 'import-queue':
+        from Job_Queue import JobQueue
+        from Report_Reader import read_report
+        queue = JobQueue(args.db, args.jobs_dir)
+        Results = queue.results()
+        store = ResultStore(args.store, len(Results[0][1]) if Results else 5, mode='a')
+        from Result_Cache import load_settings, Settings_file
+        New = [(job_id, s, t) for job_id, s, t in Results if not len(store.rows_by_run(job_id))]
+        Histories, Settings_runs = [], []
+        for job_id, _, _ in New:
+            Path = os.path.join(queue.workdir(job_id), 'U1.rpt')
+            Histories.append(read_report(Path)[1][:, :2] if os.path.exists(Path) else None)
+            # Settings of the run (Pre_Processing.py/Inp_Writer.py), defaults if missing
+            Path = os.path.join(queue.workdir(job_id), Settings_file)
+            Settings_runs.append(load_settings(Path) if os.path.exists(Path) else None)
+        if New:
+            store.extend([r[0] for r in New], [r[1] for r in New], [r[2] for r in New], Histories,
+                         Settings_runs)
+            store.build_index()
+        print('%d runs added, %d in the store' % (len(New), len(store)))
+    elif args.command in ('top', 'box'):
+        store = ResultStore(args.store)
+        Rows = store.top_k(args.k) if args.command == 'top' else store.box(args.lo, args.hi)
+        for Record in store.records(Rows):
+            print('%8d  %s  %.8f' % (Record['run_id'], ' '.join('%.4f' % si for si in Record['s']),
+                                     Record['drop_time']))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
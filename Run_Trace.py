@@ -0,0 +1,309 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script records where the time of a Ball_Drop run goes, stage by stage
+
+Pre_Processing.py and Post_Processing.py mark their blocks (sketch, mesh, writeInput,
+XY report, animation, ...); every stage appends one JSON line to the trace file:
+
+{"run": "Ball_Drop_3", "script": "Post_Processing", "stage": "xy_report", "pid": 1234,
+ "start": 1700000000.0, "wall": 1.52, "cpu": 1.31, "peak_rss": 412000000, "rss_scope": "stage"}
+
+wall      : elapsed time [s]          cpu : user + system time of the process [s]
+peak_rss  : peak resident memory [bytes]; rss_scope 'stage' if the peak was reset at the
+            start of the stage (Linux), 'process' if it is the peak of the process so far
+startup   : first stage of every script, from the start of the process (CAE startup)
+            to the creation of the Tracer
+
+Stages are marked with
+- trace.begin('mesh') ... trace.end()  : for the flat scripts, begin also ends the open stage
+- with trace.stage('mesh'): / @trace.stage('mesh') : context manager or decorator
+The trace file is BALL_DROP_TRACE (default Trace.jsonl in the working directory, empty to
+disable) and the run is BALL_DROP_JOB, both set per job by Job_Queue.py.
+Nothing here imports Abaqus, so the scripts can be run with the Abaqus modules stubbed.
+
+The solver runs outside of the scripts; wrap its command to trace it as a stage:
+python Run_Trace.py run --stage solver -- abaqus job=Ball_Drop interactive
+
+Summary over many runs (per stage: runs, wall p50/p90/max, cpu, peak memory, share of time):
+python Run_Trace.py summary Jobs --chrome Trace_Chrome.json
+The Chrome trace (chrome://tracing, Perfetto) shows one process per run.
+"""
+import atexit
+import contextlib
+import json
+import os
+import sys
+import time
+
+Trace_file = 'Trace.jsonl'
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _process_start():
+    """
+    Start time (epoch) of the current process, None if unknown
+    """
+    try:
+        with open('/proc/self/stat', 'r') as file:
+            Ticks = float(file.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as file:
+            Uptime = float(file.read().split()[0])
+        return time.time() - Uptime + Ticks/os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError, AttributeError):
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        Times = [ctypes.c_ulonglong() for _ in range(4)]
+        Handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.kernel32.GetProcessTimes(Handle, *[ctypes.byref(t) for t in Times]):
+            # 100 ns intervals since 1601-01-01
+            return Times[0].value*1e-7 - 11644473600.
+    return None
+
+
+def _reset_peak():
+    """
+    Reset the peak resident memory of the process (Linux), True on success
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    """
+    Peak resident memory [bytes] since the last reset (or process start), None if unknown
+    """
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for Line in file:
+                if Line.startswith('VmHWM:'):
+                    return int(Line.split()[1])*1024
+    except OSError:
+        pass
+    if resource is not None:
+        Peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return Peak if sys.platform == 'darwin' else Peak*1024
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (Name, ctypes.c_size_t) for Name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                    'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                    'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+        Info = Counters()
+        Info.cb = ctypes.sizeof(Info)
+        Handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(Handle, ctypes.byref(Info), Info.cb):
+            return Info.PeakWorkingSetSize
+    return None
+
+
+def _cpu_time():
+    return time.process_time()
+
+
+class _Stage(contextlib.ContextDecorator):
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.scope = 'stage' if _reset_peak() else 'process'
+        self.start = time.time()
+        self.wall = time.perf_counter()
+        self.cpu = _cpu_time()
+        return self
+
+    def __exit__(self, Type, Value, Traceback):
+        Record = dict(stage=self.name, start=self.start,
+                      wall=time.perf_counter() - self.wall, cpu=_cpu_time() - self.cpu,
+                      peak_rss=_peak_rss(), rss_scope=self.scope)
+        if Type is not None:
+            Record['error'] = Type.__name__
+        self.tracer.write(Record)
+        return False
+
+
+class Tracer(object):
+    """
+    Stage records of one script run, appended to a JSON lines file
+    """
+    def __init__(self, script, path=None, run=None, startup=True):
+        self.script = script
+        self.path = os.environ.get('BALL_DROP_TRACE', Trace_file) if path is None else path
+        self.run = run or os.environ.get('BALL_DROP_JOB', 'Ball_Drop')
+        self.current = None
+        # A stage left open by an uncaught error is still recorded
+        atexit.register(self._exit)
+        # Time before the first line of the script: CAE startup
+        Start = _process_start() if startup else None
+        if Start is not None:
+            self.write(dict(stage='startup', start=Start, wall=time.time() - Start,
+                            cpu=_cpu_time(), peak_rss=_peak_rss(), rss_scope='process'))
+
+    def write(self, Record):
+        if not self.path:
+            return
+        Record = dict(run=self.run, script=self.script, pid=os.getpid(), **Record)
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(Record) + '\n')
+
+    def stage(self, name):
+        """
+        Context manager / decorator recording the enclosed block as stage name
+        """
+        return _Stage(self, name)
+
+    def begin(self, name):
+        """
+        End the open stage (if any) and start stage name
+        """
+        self.end()
+        self.current = _Stage(self, name).__enter__()
+
+    def end(self):
+        if self.current is not None:
+            self.current.__exit__(None, None, None)
+            self.current = None
+
+    def _exit(self):
+        if self.current is not None:
+            self.current.__exit__(getattr(sys, 'last_type', None), None, None)
+            self.current = None
+
+
+def run_command(Command, stage, tracer):
+    """
+    Run a command as one stage; cpu and peak_rss are those of the child processes
+    """
+    import subprocess
+    Before = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    Start, Wall = time.time(), time.perf_counter()
+    Code = subprocess.call(Command, shell=isinstance(Command, str))
+    Record = dict(stage=stage, start=Start, wall=time.perf_counter() - Wall, cpu=None,
+                  peak_rss=None, rss_scope='children', returncode=Code)
+    if resource:
+        After = resource.getrusage(resource.RUSAGE_CHILDREN)
+        Record['cpu'] = (After.ru_utime + After.ru_stime) - (Before.ru_utime + Before.ru_stime)
+        Record['peak_rss'] = After.ru_maxrss*(1 if sys.platform == 'darwin' else 1024)
+    tracer.write(Record)
+    return Code
+
+
+def read_traces(paths):
+    Records = []
+    for Path in paths:
+        with open(Path, 'r') as file:
+            for Line in file:
+                if Line.strip():
+                    Records.append(json.loads(Line))
+    return Records
+
+
+def summarize(Records):
+    """
+    Per (script, stage) in order of appearance: runs, wall p50/p90/max, mean cpu,
+    max peak_rss and share of the total wall time
+    """
+    import numpy as np
+    Groups = {}
+    for Record in Records:
+        Groups.setdefault((Record['script'], Record['stage']), []).append(Record)
+    Total = sum(Record['wall'] for Record in Records) or 1.
+    Summary = []
+    for (Script, Stage), Group in Groups.items():
+        Wall = np.array([Record['wall'] for Record in Group])
+        Cpu = [Record['cpu'] for Record in Group if Record.get('cpu') is not None]
+        Rss = [Record['peak_rss'] for Record in Group if Record.get('peak_rss') is not None]
+        Summary.append(dict(
+            script=Script, stage=Stage, runs=len(set(Record['run'] for Record in Group)),
+            wall_p50=float(np.median(Wall)), wall_p90=float(np.percentile(Wall, 90)),
+            wall_max=float(Wall.max()), cpu_mean=float(np.mean(Cpu)) if Cpu else None,
+            peak_rss_max=max(Rss) if Rss else None, share=float(Wall.sum()/Total),
+            errors=sum('error' in Record for Record in Group)))
+    return Summary
+
+
+def chrome_trace(Records):
+    """
+    Chrome trace events: one process per run, one thread per script
+    """
+    Runs, Scripts, Events = {}, {}, []
+    for Record in Records:
+        pid = Runs.setdefault(Record['run'], len(Runs) + 1)
+        tid = Scripts.setdefault(Record['script'], len(Scripts) + 1)
+        Args = dict((Key, Record.get(Key)) for Key in ('cpu', 'peak_rss', 'rss_scope', 'error')
+                    if Record.get(Key) is not None)
+        Events.append(dict(name=Record['stage'], cat=Record['script'], ph='X', pid=pid, tid=tid,
+                           ts=Record['start']*1e6, dur=Record['wall']*1e6, args=Args))
+    for Run, pid in Runs.items():
+        Events.append(dict(name='process_name', ph='M', pid=pid, args=dict(name=Run)))
+        for Script, tid in Scripts.items():
+            Events.append(dict(name='thread_name', ph='M', pid=pid, tid=tid,
+                               args=dict(name=Script)))
+    return dict(traceEvents=Events, displayTimeUnit='ms')
+
+
+def main():
+    import argparse
+    import glob
+    parser = argparse.ArgumentParser(description='Stage traces of Ball_Drop runs')
+    Sub = parser.add_subparsers(dest='command')
+    Run = Sub.add_parser('run', help='run a command as one traced stage')
+    Run.add_argument('--stage', default='solver')
+    Run.add_argument('--script', default='Job')
+    Run.add_argument('cmd', nargs=argparse.REMAINDER, help='-- command and arguments')
+    Summary = Sub.add_parser('summary', help='summarize trace files')
+    Summary.add_argument('paths', nargs='+', help='trace files or directories')
+    Summary.add_argument('--pattern', default='**/' + Trace_file)
+    Summary.add_argument('--chrome', default=None, help='write a Chrome trace json')
+    Summary.add_argument('--json', default=None, help='write the summary as json')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        Command = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        sys.exit(run_command(Command, args.stage, Tracer(args.script, startup=False)))
+    elif args.command == 'summary':
+        Files = []
+        for Path in args.paths:
+            Files += (sorted(glob.glob(os.path.join(Path, args.pattern), recursive=True))
+                      if os.path.isdir(Path) else [Path])
+        Records = read_traces(Files)
+        Summary = summarize(Records)
+        print('%d records of %d runs in %d files' % (
+            len(Records), len(set(Record['run'] for Record in Records)), len(Files)))
+        print('%-16s %-14s %5s %10s %10s %10s %10s %10s %6s' % (
+            'Script', 'Stage', 'Runs', 'p50 [s]', 'p90 [s]', 'max [s]', 'cpu [s]',
+            'RSS [MB]', 'Share'))
+        for Row in Summary:
+            print('%-16s %-14s %5d %10.3f %10.3f %10.3f %10s %10s %5.1f%%' % (
+                Row['script'], Row['stage'], Row['runs'], Row['wall_p50'], Row['wall_p90'],
+                Row['wall_max'], '-' if Row['cpu_mean'] is None else '%.3f' % Row['cpu_mean'],
+                '-' if Row['peak_rss_max'] is None else '%.1f' % (Row['peak_rss_max']/2.**20),
+                100*Row['share']))
+        if args.json:
+            with open(args.json, 'w') as file:
+                json.dump(Summary, file, indent=1)
+        if args.chrome:
+            with open(args.chrome, 'w') as file:
+                json.dump(chrome_trace(Records), file)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script plans the Explicit step of a design before the deck is written
+
+Pre_Processing.py runs every design for 0.3 s with a fixed increment of 5e-05 s
+(6000 increments) and 50 field intervals, although the ball arrives between ~0.23 s
+and ~0.25 s. The planner
+1. Predicts the arrival (ball center at x = 50*pi) with Ball_Dynamics.simulate,
+   the reduced-order model of the same frictionless run, for one design or a pack
+2. Sets the step time to the latest predicted arrival plus a safety margin
+   (Margin relative + Margin_time absolute), rounded up to whole increments
+3. Estimates the stable increment of the ball mesh: element length from the seed 1.1
+   (height of a regular tetrahedron, halved for the mid-side nodes of C3D10) over the
+   dilatational wave speed of the steel (E = 200000, nu = 0.3, rho = 7.85e-09)
+   In the model the ball is a rigid body, so its elements do not limit the increment and
+   the user-defined increment is kept; the estimate is applied only with rigid_ball=False.
+4. Scales the field output intervals to keep the frame spacing of 0.3 s / 50 intervals
+   The U1 history stays at every increment.
+A design whose arrival cannot be predicted keeps the fixed 0.3 s step.
+
+Run command:
+python Step_Planner.py 0.2 0.326 0.579 0.8 0.674
+"""
+import numpy as np
+
+from Ball_Dynamics import simulate
+
+# Fixed step of Pre_Processing.py
+Step_time = 0.3
+Increment = 5e-05
+Num_intervals = 50
+# Safety margin on the predicted arrival
+Margin = 0.1
+Margin_time = 0.005
+# Ball mesh and steel of Pre_Processing.py
+Seed_ball = 1.1
+Young = 200000.0
+Density = 7.85e-09
+Poisson = 0.3
+# Height of a regular tetrahedron over its edge length
+Tet_height = np.sqrt(2./3.)
+
+
+def wave_speed(E=Young, rho=Density, nu=Poisson):
+    """
+    Dilatational wave speed [mm/s]
+    """
+    return np.sqrt(E*(1 - nu)/((1 + nu)*(1 - 2*nu)*rho))
+
+
+def stable_increment(seed=Seed_ball, E=Young, rho=Density, nu=Poisson, quadratic=True):
+    """
+    Element-by-element estimate of the stable time increment of the ball mesh [s]
+    """
+    Length = Tet_height*seed/(2. if quadratic else 1.)
+    return Length/wave_speed(E, rho, nu)
+
+
+def predict_arrival(S, t_max=1.0):
+    """
+    Predicted arrival time of every design of S [s], NaN if not within t_max
+    """
+    S = np.atleast_2d(np.asarray(S, dtype=float))
+    return simulate(S, t_max=t_max)['arrival']
+
+
+def plan_step(S, margin=Margin, margin_time=Margin_time, increment=Increment,
+              rigid_ball=True, interval=Step_time/Num_intervals):
+    """
+    Step of one design (s) or of a pack of designs (rows of S), dict of
+    arrival (predicted, latest of the pack), step_time, increment, increments,
+    intervals (field output) and stable_increment (estimate for the ball mesh)
+    """
+    Arrival = predict_arrival(S)
+    Latest = np.max(Arrival)
+    Stable = stable_increment()
+    dt = increment if rigid_ball else min(increment, Stable)
+    if np.isfinite(Latest):
+        n = int(np.ceil((Latest*(1 + margin) + margin_time)/dt - 1e-9))
+    else:
+        n = int(np.ceil(Step_time/dt - 1e-9))
+    # 15 significant digits: whole increments also for the fine stable increment
+    return dict(arrival=float(Latest), step_time=float('%.15g' % (n*dt)), increment=float(dt),
+                increments=n,
+                intervals=max(1, int(round(n*dt/interval))), stable_increment=float(Stable))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Step time and increment of a design')
+    parser.add_argument('s', type=float, nargs='+', help='s1 s2 s3 s4 s5')
+    parser.add_argument('--margin', type=float, default=Margin)
+    parser.add_argument('--deformable', action='store_true',
+                        help='ball without rigid body, increment from the stable estimate')
+    args = parser.parse_args()
+    Plan = plan_step(args.s, args.margin, rigid_ball=not args.deformable)
+    print('Predicted arrival : %.5f s' % Plan['arrival'])
+    print('Step time         : %.5f s (fixed %.2f s)' % (Plan['step_time'], Step_time))
+    print('Increment         : %.3e s, %d increments (fixed %d)' % (
+        Plan['increment'], Plan['increments'], int(round(Step_time/Increment))))
+    print('Field intervals   : %d' % Plan['intervals'])
+    print('Stable increment  : %.3e s (ball mesh estimate, c_d = %.4g mm/s)' % (
+        Plan['stable_increment'], wave_speed()))
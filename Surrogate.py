@@ -0,0 +1,335 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script fits a surrogate of the Abaqus drop time on the runs done so far
+and proposes the next batch of s = [s1, ..., s5] to run
+
+Surrogate: Gaussian process, squared-exponential kernel, on the drop times normalized to
+unit variance. Optionally (--trend) the process models the residual of a linear fit
+drop_time ~ a + b*Drop_Time_Model.drop_time(s), so the FE runs only have to learn the
+correction to the fast model.
+- fit()   : length scale and noise picked by marginal likelihood over a small grid
+- update(): new results are appended to the Cholesky factor, O(n^2) per result;
+            the hyperparameters are refitted only when the data has grown by refit_growth
+Acquisition (expected improvement or lower confidence bound):
+1. Mean and standard deviation over n_cand candidates (uniform samples and local
+   perturbations of the best runs), in chunks
+2. Shortlist of the best candidates, joint posterior covariance of the shortlist
+3. Greedy batch: jobs still running are conditioned on first, then every pick is
+   conditioned on at its predicted mean (kriging believer), so the batch spreads out
+   No refit, only rank-one updates of the shortlist covariance.
+
+Run command:
+python Surrogate.py propose --store Results --db Job_Queue.db --batch 4 --submit
+python Surrogate.py demo --budget 40 --batch 4
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+from scipy.stats import norm
+
+Length_scales = (0.1, 0.2, 0.4, 0.8, 1.6)
+Noises = (1e-6, 1e-4, 1e-2)
+Num_cand = 100000
+Num_shortlist = 1024
+Num_chunk = 8192
+Model_file = 'Surrogate.pkl'
+
+
+def _sqdist(A, B):
+    return np.maximum(np.sum(A**2, axis=1)[:, None] + np.sum(B**2, axis=1)[None, :] - 2*A @ B.T, 0.)
+
+
+def _se_kernel(A, B, l):
+    """
+    exp(-|a - b|^2/(2 l^2)), in place (the exponential dominates for large A)
+    """
+    A, B = A/l, B/l
+    G = A @ B.T
+    G -= 0.5*np.sum(A**2, axis=1)[:, None]
+    G -= 0.5*np.sum(B**2, axis=1)[None, :]
+    np.minimum(G, 0., out=G)
+    return np.exp(G, out=G)
+
+
+class Surrogate(object):
+    """
+    Gaussian-process surrogate of the drop time, updated incrementally
+    """
+    def __init__(self, dim=5, trend=None, refit_growth=1.5, lower=0., upper=1., seed=0):
+        self.dim = dim
+        self.trend = trend
+        self.refit_growth = refit_growth
+        self.lower, self.upper = lower, upper
+        self.rng = np.random.default_rng(seed)
+        self.X = np.empty((0, dim))
+        self.F = np.empty(0)
+        self.T = np.empty(0)
+        self.n_fit = 0
+
+    def __len__(self):
+        return len(self.F)
+
+    def _kernel(self, A, B):
+        return _se_kernel(A, B, self.l)
+
+    def _set_factor(self, L, Li=None):
+        # Inverse factor kept as well: variances by matrix product instead of triangular solves
+        self.L = L
+        self.Li = solve_triangular(L, np.eye(len(L)), lower=True) if Li is None else Li
+        self.Li32 = self.Li.astype(np.float32)
+
+    def _trend(self, X):
+        return self.trend(X) if self.trend is not None else np.zeros(len(X))
+
+    def _mean(self, T):
+        return self.beta[0] + self.beta[1]*T
+
+    def fit(self, X=None, F=None):
+        """
+        Full fit on (X, F), or on the data so far
+        """
+        if X is not None:
+            self.X = np.array(X, dtype=float).reshape(-1, self.dim)
+            self.F = np.array(F, dtype=float).ravel()
+            self.T = self._trend(self.X)
+        X, F, n = self.X, self.F, len(self.F)
+        if self.trend is not None and n > 2:
+            self.beta = np.linalg.lstsq(np.column_stack((np.ones(n), self.T)), F, rcond=None)[0]
+        else:
+            self.beta = np.array([F.mean(), 0.])
+        R = F - self._mean(self.T)
+        self.Std = max(R.std(), 1e-3*np.abs(F).mean(), 1e-12)
+        self.Z = R/self.Std
+        D2 = _sqdist(X, X)
+        Best = None
+        for l in Length_scales:
+            for Noise in Noises:
+                try:
+                    L = np.linalg.cholesky(np.exp(-0.5*D2/l**2) + Noise*np.eye(n))
+                except np.linalg.LinAlgError:
+                    continue
+                alpha = cho_solve((L, True), self.Z)
+                Loglik = -0.5*self.Z @ alpha - np.sum(np.log(np.diag(L)))
+                if Best is None or Loglik > Best[0]:
+                    Best = (Loglik, l, Noise, L, alpha)
+        _, self.l, self.Noise, L, self.alpha = Best
+        self._set_factor(L)
+        self.n_fit = n
+        return self
+
+    def update(self, X, F):
+        """
+        Add results; the Cholesky factor is extended, not recomputed
+        """
+        X = np.array(X, dtype=float).reshape(-1, self.dim)
+        F = np.array(F, dtype=float).ravel()
+        T = self._trend(X)
+        self.X, self.F, self.T = np.vstack((self.X, X)), np.append(self.F, F), np.append(self.T, T)
+        if not self.n_fit or len(self.F) >= self.refit_growth*self.n_fit:
+            return self.fit()
+        n = len(self.Z)
+        L12 = solve_triangular(self.L, self._kernel(self.X[:n], X), lower=True)
+        try:
+            L22 = np.linalg.cholesky(self._kernel(X, X) + self.Noise*np.eye(len(X)) - L12.T @ L12)
+        except np.linalg.LinAlgError:
+            # Repeated design at a too small noise level
+            return self.fit()
+        L = np.zeros((n + len(X), n + len(X)))
+        L[:n, :n], L[n:, :n], L[n:, n:] = self.L, L12.T, L22
+        Li = np.zeros_like(L)
+        L22i = solve_triangular(L22, np.eye(len(X)), lower=True)
+        Li[:n, :n], Li[n:, :n], Li[n:, n:] = self.Li, -L22i @ L12.T @ self.Li, L22i
+        self._set_factor(L, Li)
+        self.Z = np.append(self.Z, (F - self._mean(T))/self.Std)
+        self.alpha = cho_solve((L, True), self.Z)
+        return self
+
+    def predict(self, Xc, T=None, chunk=Num_chunk, single=False):
+        """
+        Mean and standard deviation (without noise) of the drop time at Xc
+        single: variance in single precision, good enough to rank candidates
+        """
+        Xc = np.asarray(Xc, dtype=float).reshape(-1, self.dim)
+        T = self._trend(Xc) if T is None else T
+        Mu = np.empty(len(Xc))
+        Sd = np.empty(len(Xc))
+        for i in range(0, len(Xc), chunk):
+            Ks = self._kernel(Xc[i:i+chunk], self.X)
+            Mu[i:i+chunk] = self._mean(T[i:i+chunk]) + self.Std*(Ks @ self.alpha)
+            V = Ks.astype(np.float32) @ self.Li32.T if single else Ks @ self.Li.T
+            Sd[i:i+chunk] = self.Std*np.sqrt(np.maximum(1. - np.einsum('ij,ij->i', V, V), 1e-12))
+        return Mu, Sd
+
+    def candidates(self, n=Num_cand, local=0.5, scale=0.05, n_best=5):
+        """
+        Uniform samples and Gaussian perturbations of the n_best best designs
+        """
+        n_local = int(n*local) if len(self.F) else 0
+        Best = self.X[np.argsort(self.F)[:n_best]]
+        Local = (Best[self.rng.integers(len(Best), size=n_local)]
+                 + scale*self.rng.standard_normal((n_local, self.dim)))
+        Uniform = self.lower + (self.upper - self.lower)*self.rng.random((n - n_local, self.dim))
+        return np.clip(np.vstack((Uniform, Local)), self.lower, self.upper)
+
+    def _acquire(self, Mu, Sd, acquisition, kappa, best=None):
+        if acquisition == 'lcb':
+            return -(Mu - kappa*Sd)
+        Gain = (self.F.min() if best is None else best) - Mu
+        Z = Gain/Sd
+        return Gain*norm.cdf(Z) + Sd*norm.pdf(Z)
+
+    def propose(self, q=1, pending=None, candidates=None, n_cand=Num_cand,
+                shortlist=Num_shortlist, acquisition='ei', kappa=2.):
+        """
+        Batch of q designs to run next, (q, dim) array
+        pending: designs already running, their outcome is taken as the predicted mean
+        """
+        if len(self) < 2:
+            raise ValueError('Surrogate needs at least 2 runs to propose, has %d' % len(self))
+        Xc = self.candidates(n_cand) if candidates is None else np.asarray(candidates, dtype=float)
+        Mu, Sd = self.predict(Xc, single=True)
+        Score = self._acquire(Mu, Sd, acquisition, kappa)
+        if len(Xc) > shortlist:
+            Short = np.argpartition(-Score, shortlist - 1)[:shortlist]
+            Xc, Mu = Xc[Short], Mu[Short]
+        Xp = np.empty((0, self.dim)) if pending is None else np.reshape(pending, (-1, self.dim))
+        P = len(Xp)
+        # Believed outcomes count as results: a pick predicted below the best run is not
+        # worth repeating once its variance is conditioned away
+        Best = min([self.F.min()] + list(self.predict(Xp)[0]))
+        Xs = np.vstack((Xp, Xc))
+        V = self.Li @ self._kernel(Xs, self.X).T
+        # Joint posterior covariance of pending + shortlist, unit variance
+        C = self._kernel(Xs, Xs) - V.T @ V
+        Chosen = []
+        for Step in range(P + min(q, len(Xc))):
+            if Step < P:
+                j = Step
+            else:
+                Sd = self.Std*np.sqrt(np.maximum(np.diag(C)[P:], 1e-12))
+                Score = self._acquire(Mu, Sd, acquisition, kappa, Best)
+                Score[Chosen] = -np.inf
+                Chosen.append(int(Score.argmax()))
+                Best = min(Best, Mu[Chosen[-1]])
+                j = P + Chosen[-1]
+            # Believed outcomes are exact (a repeated run gives the same drop time), so the
+            # variance of a pick vanishes instead of dropping to the noise level
+            c = C[:, j].copy()
+            C -= np.outer(c, c)/(c[j] + 1e-9)
+        return Xc[Chosen]
+
+
+def load_model(path):
+    """
+    (surrogate, number of store rows it has seen), or (None, 0) without a saved model
+    """
+    if not os.path.exists(path):
+        return None, 0
+    with open(path, 'rb') as file:
+        state = pickle.load(file)
+    return state['model'], state['rows']
+
+
+def save_model(path, model, rows):
+    Temp = path + '.tmp'
+    with open(Temp, 'wb') as file:
+        pickle.dump(dict(model=model, rows=rows), file)
+    os.replace(Temp, path)
+
+
+def _demo(args):
+    """
+    Active learning against Ball_Dynamics (rolling ball) in place of Abaqus
+    """
+    from Ball_Dynamics import simulate
+    from Drop_Time_Model import drop_time_batch
+
+    def objective(S):
+        return simulate(np.atleast_2d(S), rolling=True)['arrival']
+
+    model = Surrogate(trend=drop_time_batch if args.trend else None, seed=args.seed)
+    X = model.rng.random((args.n_init, model.dim))
+    model.fit(X, objective(X))
+    Timings = []
+    while len(model) < args.budget:
+        t0 = time.perf_counter()
+        Batch = model.propose(min(args.batch, args.budget - len(model)), n_cand=args.n_cand)
+        t1 = time.perf_counter()
+        F = objective(Batch)
+        t2 = time.perf_counter()
+        model.update(Batch, F)
+        Timings.append((t1 - t0, time.perf_counter() - t2))
+        print('Runs %4d  best %.6f s  propose %.3f s  update %.4f s' % (
+            len(model), model.F.min(), Timings[-1][0], Timings[-1][1]))
+    Random = objective(model.rng.random((args.budget, model.dim)))
+    print('Best s                  : %s' % np.round(model.X[model.F.argmin()], 4))
+    print('Best of %4d random runs: %.6f s' % (args.budget, Random.min()))
+    print('Best of %4d active runs: %.6f s' % (args.budget, model.F.min()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Surrogate-based proposals of the next designs')
+    Sub = parser.add_subparsers(dest='command')
+    Propose = Sub.add_parser('propose', help='next batch from the runs of the result store')
+    Propose.add_argument('--store', default='Results', help='Result_Store.py directory')
+    Propose.add_argument('--db', default=None, help='Job_Queue.py database (running jobs, --submit)')
+    Propose.add_argument('--model', default=Model_file, help='pickle of the fitted surrogate')
+    Propose.add_argument('--submit', action='store_true', help='queue the batch in --db')
+    Demo = Sub.add_parser('demo', help='active learning on Ball_Dynamics.py instead of Abaqus')
+    Demo.add_argument('--budget', type=int, default=40, help='number of evaluations')
+    Demo.add_argument('--n-init', type=int, default=10)
+    Demo.add_argument('--seed', type=int, default=0)
+    for Each in (Propose, Demo):
+        Each.add_argument('--batch', type=int, default=4)
+        Each.add_argument('--n-cand', type=int, default=Num_cand)
+        Each.add_argument('--trend', action='store_true', help='model the residual of Drop_Time_Model')
+    args = parser.parse_args()
+
+    if args.command == 'propose':
+        from Result_Store import ResultStore
+        from Drop_Time_Model import drop_time_batch
+        store = ResultStore(args.store)
+        S, Drop_Times = store.params(), np.asarray(store.column('drop_time'))
+        model, Seen = load_model(args.model)
+        if model is None:
+            # Class taken from the module, not __main__, so the pickle loads anywhere
+            from Surrogate import Surrogate as Model
+            model = Model(S.shape[1], trend=drop_time_batch if args.trend else None)
+        # Only the rows appended since the last call are added
+        New = np.isfinite(Drop_Times[Seen:])
+        if New.any():
+            model.update(S[Seen:][New], Drop_Times[Seen:][New])
+        save_model(args.model, model, len(Drop_Times))
+        queue = None
+        if args.db:
+            from Job_Queue import JobQueue
+            queue = JobQueue(args.db)
+        if len(model) < 2:
+            # Nothing to learn from yet (as ActiveLearning.ask): uniform designs
+            sys.stderr.write('%d runs with a drop time in %s, uniform designs\n' % (
+                len(model), args.store))
+            Batch = model.lower + (model.upper - model.lower)*model.rng.random(
+                (args.batch, model.dim))
+        else:
+            Batch = model.propose(args.batch, pending=queue.pending() if queue else None,
+                                  n_cand=args.n_cand)
+        for s in Batch:
+            print(' '.join('%.6f' % si for si in s))
+            if args.submit and queue:
+                queue.submit(s)
+    elif args.command == 'demo':
+        _demo(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script runs a design-of-experiments sweep of s = [s1, ..., s5] on all cores
+
+1. Build a full-factorial grid of s in [0, 1]^5 (num points per parameter)
+2. Copy the grid into shared memory and split the rows into chunks
+3. Each worker evaluates its chunks with Drop_Time_Model.drop_time and writes
+   the drop times directly into a shared result array (nothing is pickled back)
+4. Compare with a single-worker run to report the scaling efficiency
+
+Run command:
+python Sweep.py --num 12 --workers 8 --chunk 4096 --output Sweep.npy
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from Drop_Time_Model import drop_time, Num_chunk
+
+# Shared arrays attached in each worker
+_Shared = {}
+
+
+def grid_designs(num):
+    """
+    Full-factorial grid of s in [0, 1]^5, (num**5, 5) array
+    """
+    Axis = np.linspace(0., 1., num=num, endpoint=True)
+    return np.stack(np.meshgrid(*[Axis]*5, indexing='ij'), axis=-1).reshape(-1, 5)
+
+
+def _init_worker(S_name, T_name, N):
+    S_shm = shared_memory.SharedMemory(name=S_name)
+    T_shm = shared_memory.SharedMemory(name=T_name)
+    _Shared['shm'] = (S_shm, T_shm)
+    _Shared['S'] = np.ndarray((N, 5), dtype=np.float64, buffer=S_shm.buf)
+    _Shared['T'] = np.ndarray((N,), dtype=np.float64, buffer=T_shm.buf)
+
+
+def _run_chunk(Bounds):
+    i0, i1 = Bounds
+    _Shared['T'][i0:i1] = drop_time(_Shared['S'][i0:i1])
+    return i1 - i0
+
+
+def run_sweep(S, workers=None, chunk=Num_chunk):
+    """
+    Drop times of an (N, 5) array of designs using a pool of worker processes
+    Returns the (N,) drop times and the wall time of the evaluation
+    """
+    S = np.asarray(S, dtype=np.float64)
+    N = len(S)
+    workers = workers or os.cpu_count()
+    S_shm = shared_memory.SharedMemory(create=True, size=max(S.nbytes, 1))
+    T_shm = shared_memory.SharedMemory(create=True, size=max(8*N, 1))
+    T = None
+    try:
+        np.ndarray(S.shape, dtype=np.float64, buffer=S_shm.buf)[:] = S
+        T = np.ndarray((N,), dtype=np.float64, buffer=T_shm.buf)
+        Chunks = [(i, min(i+chunk, N)) for i in range(0, N, chunk)]
+        Start = time.perf_counter()
+        with mp.get_context('fork').Pool(workers, initializer=_init_worker,
+                                         initargs=(S_shm.name, T_shm.name, N)) as Pool:
+            for _ in Pool.imap_unordered(_run_chunk, Chunks):
+                pass
+        Wall = time.perf_counter() - Start
+        Drop_Time = T.copy()
+    finally:
+        # No view may reference the buffers when they are closed
+        del T
+        S_shm.close()
+        S_shm.unlink()
+        T_shm.close()
+        T_shm.unlink()
+    return Drop_Time, Wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel drop-time sweep over s1..s5')
+    parser.add_argument('--num', type=int, default=10, help='grid points per parameter')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=Num_chunk, help='designs per task')
+    parser.add_argument('--no-baseline', action='store_true',
+                        help='skip the single-worker run used for scaling efficiency')
+    parser.add_argument('--output', default=None, help='save s and drop time to .npy')
+    args = parser.parse_args()
+
+    S = grid_designs(args.num)
+    Drop_Time, Wall = run_sweep(S, args.workers, args.chunk)
+    print('Designs    : %d' % len(S))
+    print('Workers    : %d, %.3g designs/s' % (args.workers, len(S)/Wall))
+    if not args.no_baseline:
+        _, Wall_1 = run_sweep(S, 1, args.chunk)
+        Speedup = Wall_1/Wall
+        print('Single     : %.3g designs/s' % (len(S)/Wall_1))
+        print('Speedup    : %.2f, efficiency %.1f %%' % (Speedup, 100*Speedup/args.workers))
+    Best = Drop_Time.argmin()
+    print('Best design: s = %s, drop time = %.6f s' % (np.round(S[Best], 4), Drop_Time[Best]))
+    if args.output:
+        np.save(args.output, np.column_stack((S, Drop_Time)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script packs M candidate tracks into one Abaqus/Explicit deck and splits
+the result back into M drop times, so solver start-up, licensing and I/O are paid once
+
+Layout of the packed deck (same model as Pre_Processing.py, one lane per design):
+- Lane i (i = 1..M): part Track_i (Inp_Writer.track_mesh of design i, rigid body on its
+  reference point, encastre), instance Track_i-1 translated to z = -Spacing*(i-1),
+  instance Ball-i of the Ball part at (-5.0, 5.0, 10.0 - Spacing*(i-1))
+- Optional cycloid lane (--cycloid) after the designs, part Track_Cycloid: the
+  brachistochrone between the end points of the design curves (Cycloid_Reference.py)
+- Every ball: rigid body on Ball_Center_RP_i, U3 = UR1 = UR2 = 0, U1 history every increment
+- One general contact over all surfaces; tracks are 20.0 deep, so lanes 50.0 apart never touch
+The Ball part (mesh, Set-1, section) is copied from a base deck written by Pre_Processing.py;
+its reference point is the last node of the part. Tracks are meshed as in Inp_Writer.py.
+The step runs for the full step time: a halting filter would stop all balls at the
+first arrival. With --plan the step ends after the latest predicted arrival of the
+designs plus a margin (Step_Planner.py).
+
+Splitting: the U1 history regions of the balls ('Node BALL-i.<label>') are read from
+the odb (abaqus python) and written as one report with a column per ball; the report is
+split into M time vs U1 histories and Arrival.arrival_time gives each drop time.
+Deck building and splitting need NumPy/SciPy only.
+
+Run command:
+python Track_Pack.py write Designs.txt --base Ball_Drop_Base.inp --output Ball_Pack.inp --plan
+abaqus job=Ball_Pack interactive
+abaqus python Track_Pack.py odb Ball_Pack.odb --output U1_Pack.rpt
+python Track_Pack.py split U1_Pack.rpt --pack Ball_Pack.json --output Drop_Times.csv
+"""
+import argparse
+import json
+import re
+
+import numpy as np
+
+from Inp_Writer import track_mesh, design_coord, Guide, Depth, _keyword_blocks, _format_nodes
+
+Spacing = 50.
+Ball_start = (-5.0, 5.0, 10.0)
+Step_time = 0.3
+Increment = 5e-05
+Num_intervals = 50
+Gravity = 9800.
+# Steel of Pre_Processing.py
+Density = 7.85e-09
+Young = 200000.0
+Poisson = 0.3
+
+
+def lane_z(i, spacing=Spacing):
+    """
+    z of lane i (0-based), lane 0 at z = 0 like Track in Pre_Processing.py
+    """
+    return 0. - spacing*i
+
+
+def ball_part(Deck):
+    """
+    Ball part block of a base deck and the label of its reference point (last node)
+    """
+    Match = re.search(r'^\*Part, name=Ball\s*$.*?^\*End Part\s*$', Deck, re.M | re.S | re.I)
+    if Match is None:
+        raise ValueError('Part Ball not found in the base deck')
+    Last = None
+    for Block in _keyword_blocks(Match.group(0)):
+        if Block[0].strip().lower() == '*node':
+            Data = [L for L in Block[1:] if L.strip()]
+            Last = Data[-1] if Data else Last
+    if Last is None:
+        raise ValueError('Part Ball has no nodes')
+    Fields = Last.split(',')
+    if np.abs(np.array(Fields[1:4], dtype=float)).max() > 1e-6:
+        raise ValueError('Last node of part Ball is not the reference point at the origin')
+    return Match.group(0).rstrip() + '\n', int(Fields[0])
+
+
+def track_part(name, Coord):
+    """
+    Rigid Track part block of Coord (guide + curve), reference point on the end cap
+    """
+    Nodes, Elements = track_mesh(Coord)
+    x_end, y_end = Coord[-1]
+    RP = len(Nodes) + 1
+    return ''.join((
+        '*Part, name=%s\n*Node\n' % name, _format_nodes(Nodes),
+        '*Element, type=R3D4\n',
+        ''.join('%d, %d, %d, %d, %d\n' % ((i + 1,) + tuple(e)) for i, e in enumerate(Elements)),
+        '*Node\n', _format_nodes([(x_end + 2.5, y_end - 10.1, Depth/2)], RP),
+        '*Nset, nset=RP\n %d,\n' % RP,
+        '*Elset, elset=Track, generate\n 1, %d, 1\n' % len(Elements),
+        '*Rigid Body, ref node=RP, elset=Track\n',
+        '*End Part\n')), RP
+
+
+def pack_deck(S, base, cycloid=False, spacing=Spacing, step_time=Step_time,
+              increment=Increment, intervals=Num_intervals, num=None):
+    """
+    Deck text of the designs S (M rows) in one model, base: text of a Pre_Processing.py deck
+    Returns (deck, lanes), lanes: one dict per ball (ball, track, s, z)
+    """
+    if spacing <= Depth:
+        raise ValueError('Lanes overlap: spacing %g <= track depth %g' % (spacing, Depth))
+    Ball, Ball_RP = ball_part(base)
+    Tracks = [('Track_%d' % (i + 1), design_coord(s, num), [float(si) for si in s])
+              for i, s in enumerate(S)]
+    if cycloid:
+        # Brachistochrone between the end points of the curves (Pre_Processing.py)
+        from Cycloid_Reference import reference_curve
+        from Drop_Time_Model import X_end, Y_end
+        Start, End = ((Tracks[0][1][len(Guide)], Tracks[0][1][-1]) if Tracks
+                      else ((0., 0.), (X_end, Y_end)))
+        Cycloid, _ = reference_curve(Start, End)
+        Tracks.append(('Track_Cycloid', np.concatenate((Guide, Cycloid), axis=0), None))
+    Parts, Assembly, Lanes = [Ball], ['*Assembly, name=Assembly\n'], []
+    Constraints, Boundary, History = [], [], []
+    for i, (Name, Coord, s) in enumerate(Tracks):
+        z = lane_z(i, spacing)
+        Block, RP = track_part(Name, Coord)
+        Parts.append(Block)
+        Ball_name = 'Ball-%d' % (i + 1)
+        Set = 'Ball_Center_RP_%d' % (i + 1)
+        Assembly.append('*Instance, name=%s-1, part=%s\n 0., 0., %r\n*End Instance\n' % (
+            Name, Name, z))
+        Assembly.append('*Instance, name=%s, part=Ball\n %r, %r, %r\n*End Instance\n' % (
+            Ball_name, Ball_start[0], Ball_start[1], Ball_start[2] + z))
+        Assembly.append('*Nset, nset=%s, instance=%s\n %d,\n' % (Set, Ball_name, Ball_RP))
+        Assembly.append('*Nset, nset=%s_RP, instance=%s-1\n %d,\n' % (Name, Name, RP))
+        Constraints.append('*Rigid Body, ref node=%s, elset=%s.Set-1\n' % (Set, Ball_name))
+        Boundary.append('%s, 3, 3\n%s, 4, 5\n%s_RP, ENCASTRE\n' % (Set, Set, Name))
+        History.append('*Node Output, nset=%s\nU1,\n' % Set)
+        Lanes.append(dict(ball=i + 1, track=Name, s=s, z=z))
+    Assembly.extend(Constraints)
+    Assembly.append('*End Assembly\n')
+    Model = [
+        '*Material, name=Steel\n*Density\n %r,\n*Elastic\n %r, %r\n' % (Density, Young, Poisson),
+        '*Surface Interaction, name=IntProp-1\n*Friction\n 0.,\n'
+        '*Surface Behavior, pressure-overclosure=HARD\n',
+        '*Boundary\n', ''.join(Boundary),
+        '*Contact\n*Contact Inclusions, ALL EXTERIOR\n'
+        '*Contact Property Assignment\n ,  , IntProp-1\n',
+        '*Step, name=Drop, nlgeom=YES\n',
+        '*Dynamic, Explicit, direct user control, improved dt method=YES\n %r, %r\n' % (
+            increment, step_time),
+        '*Bulk Viscosity\n 0.06, 1.2\n',
+        '*Dload\n , GRAV, %r, 0., -1., 0.\n' % Gravity,
+        '*Output, field, number interval=%d\n*Node Output\nU, UT\n' % intervals,
+        '*Output, history, frequency=1\n', ''.join(History),
+        '*End Step\n']
+    Heading = '*Heading\n** %d tracks packed by Track_Pack.py\n' % len(Tracks)
+    return Heading + ''.join(Parts) + ''.join(Assembly) + ''.join(Model), Lanes
+
+
+def write_pack(S, base='Ball_Drop_Base.inp', output='Ball_Pack.inp', cycloid=False, **kwargs):
+    """
+    Write the packed deck and the lane table next to it (output with .json)
+    """
+    with open(base, 'r') as file:
+        Deck, Lanes = pack_deck(S, file.read(), cycloid, **kwargs)
+    with open(output, 'w') as file:
+        file.write(Deck)
+    with open(re.sub(r'\.inp$', '', output) + '.json', 'w') as file:
+        json.dump(dict(deck=output, lanes=Lanes), file, indent=1)
+    return Lanes
+
+
+def ball_histories(odb, step='Drop', variable='U1'):
+    """
+    {ball i: (n, 2) time vs U1} from the history regions of an open odb (Odb object)
+    """
+    Histories = {}
+    for Name, Region in odb.steps[step].historyRegions.items():
+        Match = re.match(r'Node BALL-(\d+)\.', Name, re.I)
+        if Match and variable in Region.historyOutputs.keys():
+            Histories[int(Match.group(1))] = np.array(Region.historyOutputs[variable].data,
+                                                      dtype=float)
+    return Histories
+
+
+def write_pack_report(path, Histories):
+    """
+    Report with the layout of session.writeXYReport: X, U1 of ball 1, ..., ball K
+    """
+    Balls = sorted(Histories)
+    Time = Histories[Balls[0]][:, 0]
+    for i in Balls:
+        if len(Histories[i]) != len(Time) or np.abs(Histories[i][:, 0] - Time).max() > 1e-12:
+            raise ValueError('Ball %d has other output times than ball %d' % (i, Balls[0]))
+    Data = np.column_stack([Time] + [Histories[i][:, 1] for i in Balls])
+    with open(path, 'w') as file:
+        file.write('\n%14s' % 'X' + ''.join('%19s' % ('U1_Ball_%d' % i) for i in Balls) + '\n\n')
+        np.savetxt(file, Data, fmt='%18.9E')
+    return path
+
+
+def split_report(path):
+    """
+    One (n, 2) time vs U1 history per ball column of a packed report
+    """
+    from Report_Reader import read_report_blocks
+    Histories = []
+    for _, Data in read_report_blocks(path):
+        Histories.extend(Data[:, [0, j]] for j in range(1, Data.shape[1]))
+    return Histories
+
+
+def drop_times(Histories):
+    """
+    (K, 2) drop time and uncertainty of every ball (Arrival.arrival_time)
+    """
+    from Arrival import arrival_time
+    return np.array([arrival_time(History)[:2] for History in Histories])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Many tracks in one Explicit job')
+    Sub = parser.add_subparsers(dest='command')
+    Write = Sub.add_parser('write', help='packed deck of the designs of a file')
+    Write.add_argument('designs', help='text/npy file with one s-vector per row')
+    Write.add_argument('--base', default='Ball_Drop_Base.inp')
+    Write.add_argument('--output', default='Ball_Pack.inp')
+    Write.add_argument('--cycloid', action='store_true', help='add the cycloid lane')
+    Write.add_argument('--spacing', type=float, default=Spacing)
+    Write.add_argument('--step-time', type=float, default=Step_time)
+    Write.add_argument('--plan', action='store_true',
+                       help='step time from the latest predicted arrival (Step_Planner.py)')
+    Odb = Sub.add_parser('odb', help='per-ball U1 report of a packed odb (abaqus python)')
+    Odb.add_argument('odb')
+    Odb.add_argument('--output', default='U1_Pack.rpt')
+    Split = Sub.add_parser('split', help='drop time of every ball of a packed report')
+    Split.add_argument('report')
+    Split.add_argument('--pack', default='Ball_Pack.json', help='lane table of the deck')
+    Split.add_argument('--output', default=None, help='csv file')
+    args = parser.parse_args()
+
+    if args.command == 'write':
+        S = (np.load(args.designs) if args.designs.endswith('.npy')
+             else np.loadtxt(args.designs, ndmin=2))
+        Step = dict(step_time=args.step_time)
+        if args.plan:
+            from Step_Planner import plan_step
+            Plan = plan_step(S)
+            Step = dict((Key, Plan[Key]) for Key in ('step_time', 'increment', 'intervals'))
+        Lanes = write_pack(S, args.base, args.output, args.cycloid, spacing=args.spacing, **Step)
+        print('%d lanes -> %s' % (len(Lanes), args.output))
+    elif args.command == 'odb':
+        from odbAccess import openOdb
+        odb = openOdb(args.odb, readOnly=True)
+        write_pack_report(args.output, ball_histories(odb))
+        odb.close()
+    elif args.command == 'split':
+        with open(args.pack, 'r') as file:
+            Lanes = json.load(file)['lanes']
+        Times = drop_times(split_report(args.report))
+        if len(Times) != len(Lanes):
+            raise ValueError('%d histories for %d lanes' % (len(Times), len(Lanes)))
+        Lines = ['%d,%s,%s,%.8f,%.1e' % (Lane['ball'], Lane['track'],
+                                         ' '.join('%g' % si for si in Lane['s'] or []), t, e)
+                 for Lane, (t, e) in zip(Lanes, Times)]
+        if args.output:
+            with open(args.output, 'w') as file:
+                file.write('ball,track,s,drop_time,error\n' + '\n'.join(Lines) + '\n')
+        else:
+            print('\n'.join(Lines))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
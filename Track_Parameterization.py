@@ -0,0 +1,127 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script describes tracks of any number of segments, not only s1..s5
+
+A track of n segments has n+1 knots at uniform x from (0, 0) to (50*pi, -100.0).
+Two descriptions of the knots are supported, both giving a curve that only goes down:
+
+Ratios : s = [s1, ..., s_n-1] as in Pre_Processing.py, drop of segment i+1 = drop of segment i*si
+         si >= 0; si in [0, 1] also keeps every drop smaller than the previous one
+Drops  : w = [w1, ..., w_n] >= 0, drop of every segment before scaling to -100.0
+         No long products, better conditioned for hundreds of segments
+
+Knots are built with cumulative products/sums, O(n) per design and vectorized over designs
+(rows of an (N, n) array). They plug into
+- Drop_Time_Model.knot_drop_time / pchip_eval (fast evaluators)
+- Pre_Processing.py and Inp_Writer.py, which take s of any length through track_knots
+  and use sketch_num(X_coord) points for the sketch spline
+
+cycloid_drops(n) gives the n-segment design whose knots lie on the cycloid,
+to study the convergence of the drop time toward the cycloid time.
+
+Run command:
+python Track_Parameterization.py --segments 6 12 25 50 100 200 400
+"""
+import numpy as np
+
+from Drop_Time_Model import track_knots, knot_drop_time, X_end, Y_end, Radius_Cycl
+
+
+def drops_from_ratios(s):
+    """
+    Unscaled drops (..., n+1) of ratios s (..., n), same recurrence as Pre_Processing.py
+    """
+    s = np.asarray(s, dtype=float)
+    if (s < 0).any():
+        raise ValueError('Ratios must be non-negative for a descending track')
+    One = np.ones(s.shape[:-1] + (1,))
+    return 0.1*np.cumprod(np.concatenate((One, s), axis=-1), axis=-1)
+
+
+def ratios_from_drops(w):
+    """
+    Ratios s (..., n-1) of drops w (..., n); inverse of drops_from_ratios up to scaling
+    A drop after a zero drop cannot be written as a ratio
+    """
+    w = np.asarray(w, dtype=float)
+    if (w[..., 0] <= 0).any():
+        raise ValueError('The first drop must be positive')
+    Prev, Next = w[..., :-1], w[..., 1:]
+    if ((Prev == 0) & (Next > 0)).any():
+        raise ValueError('Drop after a zero drop has no ratio')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(Prev > 0, Next/Prev, 0.)
+
+
+def drop_knots(w, x_end=X_end, y_end=Y_end):
+    """
+    X_coord (n+1,) and Y_coord (..., n+1) of drops w (..., n), scaled to end at (x_end, y_end)
+    """
+    w = np.asarray(w, dtype=float)
+    if (w < 0).any():
+        raise ValueError('Drops must be non-negative for a descending track')
+    Total = np.sum(w, axis=-1, keepdims=True)
+    if (Total <= 0).any():
+        raise ValueError('Sum of drops must be positive')
+    X_coord = np.linspace(0., x_end, endpoint=True, num=w.shape[-1]+1)
+    Zero = np.zeros(w.shape[:-1] + (1,))
+    Y_coord = np.concatenate((Zero, np.cumsum(w, axis=-1)), axis=-1)/Total*y_end
+    return X_coord, Y_coord
+
+
+def ratio_knots(s):
+    """
+    Knots of ratios s (..., n), the same as Drop_Time_Model.track_knots for s >= 0
+    """
+    return drop_knots(drops_from_ratios(s))
+
+
+def cycloid_theta(x, radius=Radius_Cycl, iterations=50):
+    """
+    theta of the cycloid point at abscissa x: radius*(theta - sin(theta)) = x, theta in [0, pi]
+    Newton from the small-angle estimate, kept inside a bisection bracket
+    """
+    c = np.clip(np.asarray(x, dtype=float)/radius, 0., np.pi)
+    Lo, Hi = np.zeros_like(c), np.full_like(c, np.pi)
+    theta = np.minimum(np.cbrt(6*c), np.pi)
+    for _ in range(iterations):
+        f = theta - np.sin(theta) - c
+        Lo, Hi = np.where(f < 0, theta, Lo), np.where(f < 0, Hi, theta)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            theta = theta - f/(1 - np.cos(theta))
+        Out = ~((theta > Lo) & (theta < Hi))
+        theta = np.where(Out, 0.5*(Lo + Hi), theta)
+    return theta
+
+
+def cycloid_drops(n, radius=Radius_Cycl):
+    """
+    Drops (n,) of the n-segment track with its knots on the cycloid
+    """
+    x = np.linspace(0., X_end, endpoint=True, num=n+1)
+    y = -radius*(1 - np.cos(cycloid_theta(x, radius)))
+    return -np.diff(y)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from Drop_Time_Model import cycloid_drop_time
+    parser = argparse.ArgumentParser(description='Convergence of n-segment tracks to the cycloid')
+    parser.add_argument('--segments', type=int, nargs='+', default=[6, 12, 25, 50, 100, 200, 400])
+    parser.add_argument('--designs', type=int, default=1000, help='random designs for timing')
+    args = parser.parse_args()
+    T_cycl = cycloid_drop_time()
+    Rng = np.random.default_rng(0)
+    print('Segments   Drop time [s]   - cycloid [s]   Random designs [us/design]')
+    for n in args.segments:
+        Time = knot_drop_time(*drop_knots(cycloid_drops(n)))
+        # Time per design of random ratios (knots + drop time)
+        S = Rng.random((args.designs, n - 1))
+        Start = time.perf_counter()
+        knot_drop_time(*track_knots(S))
+        Elapsed = (time.perf_counter() - Start)/args.designs
+        print('%8d   %13.8f   %13.2e   %10.1f' % (n, Time, Time - T_cycl, Elapsed*1e6))
@@ -0,0 +1,346 @@
+"""
+Author: Youngbin LIM
+Contact: lyb0684@naver.com
+Linkedin: https://www.linkedin.com/in/lyb0684/
+
+This python script renders the ball drop offline, instead of session.writeImageAnimation
+
+Post_Processing.py exports Trajectory.npz from the odb (export_trajectories):
+time    : (F,) frame times of the field output
+centers : (F, 2, 2) x, y of the ball centers (Ball-1 on the track, Ball-2 on the cycloid)
+track_1, track_2 : (M, 2, 2) xy segments of the element edges of Track-1 and Track_Cycloid-1
+
+Rendering needs NumPy only (no Abaqus viewer, no GPU, no plotting package):
+1. Side view (x-y) with two panels, track above and cycloid below, drawn once as background
+2. Frames are rasterized in parallel worker processes into one preallocated shared
+   uint8 buffer (frames, height, width, 3): background copy, balls, time bar
+3. Encoding by file extension
+   .png : image strip, every --every-th frame tiled in rows of --columns
+   .avi : uncompressed RGB AVI, plays everywhere but large: width*height*3 bytes per frame,
+          ~0.9 MB per 640x480 frame, ~47 MB for the 51 frames of the default step
+   other (.mp4, .gif, ...) : frames piped to ffmpeg, if it is on the PATH
+
+Rendering is opt-in: Post_Processing.py only exports and renders when Animation is set,
+sweeps skip it. The default output is the image strip; use .mp4 (ffmpeg) for a small video.
+
+Run command:
+python Trajectory_Renderer.py Trajectory.npz --output Video/Run_1.png --workers 8
+"""
+import multiprocessing as mp
+import os
+import struct
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+Ball_radius = 5.0
+Width = 640
+Height = 480
+# World window of each panel [mm]
+X_range = (-15., 175.)
+Y_range = (-118., 25.)
+Background = (255, 255, 255)
+Track_color = (80, 80, 80)
+Ball_colors = ((200, 40, 40), (40, 90, 200))
+Bar_height = 6
+
+# Shared buffer and scene attached in each worker
+_Shared = {}
+
+
+def export_trajectories(odb, path='Trajectory.npz', step='Drop',
+                        sets=('BALL_CENTER_RP_1', 'BALL_CENTER_RP_2'),
+                        tracks=('TRACK-1', 'TRACK_CYCLOID-1')):
+    """
+    Ball-center trajectories and track edges of an open odb (Abaqus Odb object) to npz
+    """
+    Assembly = odb.rootAssembly
+    Frames = odb.steps[step].frames
+    Time = np.array([Frame.frameValue for Frame in Frames])
+    Centers = np.zeros((len(Frames), len(sets), 2))
+    for j, Name in enumerate(sets):
+        Region = Assembly.nodeSets[Name]
+        Start = np.array(Region.nodes[0][0].coordinates[:2], dtype=float)
+        for i, Frame in enumerate(Frames):
+            U = Frame.fieldOutputs['U'].getSubset(region=Region).values[0].data
+            Centers[i, j] = Start + np.array(U[:2], dtype=float)
+    Data = dict(time=Time, centers=Centers)
+    for j, Name in enumerate(tracks):
+        Instance = Assembly.instances[Name]
+        Coord = dict((Node.label, Node.coordinates) for Node in Instance.nodes)
+        Segments = []
+        for Element in Instance.elements:
+            Nodes = [Coord[Label] for Label in Element.connectivity]
+            for a, b in zip(Nodes, Nodes[1:] + Nodes[:1]):
+                # Edges along the profile; edges along the extrusion project to points
+                if abs(a[2] - b[2]) < 1e-6:
+                    Segments.append((a[:2], b[:2]))
+        Data['track_%d' % (j + 1)] = np.unique(np.array(Segments, dtype=float), axis=0)
+    np.savez(path, **Data)
+    return path
+
+
+class _View(object):
+    """
+    World (x, y) of panel k to pixel (column, row)
+    """
+    def __init__(self, width, height):
+        self.panel = (height - Bar_height)//2
+        self.scale = min(width/(X_range[1] - X_range[0]),
+                         self.panel/(Y_range[1] - Y_range[0]))
+        self.x0 = (width - self.scale*(X_range[1] - X_range[0]))/2
+
+    def __call__(self, P, k):
+        P = np.asarray(P, dtype=float)
+        Col = self.x0 + (P[..., 0] - X_range[0])*self.scale
+        Row = k*self.panel + (Y_range[1] - P[..., 1])*self.scale
+        return Col, Row
+
+
+def _draw_segments(Image, Col, Row, color, thickness=1):
+    """
+    Segments (M, 2) endpoints in pixels, drawn by sampling every half pixel
+    """
+    Length = np.hypot(np.diff(Col, axis=1), np.diff(Row, axis=1))[:, 0]
+    n = np.maximum(np.ceil(2*Length).astype(int), 1)
+    Seg = np.repeat(np.arange(len(n)), n + 1)
+    t = np.concatenate([np.linspace(0., 1., k + 1) for k in n])
+    c = Col[Seg, 0] + t*(Col[Seg, 1] - Col[Seg, 0])
+    r = Row[Seg, 0] + t*(Row[Seg, 1] - Row[Seg, 0])
+    H, W = Image.shape[:2]
+    for dr in range(-(thickness//2), thickness - thickness//2):
+        for dc in range(-(thickness//2), thickness - thickness//2):
+            ri, ci = np.round(r).astype(int) + dr, np.round(c).astype(int) + dc
+            Inside = (ri >= 0) & (ri < H) & (ci >= 0) & (ci < W)
+            Image[ri[Inside], ci[Inside]] = color
+
+
+def _draw_disk(Image, col, row, radius, color):
+    H, W = Image.shape[:2]
+    r0, r1 = max(int(row - radius) - 1, 0), min(int(row + radius) + 2, H)
+    c0, c1 = max(int(col - radius) - 1, 0), min(int(col + radius) + 2, W)
+    if r0 >= r1 or c0 >= c1:
+        return
+    rr, cc = np.ogrid[r0:r1, c0:c1]
+    D2 = (rr - row)**2 + (cc - col)**2
+    Block = Image[r0:r1, c0:c1]
+    Block[D2 <= radius**2] = color
+    # Outline
+    Block[(D2 <= radius**2) & (D2 > (radius - 1.2)**2)] = (0, 0, 0)
+
+
+def background(Data, width=Width, height=Height):
+    """
+    Static image of both tracks
+    """
+    Image = np.empty((height, width, 3), dtype=np.uint8)
+    Image[:] = Background
+    view = _View(width, height)
+    for k, Key in enumerate(('track_1', 'track_2')):
+        if Key in Data:
+            Col, Row = view(Data[Key], k)
+            _draw_segments(Image, Col, Row, Track_color, thickness=2)
+    # Panel separator
+    Image[view.panel, :] = (200, 200, 200)
+    return Image
+
+
+def draw_frame(Image, Data, i, width=Width, height=Height):
+    """
+    Balls of frame i and the time bar on a copy of the background
+    """
+    view = _View(width, height)
+    for k in range(Data['centers'].shape[1]):
+        Col, Row = view(Data['centers'][i, k], k)
+        _draw_disk(Image, Col, Row, Ball_radius*view.scale, Ball_colors[k % 2])
+    Time = Data['time']
+    Fraction = (Time[i] - Time[0])/max(Time[-1] - Time[0], 1e-30)
+    Image[-Bar_height:, :int(round(Fraction*width))] = (120, 120, 120)
+
+
+def _init_worker(name, shape, Data, Static):
+    shm = shared_memory.SharedMemory(name=name)
+    _Shared['shm'] = shm
+    _Shared['frames'] = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    _Shared['data'] = Data
+    _Shared['static'] = Static
+
+
+def _render_chunk(Bounds):
+    Frames, Data, Static = _Shared['frames'], _Shared['data'], _Shared['static']
+    H, W = Static.shape[:2]
+    for i in range(*Bounds):
+        Frames[i] = Static
+        draw_frame(Frames[i], Data, i, W, H)
+    return Bounds[1] - Bounds[0]
+
+
+def resample(Data, num_frames):
+    """
+    Trajectories at num_frames uniform times (linear interpolation)
+    """
+    Time = Data['time']
+    New = np.linspace(Time[0], Time[-1], num_frames)
+    Centers = np.empty((num_frames,) + Data['centers'].shape[1:])
+    for k in range(Centers.shape[1]):
+        for j in range(2):
+            Centers[:, k, j] = np.interp(New, Time, Data['centers'][:, k, j])
+    return dict(Data, time=New, centers=Centers)
+
+
+def render(Data, width=Width, height=Height, workers=None, chunk=4, consume=None):
+    """
+    All frames (F, height, width, 3) uint8, rendered by worker processes into shared memory
+    With consume, returns consume(Frames) on the shared buffer itself (no copy)
+    """
+    F = len(Data['time'])
+    Static = background(Data, width, height)
+    shape = (F, height, width, 3)
+    consume = consume or np.copy
+    workers = max(1, min(workers or os.cpu_count(), -(-F//chunk)))
+    if workers == 1:
+        Frames = np.empty(shape, dtype=np.uint8)
+        _Shared.update(frames=Frames, data=Data, static=Static)
+        _render_chunk((0, F))
+        _Shared.clear()
+        return consume(Frames)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+    try:
+        Methods = mp.get_all_start_methods()
+        Context = mp.get_context('fork' if 'fork' in Methods else 'spawn')
+        with Context.Pool(workers, initializer=_init_worker,
+                          initargs=(shm.name, shape, Data, Static)) as Pool:
+            for _ in Pool.imap_unordered(_render_chunk, [(i, min(i + chunk, F))
+                                                         for i in range(0, F, chunk)]):
+                pass
+        Frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        Result = consume(Frames)
+        del Frames
+    finally:
+        shm.close()
+        shm.unlink()
+    return Result
+
+
+def write_png(path, Image):
+    """
+    RGB uint8 image to PNG (zlib only)
+    """
+    H, W = Image.shape[:2]
+    Raw = np.concatenate((np.zeros((H, 1), dtype=np.uint8), Image.reshape(H, -1)), axis=1)
+
+    def chunk(Type, Body):
+        return (struct.pack('>I', len(Body)) + Type + Body
+                + struct.pack('>I', zlib.crc32(Type + Body) & 0xffffffff))
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', W, H, 8, 2, 0, 0, 0))
+                   + chunk(b'IDAT', zlib.compress(Raw.tobytes(), 6)) + chunk(b'IEND', b''))
+    return path
+
+
+def image_strip(Frames, every=5, columns=5):
+    """
+    Every every-th frame (and the last) tiled in rows of columns, 2 px gaps
+    """
+    Index = list(range(0, len(Frames), every))
+    if Index[-1] != len(Frames) - 1:
+        Index.append(len(Frames) - 1)
+    _, H, W, _ = Frames.shape
+    Rows = -(-len(Index)//columns)
+    Strip = np.full((Rows*(H + 2) - 2, min(columns, len(Index))*(W + 2) - 2, 3), 255, np.uint8)
+    for n, i in enumerate(Index):
+        r, c = divmod(n, columns)
+        Strip[r*(H + 2):r*(H + 2) + H, c*(W + 2):c*(W + 2) + W] = Frames[i]
+    return Strip
+
+
+def write_avi(path, Frames, fps=10):
+    """
+    Uncompressed 24-bit AVI (RIFF, BGR bottom-up rows padded to 4 bytes), written frame by frame
+    """
+    F, H, W, _ = Frames.shape
+    Stride = (3*W + 3)//4*4
+    Size = Stride*H
+    Header = struct.pack('<IIIIIIIIII16x', 1000000//fps, Size*fps, 0, 0x10, F, 0, 1, Size, W, H)
+    Stream = struct.pack('<4s4sIHHIIIIIIIIhhhh', b'vids', b'DIB ', 0, 0, 0, 0, 1, fps, 0, F,
+                         Size, 0xffffffff, 0, 0, 0, W, H)
+    Format = struct.pack('<IiiHHIIiiII', 40, W, H, 1, 24, 0, Size, 0, 0, 0, 0)
+
+    def chunk(Id, Body):
+        return Id + struct.pack('<I', len(Body)) + Body
+
+    def riff_list(Type, Body):
+        return b'LIST' + struct.pack('<I', len(Body) + 4) + Type + Body
+    Strl = riff_list(b'strl', chunk(b'strh', Stream) + chunk(b'strf', Format))
+    Hdrl = riff_list(b'hdrl', chunk(b'avih', Header) + Strl)
+    Index = chunk(b'idx1', b''.join(struct.pack('<4sIII', b'00db', 0x10, 4 + i*(Size + 8), Size)
+                                    for i in range(F)))
+    Movi_size = 4 + F*(Size + 8)
+    Row = np.zeros((H, Stride), dtype=np.uint8)
+    with open(path, 'wb') as file:
+        file.write(b'RIFF' + struct.pack('<I', 4 + len(Hdrl) + 8 + Movi_size + len(Index))
+                   + b'AVI ' + Hdrl + b'LIST' + struct.pack('<I', Movi_size) + b'movi')
+        for i in range(F):
+            Row[:, :3*W] = Frames[i, ::-1, :, ::-1].reshape(H, 3*W)
+            file.write(b'00db' + struct.pack('<I', Size))
+            file.write(Row.tobytes())
+        file.write(Index)
+    return path
+
+
+def write_ffmpeg(path, Frames, fps=10):
+    import shutil
+    import subprocess
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError('ffmpeg not found, use .avi or .png instead')
+    F, H, W, _ = Frames.shape
+    Command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+               '-s', '%dx%d' % (W, H), '-r', str(fps), '-i', '-', '-pix_fmt', 'yuv420p', path]
+    if path.lower().endswith('.gif'):
+        Command = Command[:-3] + [path]
+    subprocess.run(Command, input=Frames.tobytes(), check=True)
+    return path
+
+
+def render_file(Trajectory='Trajectory.npz', output='Ball_Drop.png', width=Width, height=Height,
+                workers=None, num_frames=None, fps=10, every=5, columns=5):
+    """
+    Render Trajectory.npz (or a dict of its arrays) to output; format from the extension
+    """
+    Data = dict(np.load(Trajectory)) if isinstance(Trajectory, str) else dict(Trajectory)
+    if num_frames:
+        Data = resample(Data, num_frames)
+    Dir = os.path.dirname(output)
+    if Dir and not os.path.isdir(Dir):
+        os.makedirs(Dir)
+    Extension = os.path.splitext(output)[1].lower()
+    if Extension == '.png':
+        encode = lambda Frames: write_png(output, image_strip(Frames, every, columns))
+    elif Extension == '.avi':
+        encode = lambda Frames: write_avi(output, Frames, fps)
+    else:
+        encode = lambda Frames: write_ffmpeg(output, Frames, fps)
+    # Even sizes for video codecs
+    return render(Data, width//2*2, height//2*2, workers, consume=encode)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description='Headless rendering of exported trajectories')
+    parser.add_argument('trajectory', nargs='?', default='Trajectory.npz')
+    parser.add_argument('--output', default='Ball_Drop.png',
+                        help='.png (strip), .avi (uncompressed) or ffmpeg')
+    parser.add_argument('--width', type=int, default=Width)
+    parser.add_argument('--height', type=int, default=Height)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--frames', type=int, default=None, help='resample to this many frames')
+    parser.add_argument('--fps', type=int, default=10)
+    parser.add_argument('--every', type=int, default=5, help='frame step of the image strip')
+    parser.add_argument('--columns', type=int, default=5, help='frames per row of the strip')
+    args = parser.parse_args()
+    Start = time.perf_counter()
+    render_file(args.trajectory, args.output, args.width, args.height, args.workers,
+                args.frames, args.fps, args.every, args.columns)
+    print('%s written in %.2f s' % (args.output, time.perf_counter() - Start))
@@ -0,0 +1,63 @@
+"""
+Tests of Arrival.py on synthetic time vs U1 histories (constant acceleration, then the end cap)
+
+Run command:
+python -m pytest -q test_arrival.py
+"""
+import numpy as np
+import pytest
+
+from Arrival import ArrivalMonitor, U1_contact, U1_end, arrival_time
+
+
+def _history(t_contact, dt, t_end=0.3, rest=U1_contact):
+    """
+    U1 = a*t^2/2 (U1_contact at t_contact), at rest once it reaches rest
+    """
+    a = 2*U1_contact/t_contact**2
+    Time = np.arange(0., t_end + 1e-12, dt)
+    return np.column_stack((Time, np.minimum(0.5*a*Time**2, rest)))
+
+
+@pytest.mark.parametrize('dt', [0.01, 0.006, 0.003, 0.001, 5e-4, 5e-5])
+def test_crossing_within_bound(dt):
+    for t_contact in np.linspace(0.2, 0.21, 23):
+        Time, Error, Method = arrival_time(_history(t_contact, dt))
+        assert Method == 'crossing'
+        assert Error <= dt*(1 + 1e-12)
+        assert abs(Time - t_contact) <= Error*(1 + 1e-9) + 1e-12
+
+
+def test_pair_across_contact():
+    # Coarse output: the sample after the crossing is already at rest on the end cap
+    History = _history(0.2051, 0.006)
+    Above = np.nonzero(History[:, 1] >= U1_end)[0][0]
+    assert History[Above, 1] >= U1_contact
+    Time, Error, _ = arrival_time(History)
+    assert Error == pytest.approx(0.006)
+    assert abs(Time - 0.2051) < 1e-3
+
+
+def test_plateau_short_of_the_end():
+    # Ball stops 2 mm before U1_end: arrival at the start of the plateau
+    Time, Error, Method = arrival_time(_history(0.2, 5e-4, rest=U1_end - 2.))
+    assert Method == 'plateau'
+    assert Time == pytest.approx(0.2*np.sqrt((U1_end - 2.)/U1_contact), abs=2*Error)
+
+
+def test_no_arrival():
+    History = _history(0.5, 1e-3)
+    Time, Error, Method = arrival_time(History)
+    assert Method == 'maximum' and Time == pytest.approx(History[-1, 0])
+
+
+def test_monitor_matches_batch():
+    History = _history(0.2083, 5e-4)
+    Expected = arrival_time(History)
+    monitor = ArrivalMonitor()
+    for Chunk in np.array_split(History, 37):
+        if monitor.update(Chunk[:, 0], Chunk[:, 1]):
+            break
+    assert monitor.finished
+    assert (monitor.time, monitor.error) == pytest.approx(Expected[:2])
+    assert monitor.method == Expected[2]
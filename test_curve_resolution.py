@@ -0,0 +1,64 @@
+"""
+Tests of Curve_Resolution.py: the sketch spline through the adaptive points is within tol
+
+Run command:
+python -m pytest -q test_curve_resolution.py
+"""
+import numpy as np
+import pytest
+from scipy import interpolate
+
+from Curve_Resolution import (_cycloid_spline, adaptive_theta, cycloid_point, cycloid_resolution,
+                              track_resolution)
+from Cycloid_Reference import cycloid_params
+from Drop_Time_Model import X_end, Y_end, pchip_eval, pchip_slopes, track_knots
+
+Designs = [[0.2, 0.326, 0.579, 0.8, 0.674], [0.5, 0.5, 0.5, 0.5, 0.5],
+           [0.05, 0.9, 0.1, 0.95, 0.3], [0.9, 0.1, 0.6, 0.2, 0.99]]
+
+
+def _max_deviation(t, exact, fit, num=200):
+    # Much finer than the check points of the refinement
+    u = np.linspace(0., 1., num + 1)
+    Fine = np.concatenate([t[:-1, None] + np.diff(t)[:, None]*u[:-1], t[-1:, None]], axis=None)
+    return np.max(np.linalg.norm(np.reshape(fit(Fine) - exact(Fine), (len(Fine), -1)), axis=1))
+
+
+@pytest.mark.parametrize('s', Designs)
+def test_track_tolerance(s):
+    X_coord, Y_coord = track_knots(s)
+    exact = lambda x: pchip_eval(X_coord, Y_coord, pchip_slopes(X_coord, Y_coord), x)[0]
+    Num, Errors = [], []
+    for tol in (0.1, 0.01, 0.001):
+        X_interp, Y_interp, Error = track_resolution(s, tol)
+        assert _max_deviation(X_interp, exact, interpolate.CubicSpline(X_interp, Y_interp)) <= tol
+        # Knots kept, ends at (0, 0) and (50*pi, -100)
+        assert np.all(np.isin(X_coord, X_interp)) and np.all(np.diff(X_interp) > 0)
+        assert X_interp[0] == 0. and X_interp[-1] == pytest.approx(X_end, rel=1e-12)
+        assert Y_interp[0] == pytest.approx(0.) and Y_interp[-1] == pytest.approx(Y_end)
+        Num.append(len(X_interp))
+        Errors.append(abs(Error))
+    assert Num[0] <= Num[1] <= Num[2]
+    assert Errors[-1] < 1e-5 and Errors[-1] <= Errors[0]
+
+
+def test_cycloid_tolerance():
+    Num, Errors = [], []
+    for tol in (0.1, 0.01, 0.001):
+        theta, Error = cycloid_resolution(tol)
+        assert _max_deviation(theta, cycloid_point, _cycloid_spline(theta)) <= tol
+        assert theta[0] == 0. and theta[-1] == np.pi
+        np.testing.assert_allclose(cycloid_point(theta[-1]), [X_end, Y_end], atol=1e-9)
+        Num.append(len(theta))
+        Errors.append(abs(Error))
+    assert Num[0] <= Num[1] <= Num[2]
+    assert Errors[-1] < 1e-5 and Errors[-1] <= Errors[0]
+
+
+@pytest.mark.parametrize('end', [(300., -60.), (100., -100.), (50., -120.)])
+def test_cycloid_other_ends(end):
+    Radius, theta_end, _ = cycloid_params((0., 0.), end)
+    theta = adaptive_theta(0.01, Radius, theta_end)
+    exact = lambda t: cycloid_point(t, Radius)
+    assert _max_deviation(theta, exact, _cycloid_spline(theta, Radius)) <= 0.01
+    np.testing.assert_allclose(exact(theta[-1]), end, atol=1e-6)
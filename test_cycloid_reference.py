@@ -0,0 +1,81 @@
+"""
+Tests of Cycloid_Reference.py: brachistochrone parameters, special cases and the memo
+
+Run command:
+python -m pytest -q test_cycloid_reference.py
+"""
+import numpy as np
+import pytest
+
+import Cycloid_Reference
+from Cycloid_Reference import _cycloid_terms, clear_memo, cycloid_params, optimality_gap, \
+    reference_curve
+from Drop_Time_Model import Gravity, X_end, Y_end, cycloid_drop_time
+
+
+@pytest.fixture(autouse=True)
+def memo():
+    clear_memo()
+    yield
+    clear_memo()
+
+
+def _ends(n, seed=0):
+    Rng = np.random.default_rng(seed)
+    return np.column_stack((Rng.uniform(1., 400., n), -Rng.uniform(1., 200., n)))
+
+
+def test_model_cycloid():
+    R, theta, Time = cycloid_params((0., 0.), (X_end, Y_end))
+    assert R == pytest.approx(50., rel=1e-12)
+    assert theta == pytest.approx(np.pi, rel=1e-12)
+    assert Time == pytest.approx(cycloid_drop_time(), rel=1e-12)
+    assert optimality_gap(cycloid_drop_time()) == pytest.approx(0., abs=1e-12)
+
+
+def test_end_points_met():
+    End = _ends(1000)
+    R, theta, Time = cycloid_params((0., 0.), End)
+    A, B = _cycloid_terms(theta)
+    np.testing.assert_allclose(np.column_stack((R*A, -R*B)), End, rtol=1e-10)
+    np.testing.assert_allclose(Time, theta*np.sqrt(R/Gravity))
+    Curve, _ = reference_curve((0., 0.), End[:3], num=7)
+    assert Curve.shape == (3, 7, 2)
+    np.testing.assert_allclose(Curve[:, -1], End[:3], rtol=1e-10)
+    np.testing.assert_allclose(Curve[:, 0], 0., atol=1e-12)
+
+
+def test_special_cases():
+    R, theta, Time = cycloid_params((0., 0.), [(0., -100.), (100., 0.), (-X_end, Y_end),
+                                               (100., 10.)])
+    # Free fall, full arch, mirrored cycloid, unreachable from rest
+    assert Time[0] == pytest.approx(np.sqrt(200./Gravity))
+    assert theta[1] == pytest.approx(2*np.pi) and R[1] == pytest.approx(100./(2*np.pi))
+    assert Time[2] == pytest.approx(cycloid_drop_time(), rel=1e-12)
+    assert np.isnan(Time[3])
+    Curve, _ = reference_curve((0., 0.), (-X_end, Y_end))
+    assert Curve[-1, 0] == pytest.approx(-X_end)
+
+
+def test_memo_overflow(monkeypatch):
+    monkeypatch.setattr(Cycloid_Reference, 'Max_memo', 10)
+    Old, New = _ends(8, seed=1), _ends(8, seed=2)
+    Expected = cycloid_params((0., 0.), np.concatenate((Old, New)))[2]
+    clear_memo()
+    cycloid_params((0., 0.), Old)
+    # Memoized and new endpoints overflow the memo: the whole batch is solved again
+    Mixed = np.concatenate((Old, New))
+    np.testing.assert_allclose(cycloid_params((0., 0.), Mixed)[2], Expected, rtol=1e-14)
+    assert len(Cycloid_Reference._Memo['keys']) == 16
+    # Lookups after the overflow
+    np.testing.assert_allclose(cycloid_params((0., 0.), New[::-1])[2], Expected[8:][::-1],
+                               rtol=1e-14)
+
+
+def test_memo_lookup():
+    End = _ends(50)
+    First = cycloid_params((0., 0.), End)
+    Keys = len(Cycloid_Reference._Memo['keys'])
+    Again = cycloid_params((0., 0.), np.concatenate((End[::2], End)))
+    assert len(Cycloid_Reference._Memo['keys']) == Keys
+    np.testing.assert_allclose(Again[2][25:], First[2], rtol=1e-14)
@@ -0,0 +1,95 @@
+"""
+Tests of Drop_Time_Model.py (batched drop time and gradient) and Track_Parameterization.py
+
+Run command:
+python -m pytest -q test_drop_time_model.py
+"""
+import numpy as np
+import pytest
+from scipy.integrate import quad
+from scipy.interpolate import PchipInterpolator
+
+from Drop_Time_Model import Gravity, drop_time, drop_time_batch, drop_time_grad, \
+    drop_time_grad_batch, knot_drop_time, track_curve, track_knots
+from Track_Parameterization import drop_knots, drops_from_ratios, ratio_knots, ratios_from_drops
+
+
+def _designs(n=20, seed=0):
+    # Away from s = 0 where PCHIP is not differentiable
+    return 0.05 + 0.95*np.random.default_rng(seed).random((n, 5))
+
+
+def _quad_drop_time(s):
+    """
+    Reference drop time: scipy PCHIP integrated with adaptive quadrature per segment
+    """
+    X_coord, Y_coord = track_knots(s)
+    Spline = PchipInterpolator(X_coord, Y_coord)
+    Slope = Spline.derivative()
+
+    def f(x):
+        return np.sqrt((1 + Slope(x)**2)/(-2*Gravity*Spline(x)))
+    # First segment with x = h*u^2 to remove the 1/sqrt(x) singularity
+    h = X_coord[1]
+    Time = quad(lambda u: 2*h*u*f(h*u**2), 0., 1., epsabs=0., epsrel=1e-12)[0]
+    for a, b in zip(X_coord[1:-1], X_coord[2:]):
+        Time += quad(f, a, b, epsabs=0., epsrel=1e-12)[0]
+    return Time
+
+
+def test_drop_time_against_quad():
+    S = _designs(8)
+    Times = drop_time(S)
+    assert Times.shape == (8,)
+    for s, Time in zip(S, Times):
+        assert Time == pytest.approx(_quad_drop_time(s), rel=1e-8)
+    # Row by row and chunked evaluation agree with the batch
+    np.testing.assert_allclose([drop_time(s) for s in S], Times, rtol=1e-14)
+    np.testing.assert_allclose(drop_time_batch(S, chunk=3), Times, rtol=1e-14)
+
+
+def test_track_curve_against_scipy():
+    s = _designs(1)[0]
+    X_coord, Y_coord = track_knots(s)
+    Curve = track_curve(s)
+    np.testing.assert_allclose(Curve[:, 1], PchipInterpolator(X_coord, Y_coord)(Curve[:, 0]),
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_gradient_against_central_differences():
+    S = _designs(20, seed=1)
+    Times, Grad = drop_time_grad(S)
+    assert Grad.shape == S.shape
+    np.testing.assert_allclose(Times, drop_time(S), rtol=1e-14)
+    Step = 1e-6
+    for i, e in enumerate(np.eye(5)):
+        FD = (drop_time(S + Step*e) - drop_time(S - Step*e))/(2*Step)
+        np.testing.assert_allclose(Grad[:, i], FD, rtol=1e-5, atol=1e-9)
+    Out = drop_time_grad_batch(S, chunk=7)
+    np.testing.assert_allclose(Out[0], Times, rtol=1e-14)
+    np.testing.assert_allclose(Out[1], Grad, rtol=1e-12)
+
+
+def test_n_knot_parameterization_matches_ratios():
+    S = _designs(10, seed=2)
+    X_coord, Y_coord = track_knots(S)
+    X_ratio, Y_ratio = ratio_knots(S)
+    np.testing.assert_allclose(X_ratio, X_coord, rtol=1e-14)
+    np.testing.assert_allclose(Y_ratio, Y_coord, rtol=1e-12)
+    # Drops and ratios describe the same tracks
+    w = drops_from_ratios(S)
+    np.testing.assert_allclose(ratios_from_drops(w), S, rtol=1e-12)
+    np.testing.assert_allclose(knot_drop_time(*drop_knots(w)), drop_time(S), rtol=1e-12)
+    # Drops are scale free
+    np.testing.assert_allclose(drop_knots(7.*w)[1], Y_coord, rtol=1e-12)
+
+
+def test_parameterization_errors():
+    with pytest.raises(ValueError):
+        drops_from_ratios([0.5, -0.1, 0.5])
+    with pytest.raises(ValueError):
+        ratios_from_drops([0., 1., 1.])
+    with pytest.raises(ValueError):
+        ratios_from_drops([1., 0., 1.])
+    with pytest.raises(ValueError):
+        drop_knots([0., 0., 0.])
@@ -0,0 +1,176 @@
+"""
+Tests of Inp_Writer.py: track mesh and deck regeneration from a synthetic base deck
+
+Run command:
+python -m pytest -q test_inp_writer.py
+"""
+import json
+import re
+
+import numpy as np
+import pytest
+
+from Drop_Time_Model import X_end, Y_end, sketch_num, track_knots
+from Inp_Writer import Cap_width, Depth, Guide, Offset, Seed, design_coord, set_step, \
+    track_mesh, track_profile, write_deck
+from Result_Cache import Settings, Settings_file
+
+s = [0.2, 0.326, 0.579, 0.8, 0.674]
+
+Ball = '''*Part, name=Ball
+*Node
+      1,   5.,   0.,   0.
+      2,   0.,   5.,   0.
+      3,  -5.,   0.,   0.
+      4,   0.,   0.,   5.
+      5,   0.,   0.,   0.
+*Element, type=R3D3
+1, 1, 2, 4
+2, 2, 3, 4
+*Elset, elset=Set-1, generate
+ 1, 2, 1
+*End Part
+'''
+
+# Base deck in the layout of CAE: Track part with its reference point after the mesh
+Base = '''*Heading
+** Job name: Ball_Drop Model name: Model-1
+*Part, name=Track
+*Node
+      1,   0.,   20.,   0.
+      2,   0.,   20.,  20.
+      3,   0.,   15.,  20.
+      4,   0.,   15.,   0.
+      5,   0.,   10.,   0.
+      6,   0.,   10.,  20.
+*Element, type=R3D4
+1, 1, 2, 3, 4
+2, 4, 3, 6, 5
+*Node
+      7,  162.,  -110.,  10.
+*Nset, nset=RP
+ 7,
+*Nset, nset=Track_Nodes, generate
+ 1, 6, 1
+*Elset, elset=Track, generate
+ 1, 2, 1
+*Rigid Body, ref node=RP, elset=Track
+*End Part
+''' + Ball + '''*Assembly, name=Assembly
+*Instance, name=Track-1, part=Track
+*End Instance
+*Instance, name=Ball-1, part=Ball
+ -5., 5., 10.
+*End Instance
+*Nset, nset=Track_RP, instance=Track-1
+ 7,
+*Nset, nset=Ball_Center_RP, instance=Ball-1
+ 5,
+*End Assembly
+*Step, name=Drop, nlgeom=YES
+*Dynamic, Explicit, direct user control, improved dt method=YES
+5e-05, 0.3
+*Output, field, number interval=50
+*Node Output
+U, UT
+*End Step
+'''
+
+
+def _part(Deck, name):
+    return re.search(r'^\*Part, name=%s\n.*?^\*End Part\n' % name, Deck, re.M | re.S).group(0)
+
+
+def _nodes(Part):
+    """
+    Labels and coordinates of the first *Node block of a part
+    """
+    Block = Part.split('*Node\n')[1].split('*')[0]
+    Rows = np.array([Line.split(',') for Line in Block.splitlines() if Line.strip()], dtype=float)
+    return Rows[:, 0].astype(int), Rows[:, 1:]
+
+
+def test_design_coord():
+    Coord = design_coord(s)
+    np.testing.assert_allclose(Coord[:len(Guide)], Guide)
+    Curve = Coord[len(Guide):]
+    assert len(Curve) == sketch_num(track_knots(s)[0]) == 50
+    np.testing.assert_allclose(Curve[0], [0., 0.], atol=1e-12)
+    np.testing.assert_allclose(Curve[-1], [X_end, Y_end], rtol=1e-12)
+    assert np.all(np.diff(Curve[:, 1]) <= 0)
+    assert len(design_coord(s, 80)) == len(Guide) + 80
+
+
+def test_track_mesh():
+    Coord = design_coord(s)
+    Profiles = track_profile(Coord)
+    Nodes, Elements = track_mesh(Coord)
+    n_z = int(np.ceil(Depth/Seed)) + 1
+    assert len(Nodes) == sum(len(Profile) for Profile in Profiles)*n_z
+    assert len(Elements) == sum(len(Profile) - 1 for Profile in Profiles)*(n_z - 1)
+    assert Elements.min() == 1 and Elements.max() == len(Nodes)
+    assert sorted(set(np.round(Nodes[:, 2], 9))) == list(np.linspace(0., Depth, n_z))
+    # Element edges no longer than the seed, no degenerate elements
+    Corners = Nodes[Elements - 1]
+    Edges = np.linalg.norm(np.roll(Corners, -1, axis=1) - Corners, axis=2)
+    assert Edges.max() <= Seed + 1e-9 and Edges.min() > 0.
+    # Spline ends at (50*pi, -100) with the end cap below it, offset curve at Offset
+    Offset_curve, Chain = Profiles
+    np.testing.assert_allclose(Chain[-1], Guide[0], atol=1e-9)
+    np.testing.assert_allclose(Chain[0], [X_end, Y_end - Offset], atol=1e-9)
+    for Corner in ([X_end + Cap_width, Y_end - Offset], [X_end + Cap_width, Y_end],
+                   [X_end, Y_end]):
+        assert np.min(np.linalg.norm(Chain - Corner, axis=1)) < 1e-9
+    assert np.linalg.norm(Offset_curve[0] - Guide[0]) == pytest.approx(Offset)
+    assert np.linalg.norm(Offset_curve[-1] - [X_end, Y_end]) == pytest.approx(Offset)
+
+
+def test_write_deck(tmp_path):
+    (tmp_path / 'Base.inp').write_text(Base)
+    write_deck(s, str(tmp_path / 'Base.inp'), str(tmp_path / 'Ball_Drop.inp'))
+    Deck = (tmp_path / 'Ball_Drop.inp').read_text()
+    # Ball part and everything outside the Track part untouched
+    assert _part(Deck, 'Ball') == Ball
+    assert Deck.startswith(Base.split('*Part, name=Track')[0])
+    assert Deck.endswith(Base.split('*End Part\n')[-1].replace(' 7,\n*Nset, nset=Ball', ' %d,\n'
+                         '*Nset, nset=Ball' % (len(track_mesh(design_coord(s))[0]) + 1)))
+    Nodes, Elements = track_mesh(design_coord(s))
+    Track = _part(Deck, 'Track')
+    Labels, Coord = _nodes(Track)
+    assert list(Labels) == list(range(1, len(Nodes) + 1))
+    np.testing.assert_allclose(Coord, Nodes, rtol=1e-6, atol=1e-5)
+    Rows = re.search(r'\*Element, type=R3D4\n(.*?)\*', Track, re.S).group(1).split('\n')
+    assert len([Row for Row in Rows if Row.strip()]) == len(Elements)
+    # Reference point after the new mesh, in the part and in the assembly
+    RP = len(Nodes) + 1
+    assert '*Node\n%7d,  162.,  -110.,  10.\n' % RP in Track
+    assert '*Nset, nset=RP\n %d,\n' % RP in Track
+    assert '*Nset, nset=Track_RP, instance=Track-1\n %d,\n' % RP in Deck
+    assert '*Nset, nset=Ball_Center_RP, instance=Ball-1\n 5,\n' in Deck
+    # Ranges over the whole mesh follow it
+    assert '*Nset, nset=Track_Nodes, generate\n 1, %d, 1\n' % len(Nodes) in Track
+    assert '*Elset, elset=Track, generate\n 1, %d, 1\n' % len(Elements) in Track
+    assert '5e-05, 0.3\n' in Deck and 'number interval=50\n' in Deck
+    assert json.loads((tmp_path / Settings_file).read_text()) == Settings
+
+
+def test_write_deck_planned(tmp_path):
+    from Step_Planner import plan_step
+    (tmp_path / 'Base.inp').write_text(Base)
+    write_deck(s, str(tmp_path / 'Base.inp'), str(tmp_path / 'Ball_Drop.inp'), plan=True)
+    Deck = (tmp_path / 'Ball_Drop.inp').read_text()
+    Plan = plan_step(s)
+    assert '\n%r, %r\n' % (Plan['increment'], Plan['step_time']) in Deck
+    assert 'number interval=%d\n' % Plan['intervals'] in Deck
+    assert _part(Deck, 'Ball') == Ball
+    Settings_run = json.loads((tmp_path / Settings_file).read_text())
+    assert Settings_run['time_period'] == pytest.approx(Plan['step_time'])
+
+
+def test_base_deck_errors(tmp_path):
+    (tmp_path / 'Base.inp').write_text(Base.replace('name=Track\n', 'name=Rail\n'))
+    with pytest.raises(ValueError):
+        write_deck(s, str(tmp_path / 'Base.inp'), str(tmp_path / 'Ball_Drop.inp'))
+    with pytest.raises(ValueError):
+        set_step(Base.replace('*End Step\n', '*End Step\n' + Base.split('*End Assembly\n')[1]),
+                 0.25, 5e-05, 40)
@@ -0,0 +1,126 @@
+"""
+Tests of Job_Queue.py with a stub solver command in place of Abaqus
+
+Run command:
+python -m pytest -q test_job_queue.py
+"""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from Job_Queue import JobQueue
+
+# Stub solver: logs its start/end time, fails while {workdir}/fail_count > 0,
+# sleeps and leaves Drop_Time.txt = sum(s)
+Stub = '''
+import os, sys, time
+Log, Sleep = sys.argv[1], float(sys.argv[2])
+s = [float(si) for si in sys.argv[3:]]
+with open(Log, 'a') as file:
+    file.write('start %d %.6f\\n' % (os.getpid(), time.time()))
+time.sleep(Sleep)
+with open(Log, 'a') as file:
+    file.write('end %d %.6f\\n' % (os.getpid(), time.time()))
+if os.path.exists('fail_count'):
+    n = int(open('fail_count').read())
+    if n > 0:
+        open('fail_count', 'w').write(str(n - 1))
+        sys.exit(3)
+open('Drop_Time.txt', 'w').write(repr(sum(s)))
+'''
+
+
+@pytest.fixture
+def stub(tmp_path):
+    Path = tmp_path / 'stub_solver.py'
+    Path.write_text(Stub)
+    Log = tmp_path / 'solver.log'
+
+    def command(sleep=0.05, n=5):
+        Args = ' '.join('{s%d}' % (i + 1) for i in range(n))
+        return '"%s" "%s" "%s" %g %s' % (sys.executable, Path, Log, sleep, Args)
+    command.log = Log
+    return command
+
+
+def _queue(tmp_path, designs):
+    queue = JobQueue(str(tmp_path / 'Job_Queue.db'), str(tmp_path / 'Jobs'))
+    return queue, [queue.submit(s) for s in designs]
+
+
+def _max_overlap(Log):
+    Events = []
+    with open(str(Log)) as file:
+        for Line in file:
+            Kind, _, Time = Line.split()
+            Events.append((float(Time), 1 if Kind == 'start' else -1))
+    Events.sort(key=lambda e: (e[0], e[1]))
+    return max(np.cumsum([e[1] for e in Events]))
+
+
+def test_runs_all_designs(tmp_path, stub):
+    Designs = np.random.default_rng(0).random((6, 5))
+    queue, Ids = _queue(tmp_path, Designs)
+    assert queue.run(max_jobs=3, cpus=3, commands=[stub()], poll=0.01) == {'done': 6}
+    Results = queue.results()
+    assert [r[0] for r in Results] == Ids
+    for (_, s, drop_time), Design in zip(Results, Designs):
+        np.testing.assert_allclose(s, Design)
+        assert drop_time == pytest.approx(sum(Design))
+
+
+def test_cpu_budget_limits_concurrency(tmp_path, stub):
+    queue, _ = _queue(tmp_path, [[0.1]*5]*6)
+    # 4 cpus, 2 per job: at most 2 jobs at once although max_jobs is 8
+    assert queue.run(max_jobs=8, cpus=4, cpus_per_job=2, commands=[stub(0.3)], poll=0.01) == \
+        {'done': 6}
+    assert _max_overlap(stub.log) == 2
+
+
+def test_retries(tmp_path, stub):
+    queue, (Retried, Failed) = _queue(tmp_path, [[0.1]*5, [0.2]*5])
+    for job_id, n in ((Retried, 1), (Failed, 5)):
+        os.makedirs(queue.workdir(job_id))
+        with open(os.path.join(queue.workdir(job_id), 'fail_count'), 'w') as file:
+            file.write(str(n))
+    assert queue.run(max_jobs=2, cpus=2, retries=2, commands=[stub()], poll=0.01) == \
+        {'done': 1, 'failed': 1}
+    Attempts = dict(queue.db.execute('SELECT id, attempts FROM jobs'))
+    assert Attempts == {Retried: 2, Failed: 3}
+    assert queue.db.execute('SELECT returncode FROM jobs WHERE id=?', (Failed,)).fetchone() == (3,)
+
+
+def test_any_number_of_parameters(tmp_path, stub):
+    queue, _ = _queue(tmp_path, [[0.5]*8])
+    assert queue.run(commands=[stub(0., 8)], poll=0.01) == {'done': 1}
+    assert queue.results()[0][2] == pytest.approx(4.)
+    Output = tmp_path / 'Drop_Times.csv'
+    subprocess.check_call([sys.executable, 'Job_Queue.py', 'collect', '--output', str(Output),
+                           '--db', str(tmp_path / 'Job_Queue.db'),
+                           '--jobs-dir', str(tmp_path / 'Jobs')],
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    with open(str(Output)) as file:
+        Header = file.readline().strip()
+    assert Header == 'id,s1,s2,s3,s4,s5,s6,s7,s8,drop_time'
+
+
+def test_inp_without_base(tmp_path, stub):
+    queue, _ = _queue(tmp_path, [[0.1]*5])
+    with pytest.raises(ValueError):
+        queue.run(commands=['abaqus job={job} input={inp}'])
+    assert queue.counts() == {'queued': 1}
+
+
+def test_launch_error_fails_the_job(tmp_path, stub):
+    queue, Ids = _queue(tmp_path, [[0.1]*5, [0.2]*5])
+    # Missing base deck: writing Ball_Drop_i.inp raises inside the scheduler loop
+    Counts = queue.run(max_jobs=2, cpus=2, commands=[stub()], base=str(tmp_path / 'Missing.inp'),
+                       poll=0.01)
+    assert Counts == {'failed': 2}
+    for job_id in Ids:
+        with open(os.path.join(queue.workdir(job_id), 'Job.log')) as file:
+            assert 'Traceback' in file.read()
+    assert not os.path.exists(str(stub.log))
@@ -0,0 +1,93 @@
+"""
+Tests of Report_Reader.py on synthetic XY reports in the layout of session.writeXYReport
+
+Run command:
+python -m pytest -q test_report_reader.py
+"""
+import numpy as np
+import pytest
+
+from Report_Reader import read_report, read_report_blocks, read_report_dir
+
+
+def _report(path, blocks, newline='\n'):
+    """
+    Write blocks of (names, data) the way writeXYReport does
+    """
+    Lines = []
+    for Names, Data in blocks:
+        Lines += ['', ''.join('%18s' % Name for Name in Names), ' '*60]
+        Lines += [''.join('%18s' % ('%.6E' % v) for v in Row) for Row in np.atleast_2d(Data)]
+    with open(str(path), 'w', newline='') as file:
+        file.write(newline.join(Lines) + newline)
+
+
+def _history(n=201):
+    Time = np.linspace(0., 0.3, n)
+    return np.column_stack((Time, 0.5*9800.*Time**2))
+
+
+def test_single_column(tmp_path):
+    Data = np.linspace(-1., 1., 11)[:, None]
+    _report(tmp_path / 'One.rpt', [(['U1'], Data)])
+    Names, Read = read_report(tmp_path / 'One.rpt')
+    assert Names == ['U1']
+    assert Read.shape == (11, 1)
+    np.testing.assert_allclose(Read, Data, rtol=1e-6)
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_two_columns(tmp_path, newline):
+    Data = _history()
+    _report(tmp_path / 'U1.rpt', [(['X', 'U1_History'], Data)], newline)
+    Names, Read = read_report(tmp_path / 'U1.rpt')
+    assert Names == ['X', 'U1_History']
+    np.testing.assert_allclose(Read, Data, rtol=1e-6, atol=1e-12)
+
+
+def test_abaqus_number_format(tmp_path):
+    with open(str(tmp_path / 'U1.rpt'), 'w') as file:
+        file.write('\n            X           U1\n\n'
+                   '            0.            0.\n'
+                   '       50.E-06      1.2E-06\n'
+                   '      100.E-06     -4.8E-06\n')
+    Names, Read = read_report(tmp_path / 'U1.rpt')
+    np.testing.assert_allclose(Read, [[0., 0.], [50e-6, 1.2e-6], [100e-6, -4.8e-6]])
+
+
+def test_multi_column(tmp_path):
+    Data = np.column_stack((_history(), -_history()[:, 1], np.ones(201)))
+    _report(tmp_path / 'Multi.rpt', [(['X', 'U1_1', 'U1_2', 'U2'], Data)])
+    Names, Read = read_report(tmp_path / 'Multi.rpt')
+    assert Names == ['X', 'U1_1', 'U1_2', 'U2']
+    np.testing.assert_allclose(Read, Data, rtol=1e-6, atol=1e-12)
+
+
+def test_multi_block(tmp_path):
+    First, Second = _history(101), np.column_stack((_history(51), np.zeros(51)))
+    _report(tmp_path / 'Blocks.rpt', [(['X', 'U1'], First), (['X', 'U2', 'U3'], Second)])
+    Blocks = read_report_blocks(tmp_path / 'Blocks.rpt')
+    assert [Names for Names, _ in Blocks] == [['X', 'U1'], ['X', 'U2', 'U3']]
+    np.testing.assert_allclose(Blocks[0][1], First, rtol=1e-6, atol=1e-12)
+    np.testing.assert_allclose(Blocks[1][1], Second, rtol=1e-6, atol=1e-12)
+    # read_report returns the first block
+    np.testing.assert_allclose(read_report(tmp_path / 'Blocks.rpt')[1], First, rtol=1e-6)
+
+
+def test_empty_and_ragged(tmp_path):
+    (tmp_path / 'Empty.rpt').write_bytes(b'')
+    assert read_report_blocks(tmp_path / 'Empty.rpt') == []
+    with pytest.raises(ValueError):
+        read_report(tmp_path / 'Empty.rpt')
+    (tmp_path / 'Ragged.rpt').write_bytes(b'\n  X  U1\n\n  0.  1.\n  2.\n')
+    with pytest.raises(ValueError):
+        read_report(tmp_path / 'Ragged.rpt')
+
+
+def test_report_dir(tmp_path):
+    for i, n in enumerate((11, 21)):
+        (tmp_path / ('Run_%d' % i)).mkdir()
+        _report(tmp_path / ('Run_%d' % i) / 'U1.rpt', [(['X', 'U1'], _history(n))])
+    Store = read_report_dir(str(tmp_path), workers=1)
+    assert list(Store['offsets']) == [0, 11, 32]
+    np.testing.assert_allclose(Store['time'][11:], _history(21)[:, 0], rtol=1e-6)
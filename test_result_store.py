@@ -0,0 +1,96 @@
+"""
+Tests of Result_Store.py: keys, per-run settings, histories and import of Job_Queue.py runs
+
+Run command:
+python -m pytest -q test_result_store.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from Job_Queue import JobQueue
+from Result_Cache import Settings_file, design_key, design_keys, run_settings
+from Result_Store import ResultStore, _key64
+
+Planned = run_settings(dict(step_time=0.21, increment=4e-05, intervals=40), 50, 20, True, 0.01)
+
+
+def test_design_keys():
+    S = np.random.default_rng(0).random((50, 5))
+    S[0] = [0., 1., 1e-5, 1e16, 0.1]
+    for settings in (None, Planned):
+        assert design_keys(S, settings) == [design_key(s, settings) for s in S]
+    S[1, 2] = np.nan
+    assert design_keys(S[:2]) == [design_key(s) for s in S[:2]]
+
+
+def test_settings_per_run(tmp_path):
+    store = ResultStore(str(tmp_path / 'Results'), mode='a')
+    S = np.random.default_rng(1).random((4, 5))
+    store.extend([1, 2, 3, 4], S[[0, 0, 1, 2]], [0.1, 0.2, 0.3, 0.4],
+                 settings=[None, Planned, Planned, None])
+    store.build_index()
+    assert list(store.column('settings')) == [0, 1, 1, 0]
+    assert store.meta['settings'][1] == Planned
+    assert list(store.column('key')) == [_key64(S[0]), _key64(S[0], Planned),
+                                         _key64(S[1], Planned), _key64(S[2])]
+    # Same design, other settings: separate runs
+    assert list(store.rows_by_design(S[0])) == [0]
+    assert list(store.rows_by_design(S[0], Planned)) == [1]
+    assert len(store.rows_by_design(S[1])) == 0
+    with pytest.raises(ValueError):
+        store.extend([5, 6], S[:2], [0.1, 0.2], settings=[None])
+
+
+def test_reject_ragged(tmp_path):
+    store = ResultStore(str(tmp_path / 'Results'), mode='a')
+    with pytest.raises(ValueError, match='different lengths'):
+        store.extend([1, 2], [[0.1]*5, [0.1]*4], [0.1, 0.2])
+    with pytest.raises(ValueError):
+        store.extend([1], [[0.1]*6], [0.1])
+    assert len(store) == 0
+
+
+def test_histories(tmp_path):
+    store = ResultStore(str(tmp_path / 'Results'), mode='a')
+    First = np.column_stack((np.linspace(0., 0.3, 4), np.arange(4.)))
+    store.extend([1, 2, 3], [[0.1]*5, [0.2]*5, [0.3]*5], [0.1, 0.2, 0.3],
+                 [First, None, dict(time=np.arange(3.), U2=np.ones(3))])
+    assert list(store.column('hist_count')) == [4, 0, 3]
+    np.testing.assert_allclose(np.column_stack(store.history(0)), First)
+    assert len(store.history(1)[0]) == 0
+    Time, U1 = store.history(2)
+    np.testing.assert_allclose(Time, np.arange(3.))
+    assert np.isnan(U1).all()
+    # Channel added later is NaN for the earlier runs
+    np.testing.assert_allclose(store.history(2, ('U2',))[0], 1.)
+    assert np.isnan(store.history(0, ('U2',))[0]).all()
+
+
+def test_import_queue_settings(tmp_path):
+    queue = JobQueue(str(tmp_path / 'Job_Queue.db'), str(tmp_path / 'Jobs'))
+    Designs = [[0.2, 0.326, 0.579, 0.8, 0.674]]*2 + [[0.5]*5]
+    Ids = [queue.submit(s) for s in Designs]
+    for job_id, Drop_Time in zip(Ids, (0.1, 0.2, 0.3)):
+        queue._set(job_id, state='done', drop_time=Drop_Time)
+    # Second job planned: its Settings.json differs from the defaults
+    os.makedirs(queue.workdir(Ids[1]))
+    with open(os.path.join(queue.workdir(Ids[1]), Settings_file), 'w') as file:
+        json.dump(Planned, file)
+    queue.db.close()
+    Command = [sys.executable, 'Result_Store.py', 'import-queue', '--store',
+               str(tmp_path / 'Results'), '--db', str(tmp_path / 'Job_Queue.db'),
+               '--jobs-dir', str(tmp_path / 'Jobs')]
+    Here = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(2):
+        subprocess.check_call(Command, cwd=Here, stdout=subprocess.DEVNULL)
+    store = ResultStore(str(tmp_path / 'Results'))
+    # Imported once, under the settings of each run
+    assert list(store.column('run_id')) == Ids
+    assert list(store.column('settings')) == [0, 1, 0]
+    assert list(store.rows_by_design(Designs[0])) == [0]
+    assert list(store.rows_by_design(Designs[0], Planned)) == [1]
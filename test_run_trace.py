@@ -0,0 +1,124 @@
+"""
+Tests of Run_Trace.py: traced scripts with the Abaqus modules stubbed, summary and Chrome trace
+
+Run command:
+python -m pytest -q test_run_trace.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Run_Trace import Tracer, chrome_trace, read_traces, summarize
+
+Here = os.path.dirname(os.path.abspath(__file__))
+
+# Flat script in the layout of Post_Processing.py, Abaqus modules are stubs on the path
+Script = '''
+import time
+from Run_Trace import Tracer
+trace = Tracer('Post_Processing')
+trace.begin('session')
+from abaqus import *
+from odbAccess import openOdb
+trace.begin('open_odb')
+odb = openOdb('Ball_Drop.odb')
+time.sleep(0.02)
+trace.begin('xy_report')
+time.sleep(0.05)
+trace.begin('drop_time')
+time.sleep(0.01)
+trace.end()
+'''
+
+
+@pytest.fixture
+def traced_runs(tmp_path):
+    """
+    Run the script for two jobs, each in its own directory with its own Trace.jsonl
+    """
+    Stubs = tmp_path / 'stubs'
+    Stubs.mkdir()
+    (Stubs / 'abaqus.py').write_text('session = None\n')
+    (Stubs / 'odbAccess.py').write_text('def openOdb(path):\n    return path\n')
+    (tmp_path / 'script.py').write_text(Script)
+    Env = dict(os.environ, PYTHONPATH=os.pathsep.join((str(Stubs), Here)))
+    Env.pop('BALL_DROP_TRACE', None)
+    for Job in ('Ball_Drop_1', 'Ball_Drop_2'):
+        Dir = tmp_path / 'Jobs' / Job
+        Dir.mkdir(parents=True)
+        Env['BALL_DROP_JOB'] = Job
+        subprocess.check_call([sys.executable, str(tmp_path / 'script.py')], cwd=str(Dir),
+                              env=Env)
+    return tmp_path
+
+
+def test_records(traced_runs):
+    Records = read_traces([str(traced_runs / 'Jobs' / 'Ball_Drop_1' / 'Trace.jsonl')])
+    Stages = [Record['stage'] for Record in Records]
+    # startup is only known where the process start time can be read
+    assert Stages[-4:] == ['session', 'open_odb', 'xy_report', 'drop_time']
+    assert set(Stages[:-4]) <= {'startup'}
+    assert all(Record['run'] == 'Ball_Drop_1' for Record in Records)
+    assert all(Record['script'] == 'Post_Processing' for Record in Records)
+    Walls = dict((Record['stage'], Record['wall']) for Record in Records)
+    assert Walls['open_odb'] >= 0.02 and Walls['xy_report'] >= 0.05
+    # begin() closes the open stage: stages follow each other
+    Session, Odb = Records[-4], Records[-3]
+    assert Odb['start'] >= Session['start'] + Session['wall'] - 1e-3
+
+
+def test_summary_and_chrome_trace(traced_runs):
+    Chrome, Output = traced_runs / 'Trace_Chrome.json', traced_runs / 'Summary.json'
+    subprocess.check_call([sys.executable, os.path.join(Here, 'Run_Trace.py'), 'summary',
+                           str(traced_runs / 'Jobs'), '--chrome', str(Chrome),
+                           '--json', str(Output)], stdout=subprocess.DEVNULL)
+    Summary = dict((Row['stage'], Row) for Row in json.loads(Output.read_text()))
+    assert Summary['xy_report']['runs'] == 2
+    assert Summary['xy_report']['wall_p50'] >= 0.05
+    assert sum(Row['share'] for Row in Summary.values()) == pytest.approx(1.)
+
+    Events = json.loads(Chrome.read_text())['traceEvents']
+    Spans = [Event for Event in Events if Event['ph'] == 'X']
+    Names = dict((Event['args']['name'], Event['pid']) for Event in Events
+                 if Event['name'] == 'process_name')
+    # One process per run, one complete event per stage of each run
+    assert sorted(Names) == ['Ball_Drop_1', 'Ball_Drop_2']
+    for Run, pid in Names.items():
+        Stages = [Event['name'] for Event in Spans if Event['pid'] == pid]
+        assert Stages[-4:] == ['session', 'open_odb', 'xy_report', 'drop_time']
+    Threads = [Event['args']['name'] for Event in Events if Event['name'] == 'thread_name']
+    assert Threads == ['Post_Processing']*2
+    for Event in Spans:
+        assert Event['cat'] == 'Post_Processing'
+        assert Event['dur'] >= 0 and Event['ts'] > 1e15
+        assert 'rss_scope' in Event['args']
+    Report = [Event for Event in Spans if Event['name'] == 'xy_report']
+    assert all(Event['dur'] >= 0.05e6 for Event in Report)
+
+
+def test_error_stage(tmp_path):
+    trace = Tracer('Pre_Processing', path=str(tmp_path / 'Trace.jsonl'), run='Run_1',
+                   startup=False)
+    with pytest.raises(RuntimeError):
+        with trace.stage('mesh'):
+            raise RuntimeError('mesh failed')
+    trace.begin('model')
+    trace.end()
+    trace.end()
+    Records = read_traces([str(tmp_path / 'Trace.jsonl')])
+    assert [(Record['stage'], Record.get('error')) for Record in Records] == \
+        [('mesh', 'RuntimeError'), ('model', None)]
+    assert summarize(Records)[0]['errors'] == 1
+    Events = chrome_trace(Records)['traceEvents']
+    assert Events[0]['args']['error'] == 'RuntimeError'
+    assert [Event['ph'] for Event in Events] == ['X', 'X', 'M', 'M']
+
+
+def test_disabled(tmp_path):
+    trace = Tracer('Post_Processing', path='', startup=False)
+    trace.begin('session')
+    trace.end()
+    assert not os.listdir(str(tmp_path))
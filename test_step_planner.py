@@ -0,0 +1,66 @@
+"""
+Tests of Step_Planner.py: planned step time of designs and packs
+
+Run command:
+python -m pytest -q test_step_planner.py
+"""
+import numpy as np
+import pytest
+
+import Step_Planner
+from Step_Planner import Increment, Margin, Margin_time, Step_time, plan_step, \
+    predict_arrival, stable_increment
+
+Designs = np.array([[0.2, 0.326, 0.579, 0.8, 0.674], [0.5]*5, [0.9, 0.8, 0.7, 0.6, 0.5]])
+
+
+def _check_step(Plan, increment):
+    assert Plan['increment'] == increment
+    assert Plan['step_time']/increment == pytest.approx(Plan['increments'], rel=1e-12)
+    assert Plan['step_time'] == pytest.approx(Plan['increments']*increment, rel=1e-12)
+    # Covers the arrival with the margins, by less than one increment more
+    Needed = Plan['arrival']*(1 + Margin) + Margin_time
+    assert Plan['step_time'] >= Needed - 1e-12
+    assert Plan['step_time'] < Needed + increment
+
+
+def test_single_design():
+    Plan = plan_step(Designs[0])
+    assert Plan['arrival'] == pytest.approx(predict_arrival(Designs[0])[0])
+    assert 0.2 < Plan['arrival'] < 0.26
+    _check_step(Plan, Increment)
+    assert Plan['step_time'] < Step_time
+    # Frame spacing of the fixed step (0.3 s / 50 intervals)
+    assert Plan['intervals'] == int(round(Plan['step_time']/(Step_time/50)))
+
+
+def test_pack_takes_the_latest():
+    Plan = plan_step(Designs)
+    Arrivals = predict_arrival(Designs)
+    assert Plan['arrival'] == pytest.approx(Arrivals.max())
+    _check_step(Plan, Increment)
+    assert Plan['step_time'] >= max(plan_step(s)['step_time'] for s in Designs)
+
+
+def test_unpredicted_arrival_keeps_fixed_step(monkeypatch):
+    # One design of the pack without a predicted arrival: the whole pack keeps 0.3 s
+    monkeypatch.setattr(Step_Planner, 'predict_arrival', lambda S: np.array([0.23, np.nan]))
+    Plan = plan_step(Designs[:2])
+    assert np.isnan(Plan['arrival'])
+    assert Plan['step_time'] == Step_time
+    assert Plan['increments'] == int(round(Step_time/Increment))
+    assert Plan['intervals'] == 50
+    monkeypatch.setattr(Step_Planner, 'predict_arrival', lambda S: np.array([np.nan]))
+    assert plan_step(Designs[0])['step_time'] == Step_time
+
+
+def test_deformable_ball():
+    Plan = plan_step(Designs[0], rigid_ball=False)
+    Stable = stable_increment()
+    assert Plan['stable_increment'] == pytest.approx(Stable)
+    assert Stable < Increment
+    _check_step(Plan, Stable)
+    # Same end of step as the rigid ball, finer increments
+    assert Plan['step_time'] == pytest.approx(plan_step(Designs[0])['step_time'], abs=Increment)
+    # A coarser user increment than the stable one is never used
+    assert plan_step(Designs[0], increment=Stable/2, rigid_ball=False)['increment'] == Stable/2
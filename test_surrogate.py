@@ -0,0 +1,100 @@
+"""
+Tests of Surrogate.py: incremental factor updates, pending designs and the propose command
+
+Run command:
+python -m pytest -q test_surrogate.py
+"""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from scipy.linalg import cho_solve
+
+import Surrogate as Module
+from Surrogate import Surrogate
+
+
+def _objective(X):
+    return 0.2 + 0.05*np.sum((X - 0.3)**2, axis=1) + 0.01*np.sin(5*X[:, 0])
+
+
+def _data(n, seed=0):
+    X = np.random.default_rng(seed).random((n, 5))
+    return X, _objective(X)
+
+
+def test_update_matches_fit(monkeypatch):
+    X, F = _data(30)
+    model = Surrogate(refit_growth=10.).fit(X[:20], F[:20])
+    for i in range(20, 30, 3):
+        model.update(X[i:i+3], F[i:i+3])
+    assert model.n_fit == 20 and len(model) == 30
+    # Full fit at the hyperparameters of the first fit
+    monkeypatch.setattr(Module, 'Length_scales', (model.l,))
+    monkeypatch.setattr(Module, 'Noises', (model.Noise,))
+    Full = Surrogate().fit(X, F)
+    np.testing.assert_allclose(model.L, Full.L, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(model.Li, Full.Li, rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(model.Li @ model.L, np.eye(30), atol=1e-9)
+    # Posterior of the updated model against the direct formulas
+    Xc = np.random.default_rng(1).random((50, 5))
+    K = np.exp(-0.5*Module._sqdist(X, X)/model.l**2) + model.Noise*np.eye(30)
+    Ks = np.exp(-0.5*Module._sqdist(Xc, X)/model.l**2)
+    Alpha = cho_solve((np.linalg.cholesky(K), True), model.Z)
+    np.testing.assert_allclose(model.alpha, Alpha, rtol=1e-8, atol=1e-10)
+    Mu, Sd = model.predict(Xc)
+    np.testing.assert_allclose(Mu, model._mean(model._trend(Xc)) + model.Std*Ks @ Alpha,
+                               rtol=1e-10)
+    Var = 1. - np.einsum('ij,ji->i', Ks, np.linalg.solve(K, Ks.T))
+    np.testing.assert_allclose(Sd, model.Std*np.sqrt(np.maximum(Var, 1e-12)), rtol=1e-6,
+                               atol=1e-9*model.Std)
+    # Same posterior as the full fit up to the normalization of the drop times
+    np.testing.assert_allclose(Sd/model.Std, Full.predict(Xc)[1]/Full.Std, rtol=1e-6, atol=1e-9)
+
+
+def test_refit_on_growth():
+    X, F = _data(16)
+    model = Surrogate(refit_growth=1.5).fit(X[:10], F[:10])
+    model.update(X[10:14], F[10:14])
+    assert model.n_fit == 10
+    model.update(X[14:], F[14:])
+    assert model.n_fit == 16
+
+
+def test_pending_suppresses_duplicates():
+    X, F = _data(20)
+    model = Surrogate().fit(X, F)
+    Candidates = np.random.default_rng(2).random((500, 5))
+    Best = model.propose(1, candidates=Candidates)[0]
+    # The best candidate is already running: another one is proposed
+    Next = model.propose(1, pending=[Best], candidates=Candidates)[0]
+    assert not np.allclose(Next, Best)
+    # A batch has no duplicates, nor any of the pending designs
+    Batch = model.propose(4, pending=[Best], candidates=Candidates)
+    assert len(np.unique(Batch, axis=0)) == 4
+    assert not any(np.allclose(x, Best) for x in Batch)
+    assert np.allclose(model.propose(4, candidates=Candidates)[0], Best)
+
+
+def test_propose_needs_two_runs():
+    model = Surrogate()
+    with pytest.raises(ValueError):
+        model.propose(2)
+    model.update(*_data(1))
+    with pytest.raises(ValueError):
+        model.propose(2)
+
+
+def test_propose_command_empty_store(tmp_path):
+    from Result_Store import ResultStore
+    store = ResultStore(str(tmp_path / 'Results'), mode='a')
+    store.extend([1], [[0.5]*5], [np.nan])
+    Output = subprocess.check_output(
+        [sys.executable, 'Surrogate.py', 'propose', '--store', str(tmp_path / 'Results'),
+         '--model', str(tmp_path / 'Surrogate.pkl'), '--batch', '3'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL)
+    Batch = np.array([Line.split() for Line in Output.decode().splitlines()], dtype=float)
+    assert Batch.shape == (3, 5)
+    assert ((Batch >= 0.) & (Batch <= 1.)).all()
@@ -0,0 +1,195 @@
+"""
+Tests of Track_Pack.py: packed deck of a synthetic base deck and splitting of packed reports
+
+Run command:
+python -m pytest -q test_track_pack.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from Arrival import U1_contact
+from Cycloid_Reference import reference_curve
+from Drop_Time_Model import X_end, Y_end
+from Inp_Writer import Guide, _keyword_blocks, design_coord, track_mesh
+from Track_Pack import Spacing, drop_times, pack_deck, split_report, write_pack, \
+    write_pack_report
+
+# Base deck in the layout of Pre_Processing.py: Track and Ball parts, the reference point
+# of the ball is its last node at the origin
+Base = '''*Heading
+** Job name: Ball_Drop Model name: Model-1
+*Part, name=Track
+*Node
+      1,   0.,   20.,   0.
+      2,   0.,   20.,  20.
+      3,   0.,   15.,  20.
+      4,   0.,   15.,   0.
+*Element, type=R3D4
+1, 1, 2, 3, 4
+*End Part
+*Part, name=Ball
+*Node
+      1,   5.,   0.,   0.
+      2,   0.,   5.,   0.
+      3,  -5.,   0.,   0.
+      4,   0.,  -5.,   0.
+      5,   0.,   0.,   5.
+      6,   0.,   0.,   0.
+*Element, type=R3D3
+1, 1, 2, 5
+2, 2, 3, 5
+3, 3, 4, 5
+4, 4, 1, 5
+*Elset, elset=Set-1, generate
+ 1, 4, 1
+*End Part
+*Assembly, name=Assembly
+*End Assembly
+'''
+
+Designs = np.array([[0.2, 0.326, 0.579, 0.8, 0.674], [0.5]*5, [0.9, 0.8, 0.7, 0.6, 0.5]])
+
+
+def _parts(Deck):
+    """
+    {part name: (node labels, node coordinates, element connectivity, part text)}
+    """
+    Parts, Name = {}, None
+    for Block in _keyword_blocks(Deck):
+        Key = Block[0].strip()
+        if Key.lower().startswith('*part,'):
+            Name = Key.split('name=')[1]
+            Parts[Name] = ([], [], [], '')
+        elif Key.lower() == '*end part':
+            Name = None
+        elif Name is not None:
+            Labels, Coord, Connectivity, _ = Parts[Name]
+            Data = [[Field for Field in Line.split(',') if Field.strip()]
+                    for Line in Block[1:] if Line.strip()]
+            if Key.lower() == '*node':
+                Labels += [int(Row[0]) for Row in Data]
+                Coord += [[float(v) for v in Row[1:4]] for Row in Data]
+            elif Key.lower().startswith('*element'):
+                Connectivity += [[int(v) for v in Row] for Row in Data]
+        if Name is not None:
+            Parts[Name] = Parts[Name][:3] + (Parts[Name][3] + ''.join(Block),)
+    return Parts
+
+
+def _lines(Deck, Start):
+    return [Line.strip() for Line in Deck.splitlines() if Line.startswith(Start)]
+
+
+def test_parts_numbering():
+    Deck, Lanes = pack_deck(Designs, Base, cycloid=True)
+    Parts = _parts(Deck)
+    assert list(Parts) == ['Ball', 'Track_1', 'Track_2', 'Track_3', 'Track_Cycloid']
+    # Ball copied from the base deck, the Track part of the base deck is not
+    assert Parts['Ball'][0] == [1, 2, 3, 4, 5, 6]
+    for Name, (Labels, Coord, Connectivity, Text) in Parts.items():
+        # Node and element labels 1..n, connectivity within the nodes of the part
+        assert Labels == list(range(1, len(Labels) + 1))
+        assert [Row[0] for Row in Connectivity] == list(range(1, len(Connectivity) + 1))
+        assert set(v for Row in Connectivity for v in Row[1:]) <= set(Labels)
+        if Name != 'Ball':
+            # Reference point after the mesh nodes, in the rigid body set
+            assert '*Nset, nset=RP\n %d,\n' % Labels[-1] in Text
+            assert '*Elset, elset=Track, generate\n 1, %d, 1\n' % len(Connectivity) in Text
+    for i, s in enumerate(Designs):
+        Nodes, Elements = track_mesh(design_coord(s))
+        Labels, Coord, Connectivity, _ = Parts['Track_%d' % (i + 1)]
+        np.testing.assert_allclose(Coord[:-1], Nodes, rtol=1e-6, atol=1e-5)
+        assert [Row[1:] for Row in Connectivity] == np.asarray(Elements).tolist()
+    assert len(Lanes) == 4
+
+
+def test_lanes_and_sets():
+    Deck, Lanes = pack_deck(Designs, Base, cycloid=True)
+    assert [Lane['ball'] for Lane in Lanes] == [1, 2, 3, 4]
+    assert [Lane['z'] for Lane in Lanes] == [0., -Spacing, -2*Spacing, -3*Spacing]
+    assert Lanes[-1]['track'] == 'Track_Cycloid' and Lanes[-1]['s'] is None
+    np.testing.assert_allclose([Lane['s'] for Lane in Lanes[:3]], Designs)
+    Instances = _lines(Deck, '*Instance')
+    for Lane in Lanes:
+        i, Name = Lane['ball'], Lane['track']
+        assert '*Instance, name=%s-1, part=%s' % (Name, Name) in Instances
+        assert '*Instance, name=Ball-%d, part=Ball' % i in Instances
+        # Ball translated into its lane, one ball per lane
+        assert ' -5.0, 5.0, %r\n*End Instance\n' % (10. + Lane['z']) in Deck.split(
+            '*Instance, name=Ball-%d, part=Ball\n' % i)[1][:40]
+        # Center set on the reference point (last node) of the ball
+        assert '*Nset, nset=Ball_Center_RP_%d, instance=Ball-%d\n 6,\n' % (i, i) in Deck
+        assert '*Rigid Body, ref node=Ball_Center_RP_%d, elset=Ball-%d.Set-1\n' % (i, i) in Deck
+        assert 'Ball_Center_RP_%d, 3, 3\nBall_Center_RP_%d, 4, 5\n%s_RP, ENCASTRE\n' % (
+            i, i, Name) in Deck
+        assert '*Node Output, nset=Ball_Center_RP_%d\nU1,\n' % i in Deck
+    # One rigid body per track part and one per ball
+    assert len(_lines(Deck, '*Rigid Body')) == 2*len(Lanes)
+    assert Deck.count('*Step') == 1 and Deck.count('*End Step') == 1
+    # Assembly and step of the base deck are not copied
+    assert Deck.count('*Assembly') == 1
+
+
+def test_cycloid_lane():
+    Deck, _ = pack_deck(Designs[:1], Base, cycloid=True)
+    Coord = np.array(_parts(Deck)['Track_Cycloid'][1])
+    Curve, _ = reference_curve((0., 0.), (X_end, Y_end))
+    Nodes, _ = track_mesh(np.concatenate((Guide, Curve), axis=0))
+    np.testing.assert_allclose(Coord[:-1], Nodes, rtol=1e-6, atol=1e-5)
+
+
+def test_deck_errors():
+    with pytest.raises(ValueError):
+        pack_deck(Designs, Base, spacing=10.)
+    with pytest.raises(ValueError):
+        pack_deck(Designs, Base.replace('name=Ball', 'name=Sphere'))
+    # Reference point not last
+    with pytest.raises(ValueError):
+        pack_deck(Designs, Base.replace('      6,   0.,   0.,   0.', '      6,   1.,   0.,   0.'))
+
+
+def _histories(Speeds, n=301):
+    """
+    U1 = v*t: arrival at U1_contact/v
+    """
+    Time = np.linspace(0., 0.3, n)
+    return dict((i + 1, np.column_stack((Time, v*Time))) for i, v in enumerate(Speeds))
+
+
+def test_report_split(tmp_path):
+    Speeds = [800., 1000., 1200., 1500.]
+    write_pack_report(str(tmp_path / 'U1_Pack.rpt'), _histories(Speeds))
+    Histories = split_report(str(tmp_path / 'U1_Pack.rpt'))
+    assert len(Histories) == 4
+    for History, (_, Expected) in zip(Histories, sorted(_histories(Speeds).items())):
+        np.testing.assert_allclose(History, Expected, rtol=1e-8, atol=1e-12)
+    Times = drop_times(Histories)
+    np.testing.assert_allclose(Times[:, 0], U1_contact/np.array(Speeds), rtol=1e-8)
+    # Other output times of one ball
+    Histories = _histories(Speeds)
+    Histories[2] = Histories[2][:-1]
+    with pytest.raises(ValueError):
+        write_pack_report(str(tmp_path / 'Bad.rpt'), Histories)
+
+
+def test_write_and_split_cli(tmp_path):
+    (tmp_path / 'Ball_Drop_Base.inp').write_text(Base)
+    Lanes = write_pack(Designs[:2], str(tmp_path / 'Ball_Drop_Base.inp'),
+                       str(tmp_path / 'Ball_Pack.inp'), cycloid=True)
+    Table = json.loads((tmp_path / 'Ball_Pack.json').read_text())
+    assert Table['lanes'] == Lanes and Table['deck'] == str(tmp_path / 'Ball_Pack.inp')
+    write_pack_report(str(tmp_path / 'U1_Pack.rpt'), _histories([900., 1000., 1100.]))
+    subprocess.check_call([sys.executable, 'Track_Pack.py', 'split', str(tmp_path / 'U1_Pack.rpt'),
+                           '--pack', str(tmp_path / 'Ball_Pack.json'),
+                           '--output', str(tmp_path / 'Drop_Times.csv')],
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    Lines = (tmp_path / 'Drop_Times.csv').read_text().splitlines()
+    assert Lines[0] == 'ball,track,s,drop_time,error'
+    assert [Line.split(',')[:2] for Line in Lines[1:]] == [
+        ['1', 'Track_1'], ['2', 'Track_2'], ['3', 'Track_Cycloid']]
+    assert float(Lines[3].split(',')[3]) == pytest.approx(U1_contact/1100., rel=1e-7)